@@ -115,6 +115,8 @@ CREATE INDEX IF NOT EXISTS idx_session_stats_daily_session_id ON session_stats_d
 CREATE INDEX IF NOT EXISTS idx_daily_reports_session_id ON daily_reports(session_id);
 CREATE INDEX IF NOT EXISTS idx_daily_reports_date ON daily_reports(date);
 CREATE INDEX IF NOT EXISTS idx_daily_reports_parent_email ON daily_reports(parent_email);
+-- Rapports générés en attente d'envoi (GET /api/reports/pending, daily_reports.py deliver)
+CREATE INDEX IF NOT EXISTS idx_daily_reports_date_status ON daily_reports(date, status, id);
 
 CREATE INDEX IF NOT EXISTS idx_report_preferences_account_id ON report_preferences(account_id);
 
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "daily_reports" ADD COLUMN "lease_until" TIMESTAMP(3);
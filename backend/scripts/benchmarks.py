@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the Python scripts (send_welcome_email.py, daily_reports.py).
+
+Everything runs locally: a stand-in SMTP server and a mock reports API are
+started on 127.0.0.1, with configurable latency and failure injection. No
+credentials or network access are needed.
+
+Usage:
+  python backend/scripts/benchmarks.py                      # all suites
+  python backend/scripts/benchmarks.py render smtp          # selected suites
+  python backend/scripts/benchmarks.py --iterations 500 --concurrency 8 \
+    --smtp-latency-ms 20 --smtp-failure-rate 0.02 \
+    --api-latency-ms 50 --api-failure-rate 0.01 \
+    --output bench-2024-12-19.json
+
+Suites:
+  render   build_email_html / build_email_text / MIME assembly throughput
+  smtp     send_email against the stand-in SMTP server (plain connection, no TLS handshake)
+  reports  DailyReportGenerator against the mock /api/reports endpoints
+
+The JSON output (throughput, p50/p95/p99 latency, errors) is meant to be
+compared between releases.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import contextlib
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, List
+
+from script_metrics import latency_summary
+
+SUITES = ("render", "smtp", "reports")
+
+
+def run_timed(fn: Callable[[int], object], iterations: int, concurrency: int = 1) -> Dict[str, float]:
+    """
+    Exécute fn(i) iterations fois (en parallèle si concurrency > 1) et mesure chaque appel
+
+    Un appel qui lève une exception ou renvoie False compte comme une erreur.
+    """
+    samples: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = fn(i) is not False
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                samples.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, range(iterations)))
+    else:
+        for i in range(iterations):
+            one(i)
+    return latency_summary(samples, errors, time.perf_counter() - start)
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Serveur SMTP minimal en clair (EHLO, AUTH, MAIL, RCPT, DATA, QUIT)
+
+    latency: délai ajouté avant chaque réponse
+    failure_rate: probabilité de refuser un message en fin de DATA (451)
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.accepted = 0
+        self.rejected = 0
+        self.connections = 0
+        # Compteurs incrémentés par les threads des connexions
+        self._counters_lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count(self, counter: str):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def reply(self, *lines: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode())
+
+    def handle(self):
+        self.server.count("connections")
+        self.reply("220 stand-in ESMTP")
+        in_data = False
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    if random.random() < self.server.failure_rate:
+                        self.server.count("rejected")
+                        self.reply("451 4.3.0 Injected temporary failure")
+                    else:
+                        self.server.count("accepted")
+                        self.reply("250 2.0.0 Queued")
+                continue
+            command = line[:4].upper()
+            if command == "EHLO":
+                self.reply("250-stand-in", "250 AUTH PLAIN LOGIN")
+            elif command == "HELO":
+                self.reply("250 stand-in")
+            elif command == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "DATA":
+                in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                self.reply("250 2.0.0 OK")
+
+
+class MockReportsAPI(ThreadingHTTPServer):
+    """
+    API des rapports simulée : /api/reports/generate, /prepare, /statistics, /test/{id}
+
+    latency: délai de traitement par requête
+    failure_rate: probabilité de répondre 503
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, sessions: int = 50):
+        super().__init__(("127.0.0.1", 0), _ReportsHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sessions = [f"session-{i:05d}" for i in range(sessions)]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _ReportsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate(self) -> bool:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            self.send_json(503, {"error": "Injected failure"})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.simulate():
+            return
+        if self.path == "/api/reports/generate":
+            session_ids = body.get("sessionIds") or self.server.sessions
+            self.send_json(200, {
+                "success": True,
+                "message": f"Rapports générés pour {body.get('date', 'today')}",
+                "results": {"succeeded": session_ids, "failed": []},
+            })
+        elif self.path == "/api/reports/prepare":
+            self.send_json(200, {"success": True, "sessions": [{"id": sid} for sid in self.server.sessions]})
+        elif self.path.startswith("/api/reports/test/"):
+            self.send_json(200, {"success": True, "message": "Rapport de test généré et envoyé"})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_GET(self):
+        if not self.simulate():
+            return
+        if self.path.startswith("/api/reports/statistics"):
+            reports = [
+                {
+                    "id": f"report-{i}",
+                    "sessionId": sid,
+                    "date": "2024-12-19T00:00:00.000Z",
+                    "status": "sent",
+                    "kpisSnapshot": {"kpi_comprehension": 80, "kpi_progression": 70},
+                }
+                for i, sid in enumerate(self.server.sessions)
+            ]
+            self.send_json(200, {
+                "success": True,
+                "reports": reports,
+                "statistics": {
+                    "totalReports": len(reports),
+                    "sentReports": len(reports),
+                    "failedReports": 0,
+                    "averageComprehension": 80,
+                    "averageProgression": 70,
+                },
+            })
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+
+@contextlib.contextmanager
+def serving(server):
+    """
+    Lance un serveur dans un thread le temps du bloc
+    """
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_render(args) -> Dict[str, dict]:
+    """
+    Débit du rendu HTML/texte et de l'assemblage MIME
+    """
+    import send_welcome_email as swe
+
+    members = [
+        {"firstName": "Lina", "lastName": "Martin", "sessionId": "lina.m", "password": "Cube-1234", "userType": "CHILD"},
+        {"firstName": "Claire", "lastName": "Martin", "username": "claire.m", "password": "Cube-9012", "userType": "PARENT"},
+    ]
+    plans = list(swe.PLANS)
+
+    def render_args(i: int) -> tuple:
+        return (f"Parent {i}", f"user{i}", "TempPass123", plans[i % len(plans)],
+                "https://cube-ai.fr", members if i % 2 else None, f"REG-{i}")
+
+    def mime(i: int):
+        msg = swe.build_message(f"user{i}@example.com", *render_args(i)[:4], members=members if i % 2 else None)
+        return msg.as_bytes()
+
+    return {
+        "build_email_html": run_timed(lambda i: swe.build_email_html(*render_args(i)), args.iterations),
+        "build_email_text": run_timed(lambda i: swe.build_email_text(*render_args(i)), args.iterations),
+        "mime_assembly": run_timed(mime, args.iterations),
+    }
+
+
+@contextlib.contextmanager
+def stand_in_connections(swe, port: int):
+    """
+    Remplace open_smtp_connection le temps du bloc par une connexion en clair au
+    serveur local (send_email la résout à chaque appel) ; la configuration TLS de
+    production n'est pas modifiée
+    """
+    def open_stand_in(email_config: dict, context=None):
+        server = swe.TimedSMTP("127.0.0.1", port, account=email_config["user"])
+        try:
+            server.login(email_config["user"], email_config["password"])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    original = swe.open_smtp_connection, swe.EMAIL_CONFIG["hello"]["password"]
+    swe.open_smtp_connection = open_stand_in
+    swe.EMAIL_CONFIG["hello"]["password"] = "bench"
+    try:
+        yield
+    finally:
+        swe.open_smtp_connection, swe.EMAIL_CONFIG["hello"]["password"] = original
+
+
+def bench_smtp(args) -> Dict[str, dict]:
+    """
+    send_email contre le serveur SMTP local (une connexion par message, comme en production,
+    sans la négociation TLS)
+    """
+    import send_welcome_email as swe
+
+    results = {}
+    with serving(StandInSMTPServer(args.smtp_latency_ms / 1000, args.smtp_failure_rate)) as server, \
+            stand_in_connections(swe, server.port):
+
+        def send(i: int):
+            swe.send_email(f"user{i}@example.com", f"Parent {i}", f"user{i}", "TempPass123", "PRO")
+
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            results["send_email"] = run_timed(send, args.iterations, args.concurrency)
+        results["send_email"]["smtp_connections"] = server.connections
+    return results
+
+
+def bench_reports(args) -> Dict[str, dict]:
+    """
+    DailyReportGenerator contre l'API des rapports simulée
+    """
+    results = {}
+    with serving(MockReportsAPI(args.api_latency_ms / 1000, args.api_failure_rate, args.sessions)) as api, \
+            tempfile.TemporaryDirectory() as tmp:
+        # Tout l'état local du script dans le répertoire temporaire : rien n'est écrit
+        # dans ~/.cubeai (journal, cache des statistiques, jobs) ni dans les traces
+        os.environ["CUBEAI_API_URL"] = api.url
+        os.environ.setdefault("CUBEAI_API_KEY", "bench")
+        os.environ["CUBEAI_REPORTS_JOURNAL"] = os.path.join(tmp, "journal.db")
+        os.environ["CUBEAI_STATS_CACHE"] = os.path.join(tmp, "statistics-cache.db")
+        os.environ["CUBEAI_REPORT_JOBS"] = os.path.join(tmp, "jobs.json")
+        os.environ["CUBEAI_TRACE_FILE"] = "off"
+        import daily_reports
+        # Le logging n'est configuré que par main() : rien n'est ouvert dans /var/log
+        daily_reports.logger.disabled = True
+        daily_reports.TRACER.path = None
+
+        with daily_reports.DailyReportGenerator() as generator:
+            results["generate_reports"] = run_timed(
+                lambda i: generator.generate_reports("2024-12-19"), args.iterations, args.concurrency)
+            # Sans cache : chaque appel mesure l'aller-retour HTTP, pas une lecture SQLite
+            results["get_report_statistics"] = run_timed(
+                lambda i: generator.get_report_statistics("2024-12-01", "2024-12-31", use_cache=False),
+                args.iterations, args.concurrency)
+            results["test_report_generation"] = run_timed(
+                lambda i: generator.test_report_generation(f"session-{i:05d}", "2024-12-19"),
+                args.iterations, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the CubeAI Python scripts")
+    parser.add_argument("suites", nargs="*", metavar="suite", help=f"Suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per benchmark (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent callers for smtp/reports (default: 1)")
+    parser.add_argument("--smtp-latency-ms", type=float, default=0.0, help="Stand-in SMTP delay per reply")
+    parser.add_argument("--smtp-failure-rate", type=float, default=0.0, help="Probability of a 451 after DATA")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Mock API delay per request")
+    parser.add_argument("--api-failure-rate", type=float, default=0.0, help="Probability of a 503 from the mock API")
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions returned by the mock API")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+    unknown = [suite for suite in args.suites if suite not in SUITES]
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(unknown)}")
+
+    runners = {"render": bench_render, "smtp": bench_smtp, "reports": bench_reports}
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("suites", "output")},
+        "results": {},
+    }
+    for suite in args.suites or SUITES:
+        print(f"⏱️  {suite}...", file=sys.stderr)
+        report["results"][suite] = runners[suite](args)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"✅ Résultats écrits dans {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,777 @@
 #!/usr/bin/env python3
 """
 Script Python pour générer les rapports quotidiens automatisés
-À exécuter via cron tous les jours à 19:30 Europe/Paris
+À exécuter via cron tous les jours à 19:30 Europe/Paris, ou en continu avec la
+commande daemon (génération étalée selon l'heure d'envoi de chaque session)
 """
 
 import os
 import sys
+import argparse
+import asyncio
+import queue
+import time
+import threading
+import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 import json
-from datetime import datetime, timezone
+import math
+import csv
+import codecs
+import hashlib
+import heapq
+import random
+import signal
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import parsedate_to_datetime
+from zoneinfo import ZoneInfo
 import logging
-from typing import Optional, Dict, Any
-
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/var/log/cubeai-daily-reports.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from typing import Optional, Dict, Any, Iterator, List, TextIO
+
+from kpi_aggregation import compute_daily_kpis
+from script_metrics import REGISTRY, export_at_exit, latency_summary
+from script_tracing import Tracer, queued_handler
+from send_welcome_email import BulkSender, SendRateController, get_from_address, is_permanent_smtp_error
+
 logger = logging.getLogger(__name__)
 
+
+def configure_logging():
+    """
+    Configure le logging (fichier écrit par un thread dédié, console immédiate)
+
+    Appelée par main() : importer le module n'ouvre aucun fichier. Le fichier est
+    CUBEAI_LOG_FILE ("off" pour la console seule) ; s'il est inaccessible (utilisateur
+    sans droits sur /var/log), le journal reste sur la console.
+    """
+    log_format = '%(asctime)s - %(levelname)s - %(message)s'
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    path = os.getenv('CUBEAI_LOG_FILE', '/var/log/cubeai-daily-reports.log')
+    error = None
+    if path.lower() not in ('off', '0', ''):
+        try:
+            file_handler = logging.FileHandler(os.path.expanduser(path))
+        except OSError as e:
+            error = e
+        else:
+            file_handler.setFormatter(logging.Formatter(log_format))
+            handlers.insert(0, queued_handler(file_handler))
+    logging.basicConfig(level=logging.INFO, format=log_format, handlers=handlers)
+    if error:
+        logger.warning(f"⚠️ Fichier de log inutilisable ({path}): {error}")
+
+# Spans des commandes et des requêtes à l'API (en-tête traceparent, CUBEAI_TRACE_FILE)
+TRACER = Tracer('daily_reports')
+
+HTTP_PHASE_SECONDS = REGISTRY.histogram(
+    'cubeai_reports_http_phase_seconds',
+    "Durée des phases HTTP des appels à l'API des rapports (connect = DNS + TCP)",
+    ['phase']
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'cubeai_reports_http_request_seconds',
+    "Durée totale des appels à l'API des rapports",
+    ['method', 'endpoint', 'status']
+)
+
+class _TimedHTTPConnection(HTTPConnection):
+    """
+    Connexion urllib3 qui mesure connect, envoi de la requête et attente de la réponse
+    """
+    
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._connect_elapsed = time.perf_counter() - start
+            HTTP_PHASE_SECONDS.observe(self._connect_elapsed, phase='connect')
+    
+    def request(self, *args, **kwargs):
+        with HTTP_PHASE_SECONDS.time(phase='request'):
+            return super().request(*args, **kwargs)
+    
+    def getresponse(self, *args, **kwargs):
+        with HTTP_PHASE_SECONDS.time(phase='response'):
+            return super().getresponse(*args, **kwargs)
+
+class _TimedHTTPSConnection(_TimedHTTPConnection, HTTPSConnection):
+    """
+    Variante HTTPS : la poignée de main TLS est mesurée séparément du connect TCP
+    """
+    
+    def connect(self):
+        self._connect_elapsed = 0.0
+        start = time.perf_counter()
+        super().connect()
+        HTTP_PHASE_SECONDS.observe(time.perf_counter() - start - self._connect_elapsed, phase='tls')
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class ReportJournal:
+    """
+    Journal local des sessions traitées, indexé par (date, session_id)
+    
+    Permet de reprendre une génération interrompue sans régénérer les rapports
+    déjà produits.
+    """
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS report_journal (
+                date TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                idempotency_key TEXT NOT NULL,
+                error TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (date, session_id)
+            )
+        """)
+        self._conn.commit()
+    
+    @staticmethod
+    def idempotency_key(date: str, session_id: str) -> str:
+        """
+        Clé d'idempotence stable pour un couple (date, session)
+        """
+        return hashlib.sha256(f"{date}:{session_id}".encode()).hexdigest()[:32]
+    
+    def record(self, date: str, session_id: str, status: str, error: Optional[str] = None):
+        """
+        Enregistre le résultat d'une tentative ('succeeded' ou 'failed')
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO report_journal (date, session_id, status, attempts, idempotency_key, error, updated_at)
+                VALUES (?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT (date, session_id) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = report_journal.attempts + 1,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+            """, (date, session_id, status, self.idempotency_key(date, session_id), error, now))
+            self._conn.commit()
+    
+    def record_results(self, date: str, results: Dict[str, Any]):
+        """
+        Enregistre les résultats renvoyés par /api/reports/generate
+        """
+        for session_id in results.get('succeeded', []):
+            self.record(date, session_id, 'succeeded')
+        for failure in results.get('failed', []):
+            self.record(date, failure['sessionId'], 'failed', failure.get('error'))
+    
+    def completed_sessions(self, date: str) -> set:
+        """
+        Sessions déjà traitées avec succès pour une date
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id FROM report_journal WHERE date = ? AND status = 'succeeded'",
+                (date,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+class StatisticsCache:
+    """
+    Cache local des rapports par jour pour /api/reports/statistics
+    
+    Les jours passés ne changent plus : une requête sur une plage ne récupère que
+    les jours absents du cache. Les entrées sont propres à une API (scope : son URL,
+    la préproduction ne partage rien avec la production) ; un jour dont les rapports
+    sont générés ou envoyés est invalidé. Les entrées les moins récemment utilisées
+    sont évincées au-delà de max_bytes.
+    """
+    
+    def __init__(self, path: str, max_bytes: int, scope: str = ''):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(statistics_days)")}
+        if columns and 'scope' not in columns:
+            # Ancien cache indexé par jour seul : impossible de savoir de quelle API il vient
+            self._conn.execute("DROP TABLE statistics_days")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS statistics_days (
+                scope TEXT NOT NULL,
+                day TEXT NOT NULL,
+                reports TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (scope, day)
+            )
+        """)
+        self._conn.commit()
+    
+    def get_days(self, days: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Rapports en cache pour les jours demandés (les jours absents sont omis)
+        """
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        if not days:
+            return found
+        with self._lock:
+            for offset in range(0, len(days), 500):
+                chunk = days[offset:offset + 500]
+                rows = self._conn.execute(
+                    f"SELECT day, reports FROM statistics_days "
+                    f"WHERE scope = ? AND day IN ({','.join('?' * len(chunk))})",
+                    [self.scope, *chunk]
+                ).fetchall()
+                found.update({day: json.loads(reports) for day, reports in rows})
+            self._conn.executemany(
+                "UPDATE statistics_days SET last_used = ? WHERE scope = ? AND day = ?",
+                [(time.time(), self.scope, day) for day in found]
+            )
+            self._conn.commit()
+        return found
+    
+    def put_days(self, reports_by_day: Dict[str, List[Dict[str, Any]]]):
+        """
+        Enregistre les rapports de jours révolus puis applique la limite de taille
+        """
+        now = time.time()
+        rows = []
+        for day, reports in reports_by_day.items():
+            payload = json.dumps(reports, separators=(',', ':'))
+            rows.append((self.scope, day, payload, len(payload), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO statistics_days (scope, day, reports, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def invalidate_day(self, day: str):
+        """
+        Retire un jour du cache (ses rapports ont changé)
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM statistics_days WHERE scope = ? AND day = ?", (self.scope, day))
+            self._conn.commit()
+    
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM statistics_days").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for scope, day, size in self._conn.execute(
+            "SELECT scope, day, size FROM statistics_days ORDER BY last_used ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM statistics_days WHERE scope = ? AND day = ?", (scope, day))
+            total -= size
+
+def summarize_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Recalcule le bloc "statistics" de /api/reports/statistics à partir des rapports
+    """
+    count = len(reports)
+    snapshots = [r.get('kpisSnapshot') or {} for r in reports]
+    return {
+        'totalReports': count,
+        'sentReports': sum(1 for r in reports if r.get('status') == 'sent'),
+        'failedReports': sum(1 for r in reports if r.get('status') == 'failed'),
+        'averageComprehension': sum(s.get('kpi_comprehension', 0) for s in snapshots) / count if count else 0,
+        'averageProgression': sum(s.get('kpi_progression', 0) for s in snapshots) / count if count else 0,
+    }
+
+def date_range(start_date: str, end_date: str) -> List[str]:
+    """
+    Jours (YYYY-MM-DD) de start_date à end_date inclus
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+def contiguous_runs(days: List[str]) -> List[tuple]:
+    """
+    Regroupe des jours triés en plages contiguës (début, fin)
+    """
+    runs: List[tuple] = []
+    for day in days:
+        if runs and date.fromisoformat(day) - date.fromisoformat(runs[-1][1]) == timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+def split_range(start_date: str, end_date: str, unit: str = 'month') -> List[tuple]:
+    """
+    Découpe une plage en sous-plages (début, fin) par semaine ou par mois calendaire
+    
+    unit='none' renvoie la plage entière.
+    """
+    if unit == 'none':
+        return [(start_date, end_date)]
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    chunks = []
+    while start <= end:
+        if unit == 'week':
+            chunk_end = start + timedelta(days=6)
+        else:
+            next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+            chunk_end = next_month - timedelta(days=1)
+        chunk_end = min(chunk_end, end)
+        chunks.append((start.isoformat(), chunk_end.isoformat()))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+def scheduled_at(day: date, email_time: Optional[str], frequency: Optional[str],
+                 tz: ZoneInfo) -> Optional[datetime]:
+    """
+    Instant d'envoi du rapport d'une session pour un jour donné
+    
+    Fréquences : daily (tous les jours), weekly (le dimanche), never/none/disabled.
+    Une heure absente ou invalide retombe sur 19:30.
+    
+    Returns:
+        datetime dans le fuseau tz, ou None si la session n'a pas de rapport ce jour-là
+    """
+    frequency = (frequency or 'daily').lower()
+    if frequency in ('never', 'none', 'disabled'):
+        return None
+    if frequency == 'weekly' and day.weekday() != 6:
+        return None
+    try:
+        parts = [int(part) for part in (email_time or '').split(':')[:3]]
+        return datetime(day.year, day.month, day.day, *parts, tzinfo=tz)
+    except (TypeError, ValueError):
+        return datetime(day.year, day.month, day.day, 19, 30, tzinfo=tz)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Délai en secondes d'un en-tête Retry-After (nombre de secondes ou date HTTP)
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class AdaptiveConcurrency:
+    """
+    Limite de requêtes simultanées ajustée à la capacité observée du serveur (AIMD)
+    
+    +1 après une réponse dont la latence reste sous latency_factor × la meilleure
+    latence observée ; ×0.5 sur 429/503 et ×0.75 quand la latence se dégrade.
+    """
+    
+    def __init__(self, maximum: int, latency_factor: float = 2.0):
+        self.maximum = max(1, maximum)
+        self.limit = float(self.maximum)
+        self.latency_factor = latency_factor
+        self.best_latency: Optional[float] = None
+        self.in_flight = 0
+        self._cond = threading.Condition()
+    
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+    
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+    
+    def on_response(self, latency: float):
+        with self._cond:
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+            if latency > self.best_latency * self.latency_factor:
+                self.limit = max(1.0, self.limit * 0.75)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1)
+            self._cond.notify_all()
+    
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit * 0.5)
+
+# Endpoints de la commande bench et mélange par défaut (poids relatifs)
+BENCH_ENDPOINTS = ('generate', 'statistics', 'test')
+DEFAULT_BENCH_MIX = {'generate': 1, 'statistics': 6, 'test': 3}
+# Date jetable des rapports créés par generate : ses rapports 'generated' ne bloquent ni le
+# daemon ni --resume des vraies dates, et le nettoyage hebdomadaire (> 1 an) les supprime
+BENCH_REPORT_DATE = '2000-01-01'
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """
+    Analyse un mélange de requêtes "generate=1,statistics=6,test=3" (poids relatifs)
+    """
+    mix: Dict[str, float] = {}
+    for part in value.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in BENCH_ENDPOINTS:
+            raise ValueError(f"endpoint inconnu: {name} (valides: {', '.join(BENCH_ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("au moins un poids doit être positif")
+    return mix
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r'\s*')
+# Caractères pouvant suivre une valeur JSON complète
+_VALUE_END = frozenset(' \t\n\r,:]}')
+
+def iter_json_array_items(chunks: Iterator[str], key: str) -> Iterator[Any]:
+    """
+    Itère sur les éléments du tableau `key` d'un objet JSON reçu par morceaux
+    
+    Chaque élément est décodé dès qu'il est complet (raw_decode) puis libéré : la
+    mémoire dépend de la taille d'un élément, pas de celle de la réponse. Les autres
+    clés de premier niveau sont ignorées.
+    """
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+    
+    def fill() -> bool:
+        nonlocal buffer, pos, exhausted
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                return True
+        exhausted = True
+        return False
+    
+    def skip_ws():
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not fill():
+                return
+    
+    def expect(chars: str) -> str:
+        skip_ws()
+        if pos >= len(buffer) or buffer[pos] not in chars:
+            found = buffer[pos:pos + 20] if pos < len(buffer) else 'fin de flux'
+            raise ValueError(f"JSON inattendu (attendu {chars!r}): {found!r}")
+        return buffer[pos]
+    
+    def decode_value() -> Any:
+        nonlocal pos
+        skip_ws()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # Une valeur n'est complète que suivie d'un délimiteur (ou en fin de flux) :
+                # "1" peut encore continuer en "1.5" dans le morceau suivant
+                if exhausted or (end < len(buffer) and buffer[end] in _VALUE_END):
+                    pos = end
+                    return value
+            fill()
+    
+    expect('{')
+    pos += 1
+    if expect('}"') == '}':
+        return
+    while True:
+        name = decode_value()
+        expect(':')
+        pos += 1
+        if name == key and expect('[n') == '[':
+            pos += 1
+            if expect(']' + '{["-0123456789tfn') == ']':
+                pos += 1
+            else:
+                while True:
+                    yield decode_value()
+                    if expect(',]') == ']':
+                        pos += 1
+                        break
+                    pos += 1
+        else:
+            decode_value()
+        if expect(',}') == '}':
+            return
+        pos += 1
+
+REPORT_CSV_FIELDS = [
+    'id', 'sessionId', 'date', 'status', 'childNickname', 'childAge', 'parentEmail', 'sentAt',
+    'modelUsed', 'kpi_assiduite', 'kpi_comprehension', 'kpi_progression', 'focus_score',
+    'total_time_min', 'sessions_count', 'errorMessage',
+]
+
+def report_csv_row(report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aplatit un rapport pour l'export CSV (sans le contenu HTML/texte de l'email)
+    """
+    row = {field: report.get(field) for field in REPORT_CSV_FIELDS}
+    row.update({k: v for k, v in (report.get('session') or {}).items() if k in row})
+    row.update({k: v for k, v in (report.get('kpisSnapshot') or {}).items() if k in row})
+    row['date'] = str(row['date'] or '')[:10]
+    return row
+
+def read_session_ids(path: str) -> List[str]:
+    """
+    Sessions d'un fichier (une par ligne, "-" pour stdin) ; lignes vides, commentaires
+    (#) et doublons ignorés
+    """
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        lines = [line.split('#', 1)[0].strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return list(dict.fromkeys(line for line in lines if line))
+
+def print_test_summary(results: List[Dict[str, Any]], elapsed: float):
+    """
+    Tableau des tests par session (échecs d'abord, puis par latence décroissante) et bilan
+    """
+    width = max([len('session'), *(len(r['sessionId']) for r in results)])
+    print(f"{'session':<{width}}  {'statut':<6}  {'code':<18}  {'latence (ms)':>12}  erreur")
+    for result in sorted(results, key=lambda r: (r['ok'], -r['latency_ms'])):
+        print(
+            f"{result['sessionId']:<{width}}  {'ok' if result['ok'] else 'échec':<6}  {result['status']:<18}  "
+            f"{result['latency_ms']:>12.1f}  {(result['error'] or '').replace(chr(10), ' ')[:80]}".rstrip()
+        )
+    failed = sum(1 for r in results if not r['ok'])
+    summary = latency_summary([r['latency_ms'] / 1000 for r in results], elapsed=elapsed)
+    print(
+        f"\n{len(results)} sessions en {elapsed:.1f}s : {len(results) - failed} réussies, {failed} en échec  "
+        f"(p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, max {summary['max_ms']:.0f} ms)"
+    )
+
+# Latences conservées pour request_latency_summary (les plus récentes)
+REQUEST_LATENCY_WINDOW = 10000
+
+# Suivi des jobs asynchrones : attente longue côté API (plafonnée à 30 s), intervalle
+# minimal entre deux requêtes et erreurs consécutives tolérées avant d'abandonner le suivi
+JOB_POLL_WAIT = 25
+JOB_POLL_MIN_INTERVAL = 2.0
+JOB_POLL_MAX_FAILURES = 8
+
+# Réservation des rapports à envoyer par deliver (minimum) : allongée si besoin pour couvrir
+# l'envoi de tous les rapports réservés au débit minimal ; un rapport non marqué à son
+# expiration (commande interrompue) est repris par la suivante
+DELIVERY_LEASE_SECONDS = 900
+# Âge maximal d'un rapport envoyé mais pas encore marqué (POST /delivered), bien en deçà du bail
+DELIVERY_MARK_MAX_AGE = 60.0
+# Rapports réservés non traités au minimum (réservations par demi-file, pas une par email)
+DELIVERY_MIN_CLAIMED = 16
+
 class DailyReportGenerator:
     def __init__(self):
         self.api_url = os.getenv('CUBEAI_API_URL', 'http://localhost:4000')
         self.api_key = os.getenv('CUBEAI_API_KEY')
         self.timezone = os.getenv('TZ', 'Europe/Paris')
         
+        self.pool_size = int(os.getenv('CUBEAI_HTTP_POOL_SIZE', '10'))
+        self.journal_path = os.getenv(
+            'CUBEAI_REPORTS_JOURNAL',
+            os.path.expanduser('~/.cubeai/daily-reports-journal.db')
+        )
+        self._journal: Optional[ReportJournal] = None
+        self.stats_cache_path = os.getenv(
+            'CUBEAI_STATS_CACHE',
+            os.path.expanduser('~/.cubeai/statistics-cache.db')
+        )
+        self.stats_cache_max_bytes = int(os.getenv('CUBEAI_STATS_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+        self._stats_cache: Optional[StatisticsCache] = None
+        # Jobs asynchrones en cours (generate --async), pour les reprendre après un redémarrage
+        self.jobs_state_path = os.getenv(
+            'CUBEAI_REPORT_JOBS',
+            os.path.expanduser('~/.cubeai/daily-reports-jobs.json')
+        )
+        self.stats_chunk = os.getenv('CUBEAI_STATS_CHUNK', 'month')
+        self.stats_concurrency = int(os.getenv('CUBEAI_STATS_CONCURRENCY', '4'))
+        # False : KPI calculés localement (kpi_aggregation) au lieu de calculate_daily_stats
+        self.server_stats = True
+        # False : l'API génère seulement (statut 'generated'), l'envoi passe par deliver_reports
+        self.deliver_inline = True
+        
         if not self.api_key:
             logger.error("CUBEAI_API_KEY non définie")
             sys.exit(1)
+        
+        # Transport partagé : connexions poolées et keep-alive pour tous les appels
+        self.session = self._create_session(self.pool_size)
+        # Fenêtre bornée : le démon tourne indéfiniment
+        self.request_latencies: deque = deque(maxlen=REQUEST_LATENCY_WINDOW)
+        self._latencies_lock = threading.Lock()
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+    
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """
+        Crée la session HTTP partagée
+        
+        Args:
+            pool_size: Nombre de connexions keep-alive conservées par hôte
+                (0 désactive le keep-alive, pour comparer les latences)
+        
+        Returns:
+            requests.Session configurée
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), pool_block=True)
+        adapter.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Authorization': f'Bearer {self.api_key}'})
+        if pool_size <= 0:
+            session.headers['Connection'] = 'close'
+        return session
+    
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Envoie une requête à l'API via la session poolée, mesure sa latence et
+        l'enregistre comme span (en-tête traceparent transmis à l'API)
+        """
+        endpoint = re.sub(r'^(/api/reports/test)/[^/?]+', r'\1/{session_id}', path)
+        span = TRACER.start_span(f"{method} {endpoint}", method=method, path=path)
+        kwargs['headers'] = {**(kwargs.get('headers') or {}), 'traceparent': span.traceparent}
+        status = 'error'
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.api_url}{path}", **kwargs)
+            status = str(response.status_code)
+            body = response.request.body
+            span.set(
+                status_code=response.status_code,
+                request_bytes=len(body) if body else 0,
+                # Réponse en flux : seule la taille annoncée est connue sans la consommer
+                response_bytes=(int(response.headers['Content-Length']) if 'Content-Length' in response.headers
+                                else None if kwargs.get('stream') else len(response.content)),
+            )
+            return response
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            span.end('ok' if status != 'error' and int(status) < 500 else 'error')
+            with self._latencies_lock:
+                self.request_latencies.append(elapsed)
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=method, endpoint=endpoint, status=status)
+            logger.debug(f"{method} {path} en {elapsed * 1000:.1f} ms")
+    
+    async def _arequest(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Variante asyncio de _request : s'exécute dans un thread et partage le même pool,
+        le sémaphore limitant les requêtes en vol à la taille du pool
+        """
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(max(1, self.pool_size))
+        async with self._async_semaphore:
+            return await asyncio.to_thread(self._request, method, path, **kwargs)
+    
+    @property
+    def journal(self) -> ReportJournal:
+        """
+        Journal des sessions traitées (ouvert à la première utilisation)
+        """
+        if self._journal is None:
+            self._journal = ReportJournal(self.journal_path)
+        return self._journal
+    
+    @property
+    def stats_cache(self) -> StatisticsCache:
+        """
+        Cache des statistiques par jour (ouvert à la première utilisation)
+        """
+        if self._stats_cache is None:
+            self._stats_cache = StatisticsCache(
+                self.stats_cache_path, self.stats_cache_max_bytes, scope=self.api_url.rstrip('/')
+            )
+        return self._stats_cache
+    
+    def invalidate_statistics(self, date: str):
+        """
+        Retire un jour du cache des statistiques après une génération ou un envoi
+        (sans créer le cache s'il n'existe pas encore)
+        """
+        if self._stats_cache is None and not os.path.exists(self.stats_cache_path):
+            return
+        self.stats_cache.invalidate_day(date)
+    
+    def _resolve_date(self, target_date: Optional[str] = None) -> str:
+        """
+        Date cible au format YYYY-MM-DD (aujourd'hui dans le fuseau TZ par défaut)
+        """
+        return target_date or datetime.now(ZoneInfo(self.timezone)).strftime('%Y-%m-%d')
+    
+    def request_latency_summary(self) -> Dict[str, float]:
+        """
+        Résume les latences des REQUEST_LATENCY_WINDOW dernières requêtes (en millisecondes)
+        """
+        with self._latencies_lock:
+            latencies = sorted(self.request_latencies)
+        if not latencies:
+            return {'count': 0}
+        return {
+            'count': len(latencies),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 1),
+            'min_ms': round(latencies[0] * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+        }
+    
+    def _ensure_pool_size(self, concurrency: int):
+        """
+        Agrandit le pool HTTP à `concurrency` connexions, sinon les requêtes
+        simultanées attendent une connexion libre
+        """
+        if self.pool_size < concurrency:
+            self.session.close()
+            self.pool_size = concurrency
+            self.session = self._create_session(concurrency)
+    
+    def close(self):
+        """
+        Ferme les connexions du pool
+        """
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
     
     def generate_reports(self, target_date: Optional[str] = None) -> bool:
         """
@@ -47,26 +787,29 @@ class DailyReportGenerator:
             logger.info(f"🚀 Démarrage de la génération des rapports quotidiens")
             
             # Préparer les données de la requête
-            payload = {}
             if target_date:
-                payload['date'] = target_date
                 logger.info(f"📅 Date cible: {target_date}")
             else:
                 logger.info(f"📅 Date cible: aujourd'hui")
+            payload = self._generate_payload(target_date)
+            if payload is None:
+                return False
             
             # Appeler l'API
-            response = requests.post(
-                f"{self.api_url}/api/reports/generate",
-                json=payload,
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}'
-                },
-                timeout=300  # 5 minutes timeout
-            )
+            try:
+                response = self._request(
+                    'POST',
+                    '/api/reports/generate',
+                    json=payload,
+                    timeout=300  # 5 minutes timeout
+                )
+            finally:
+                self.invalidate_statistics(self._resolve_date(target_date))
             
             if response.status_code == 200:
                 result = response.json()
+                if result.get('results'):
+                    self.journal.record_results(self._resolve_date(target_date), result['results'])
                 logger.info(f"✅ Rapports générés avec succès: {result.get('message', '')}")
                 return True
             else:
@@ -80,27 +823,594 @@ class DailyReportGenerator:
             logger.error(f"❌ Erreur inattendue: {e}")
             return False
     
-    def get_report_statistics(self, start_date: str, end_date: str) -> Optional[Dict[str, Any]]:
+    def _generate_payload(self, target_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
-        Récupère les statistiques des rapports
+        Corps commun de /generate et /jobs (KPI locaux importés au préalable si demandé)
+        """
+        payload = {}
+        if target_date:
+            payload['date'] = target_date
+        if not self.server_stats:
+            if not self.compute_local_kpis(target_date):
+                return None
+            payload['calculateStats'] = False
+        if not self.deliver_inline:
+            payload['deliver'] = False
+        return payload
+    
+    def _load_jobs_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.jobs_state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ État des jobs illisible ({self.jobs_state_path}): {e}")
+            return {}
+    
+    def _save_job_state(self, key: str, job: Optional[Dict[str, Any]]):
+        """
+        Enregistre (ou retire, job=None) le job en cours d'une date, de manière atomique
+        """
+        state = self._load_jobs_state()
+        if job is None:
+            state.pop(key, None)
+        else:
+            state[key] = {'jobId': job['jobId'], 'date': job.get('date'), 'submittedAt': job.get('startedAt')}
+        directory = os.path.dirname(self.jobs_state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.jobs_state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.jobs_state_path)
+    
+    def generate_reports_async(self, target_date: Optional[str] = None) -> bool:
+        """
+        Génère les rapports via un job en arrière-plan de l'API (POST /api/reports/jobs)
+        et suit son avancement par attente longue, sans requête ouverte pendant toute
+        la génération
+        
+        L'identifiant du job est conservé (CUBEAI_REPORT_JOBS) jusqu'à sa fin : relancée
+        après une interruption, la commande reprend le suivi du même job au lieu d'en
+        soumettre un second.
+        
+        Returns:
+            bool: True si le job s'est terminé, False sinon
+        """
+        date = self._resolve_date(target_date)
+        key = f"{self.api_url}|{date}"
+        job = None
+        try:
+            job_id = self._load_jobs_state().get(key, {}).get('jobId')
+            if job_id:
+                response = self._request('GET', f'/api/reports/jobs/{job_id}', timeout=30)
+                if response.status_code == 200:
+                    job = response.json()
+                    logger.info(f"🔗 Reprise du suivi du job {job_id} ({date})")
+                elif response.status_code == 404:
+                    job = {'jobId': job_id, 'status': 'lost'}
+                else:
+                    logger.error(f"❌ Erreur API: {response.status_code} - {response.text}")
+                    return False
+            
+            # Registre des jobs en mémoire côté API : un job perdu (API redémarrée) est
+            # resoumis une fois, sans risque puisque la génération ignore les rapports déjà faits ;
+            # perdu de nouveau, le suivi est abandonné (qu'il ait été repris ou soumis ici)
+            resubmitted = False
+            while job is None or job['status'] == 'lost':
+                if job is not None:
+                    self._save_job_state(key, None)
+                    if resubmitted:
+                        logger.error(f"❌ Job {job['jobId']} de nouveau introuvable, abandon du suivi")
+                        return False
+                    logger.warning(f"⚠️ Job {job['jobId']} introuvable (API redémarrée ?), nouvelle soumission")
+                    resubmitted = True
+                job = self._submit_job(key, date, target_date)
+                if job is None:
+                    return False
+                job = self._wait_for_job(job)
+                if job is None:
+                    return False
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Erreur de connexion à l'API: {e}")
+            return False
+        except KeyboardInterrupt:
+            logger.warning("⏸️ Suivi interrompu ; le job continue côté API, relancez la commande pour le reprendre")
+            return False
+        
+        self._save_job_state(key, None)
+        self.invalidate_statistics(date)
+        if job['status'] != 'completed':
+            logger.error(f"❌ Job {job['jobId']} en échec: {job.get('error', 'erreur inconnue')}")
+            return False
+        self.journal.record_results(date, job.get('results') or {})
+        logger.info(
+            f"✅ Rapports générés: {job['succeeded']} réussis, {job['failed']} en échec "
+            f"en {job['elapsedMs'] / 1000:.1f}s ({job['sessionsPerMinute']} sessions/min)"
+        )
+        return True
+    
+    def _submit_job(self, key: str, date: str, target_date: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Soumet le job de génération de la date (POST /api/reports/jobs) et le conserve
+        
+        Returns:
+            Le job soumis (ou le job identique déjà en cours), None en cas d'erreur API
+        """
+        logger.info(f"🚀 Soumission du job de génération des rapports du {date}")
+        payload = self._generate_payload(target_date)
+        if payload is None:
+            return None
+        payload['date'] = date
+        response = self._request('POST', '/api/reports/jobs', json=payload, timeout=30)
+        if response.status_code not in (200, 202):
+            logger.error(f"❌ Erreur API: {response.status_code} - {response.text}")
+            return None
+        job = response.json()
+        self._save_job_state(key, job)
+        if response.status_code == 200:
+            logger.info(f"🔗 Job identique déjà en cours: {job['jobId']}")
+        else:
+            logger.info(f"📨 Job {job['jobId']} soumis")
+        return job
+    
+    def _wait_for_job(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Suit un job jusqu'à sa fin (GET /jobs/:id?wait=&since=) en journalisant l'avancement
+        
+        Les erreurs réseau ou 5xx sont retentées avec backoff : la génération se poursuit
+        côté API indépendamment du client.
+        
+        Returns:
+            Le job terminé, le job au statut 'lost' s'il est introuvable (API redémarrée),
+            ou None si le suivi est abandonné (API injoignable)
+        """
+        failures = 0
+        last_logged = None
+        while True:
+            progress = (job['succeeded'], job['failed'], job['total'])
+            if job['status'] == 'running' and progress != last_logged:
+                last_logged = progress
+                done = job['succeeded'] + job['failed']
+                rate = job['sessionsPerMinute']
+                eta = ''
+                if rate and job['remaining']:
+                    eta_s = job['remaining'] / rate * 60
+                    eta = f", fin estimée dans {eta_s:.0f}s" if eta_s < 120 else f", fin estimée dans {eta_s / 60:.0f} min"
+                logger.info(
+                    f"⏳ Job {job['jobId']}: {done}/{job['total']} sessions "
+                    f"({job['failed']} en échec, {job['remaining']} restantes) - {rate} sessions/min{eta}"
+                )
+            if job['status'] != 'running':
+                return job
+            
+            # Au plus une requête toutes les JOB_POLL_MIN_INTERVAL secondes, même si le job avance vite
+            time.sleep(JOB_POLL_MIN_INTERVAL)
+            try:
+                response = self._request(
+                    'GET', f"/api/reports/jobs/{job['jobId']}",
+                    params={'wait': JOB_POLL_WAIT, 'since': job['version']},
+                    timeout=JOB_POLL_WAIT + 30,
+                )
+            except requests.exceptions.RequestException as e:
+                response = None
+                error = str(e)
+            if response is not None and response.status_code == 200:
+                job = response.json()
+                failures = 0
+                continue
+            if response is not None and response.status_code == 404:
+                return {**job, 'status': 'lost'}
+            if response is not None:
+                error = f"{response.status_code} - {response.text[:200]}"
+            failures += 1
+            if failures >= JOB_POLL_MAX_FAILURES:
+                logger.error(f"❌ API injoignable ({error}) ; le job {job['jobId']} continue, "
+                             f"relancez la commande pour reprendre son suivi")
+                return None
+            delay = min(30.0, 2.0 ** failures)
+            logger.warning(f"⚠️ Suivi du job {job['jobId']}: {error}, nouvel essai dans {delay:.0f}s")
+            time.sleep(delay)
+    
+    def compute_local_kpis(self, target_date: Optional[str] = None) -> bool:
+        """
+        Calcule les KPI du jour de toutes les sessions en local et les importe en bloc
+        
+        Export en colonnes (GET /api/reports/kpi-inputs), calcul par kpi_aggregation,
+        import (PUT /api/reports/kpis) : l'API ne fait plus que la génération des textes.
+        
+        Returns:
+            bool: True si les KPI ont été importés, False sinon
+        """
+        date = self._resolve_date(target_date)
+        try:
+            response = self._request('GET', '/api/reports/kpi-inputs', params={'date': date}, timeout=300)
+            if response.status_code != 200:
+                logger.error(f"❌ Erreur lors de l'export des données KPI: {response.status_code} - {response.text}")
+                return False
+            start = time.perf_counter()
+            rows = compute_daily_kpis(response.json())
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            
+            response = self._request('PUT', '/api/reports/kpis', json={'date': date, 'stats': rows}, timeout=300)
+            if response.status_code != 200:
+                logger.error(f"❌ Erreur lors de l'import des KPI: {response.status_code} - {response.text}")
+                return False
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Erreur de connexion à l'API: {e}")
+            return False
+        
+        logger.info(f"📊 KPI du {date} calculés localement: {len(rows)} sessions en {elapsed_ms:.0f} ms")
+        return True
+    
+    def _prepare_sessions(self, target_date: Optional[str] = None,
+                          calculate_stats: Optional[bool] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Appelle /api/reports/prepare et renvoie les sessions éligibles
+        (id, emailTime, emailFrequency)
         
         Args:
-            start_date: Date de début au format YYYY-MM-DD
-            end_date: Date de fin au format YYYY-MM-DD
+            calculate_stats: Calcul des statistiques côté API (défaut: server_stats ;
+                sinon les KPI sont d'abord calculés localement)
+        """
+        if calculate_stats is None:
+            calculate_stats = self.server_stats
+            if not calculate_stats and not self.compute_local_kpis(target_date):
+                return None
+        try:
+            payload: Dict[str, Any] = {}
+            if target_date:
+                payload['date'] = target_date
+            if not calculate_stats:
+                payload['calculateStats'] = False
+            
+            response = self._request(
+                'POST',
+                '/api/reports/prepare',
+                json=payload,
+                timeout=300
+            )
+            
+            if response.status_code == 200:
+                return response.json().get('sessions', [])
+            else:
+                logger.error(f"❌ Erreur lors de la liste des sessions: {response.status_code} - {response.text}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la liste des sessions: {e}")
+            return None
+    
+    def list_eligible_sessions(self, target_date: Optional[str] = None) -> Optional[List[str]]:
+        """
+        Calcule les statistiques du jour et liste les sessions éligibles aux rapports
+        
+        Args:
+            target_date: Date au format YYYY-MM-DD (optionnel)
         
         Returns:
-            Dict avec les statistiques ou None en cas d'erreur
+            Liste des IDs de session ou None en cas d'erreur
+        """
+        sessions = self._prepare_sessions(target_date)
+        return None if sessions is None else [s['id'] for s in sessions]
+    
+    def list_scheduled_sessions(self, target_date: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Planning d'envoi des sessions pour une date, sans recalcul des statistiques
         """
+        return self._prepare_sessions(target_date, calculate_stats=False)
+    
+    def _generate_shard(self, shard_index: int, session_ids: List[str],
+                        target_date: Optional[str] = None,
+                        calculate_stats: bool = False) -> Dict[str, Any]:
+        """
+        Génère les rapports d'un shard (une requête pour un sous-ensemble de sessions)
+        
+        Args:
+            calculate_stats: Recalcule les statistiques du jour avant la génération
+                (lot du démon dont le calcul par /prepare a échoué)
+        
+        Returns:
+            Dict avec les sessions réussies et en échec
+        """
+        payload: Dict[str, Any] = {'sessionIds': session_ids}
+        if target_date:
+            payload['date'] = target_date
+        if calculate_stats:
+            payload['calculateStats'] = True
+        if not self.deliver_inline:
+            payload['deliver'] = False
+        
         try:
-            response = requests.get(
-                f"{self.api_url}/api/reports/statistics",
+            response = self._request(
+                'POST',
+                '/api/reports/generate',
+                json=payload,
+                timeout=300
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Shard {shard_index}: erreur de connexion à l'API: {e}")
+            return {'succeeded': [], 'failed': [{'sessionId': sid, 'error': str(e)} for sid in session_ids]}
+        finally:
+            self.invalidate_statistics(self._resolve_date(target_date))
+        
+        if response.status_code != 200:
+            logger.error(f"❌ Shard {shard_index}: erreur API {response.status_code} - {response.text}")
+            error = f"HTTP {response.status_code}"
+            return {'succeeded': [], 'failed': [{'sessionId': sid, 'error': error} for sid in session_ids]}
+        
+        results = response.json().get('results') or {}
+        results.setdefault('succeeded', [])
+        results.setdefault('failed', [])
+        logger.info(
+            f"✅ Shard {shard_index}: {len(results['succeeded'])} réussis, "
+            f"{len(results['failed'])} en échec ({len(session_ids)} sessions)"
+        )
+        return results
+    
+    def generate_reports_sharded(self, target_date: Optional[str] = None,
+                                 shards: int = 4, concurrency: int = 4) -> bool:
+        """
+        Génère les rapports en répartissant les sessions en shards traités en parallèle
+        
+        Chaque shard est une requête /api/reports/generate indépendante : une session
+        lente ou un shard en échec ne fait plus échouer tout le lot.
+        
+        Args:
+            target_date: Date au format YYYY-MM-DD (optionnel)
+            shards: Nombre de shards (requêtes) à envoyer
+            concurrency: Nombre maximum de requêtes simultanées
+        
+        Returns:
+            bool: True si toutes les sessions ont réussi, False sinon
+        """
+        logger.info(f"🚀 Génération shardée: {shards} shards, {concurrency} requêtes simultanées")
+        
+        session_ids = self.list_eligible_sessions(target_date)
+        if session_ids is None:
+            return False
+        if not session_ids:
+            logger.info("📭 Aucune session éligible")
+            return True
+        
+        shards = max(1, min(shards, len(session_ids)))
+        shard_lists = [session_ids[i::shards] for i in range(shards)]
+        logger.info(f"📧 {len(session_ids)} sessions réparties en {shards} shards")
+        
+        succeeded: List[str] = []
+        failed: List[Dict[str, str]] = []
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [
+                executor.submit(self._generate_shard, index, ids, target_date)
+                for index, ids in enumerate(shard_lists)
+            ]
+            journal_date = self._resolve_date(target_date)
+            for future in as_completed(futures):
+                results = future.result()
+                self.journal.record_results(journal_date, results)
+                succeeded.extend(results['succeeded'])
+                failed.extend(results['failed'])
+        
+        logger.info(f"📊 Bilan: {len(succeeded)} réussis, {len(failed)} en échec")
+        logger.info(f"⏱️ Latences HTTP: {self.request_latency_summary()}")
+        for failure in failed:
+            logger.error(f"❌ Session {failure.get('sessionId')}: {failure.get('error')}")
+        return not failed
+    
+    def _generate_session_with_backoff(self, session_id: str, date: str,
+                                       max_attempts: int = 4, base_delay: float = 2.0) -> Optional[str]:
+        """
+        Génère le rapport d'une session avec backoff exponentiel
+        
+        Chaque tentative passe par sessionIds : l'API ignore une session dont le rapport
+        du jour est déjà envoyé ou généré, une tentative dont la réponse a été perdue ne
+        produit donc pas de second rapport.
+        
+        Returns:
+            None si succès, sinon le message de la dernière erreur
+        """
+        payload: Dict[str, Any] = {'date': date, 'sessionIds': [session_id]}
+        if not self.deliver_inline:
+            payload['deliver'] = False
+        error = None
+        for attempt in range(max_attempts):
+            if attempt:
+                delay = base_delay * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+                logger.info(f"🔁 Session {session_id}: nouvelle tentative dans {delay:.1f}s")
+                time.sleep(delay)
+            try:
+                response = self._request(
+                    'POST',
+                    '/api/reports/generate',
+                    json=payload,
+                    timeout=300
+                )
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+                continue
+            
+            if response.status_code == 200:
+                results = response.json().get('results') or {}
+                failures = results.get('failed') or []
+                if not failures:
+                    return None
+                error = failures[0].get('error')
+            elif response.status_code < 500 and response.status_code != 429:
+                # Erreur client : inutile de réessayer
+                return f"HTTP {response.status_code}"
+            else:
+                error = f"HTTP {response.status_code}"
+        return error
+    
+    def resume_reports(self, target_date: Optional[str] = None, concurrency: int = 4,
+                       max_attempts: int = 4) -> bool:
+        """
+        Reprend une génération interrompue : seules les sessions absentes du journal
+        ou en échec sont relancées
+        
+        Args:
+            target_date: Date au format YYYY-MM-DD (optionnel)
+            concurrency: Nombre maximum de sessions relancées simultanément
+            max_attempts: Nombre de tentatives par session
+        
+        Returns:
+            bool: True si toutes les sessions restantes ont réussi, False sinon
+        """
+        date = self._resolve_date(target_date)
+        session_ids = self.list_eligible_sessions(date)
+        if session_ids is None:
+            return False
+        
+        completed = self.journal.completed_sessions(date)
+        remaining = [sid for sid in session_ids if sid not in completed]
+        logger.info(
+            f"🔄 Reprise du {date}: {len(completed)} sessions déjà traitées, "
+            f"{len(remaining)} à relancer"
+        )
+        
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {
+                executor.submit(self._generate_session_with_backoff, sid, date, max_attempts): sid
+                for sid in remaining
+            }
+            for future in as_completed(futures):
+                session_id = futures[future]
+                error = future.result()
+                if error is None:
+                    self.journal.record(date, session_id, 'succeeded')
+                else:
+                    failed += 1
+                    self.journal.record(date, session_id, 'failed', error)
+                    logger.error(f"❌ Session {session_id}: {error}")
+        self.invalidate_statistics(date)
+        
+        logger.info(f"📊 Reprise terminée: {len(remaining) - failed} réussis, {failed} en échec")
+        return failed == 0
+    
+    def _generate_date(self, date: str, limiter: AdaptiveConcurrency,
+                       max_attempts: int = 4, base_delay: float = 5.0) -> Dict[str, Any]:
+        """
+        Génère les rapports d'une date (rattrapage), en respectant Retry-After sur 429/503
+        
+        Une nouvelle tentative (même après un timeout alors que la première requête tourne
+        encore côté API) ne renvoie aucun rapport : l'API ignore les sessions dont le
+        rapport du jour est envoyé, généré ou en cours de génération.
+        
+        Returns:
+            Dict résumé: date, ok, succeeded, failed, attempts, seconds, error
+        """
+        summary: Dict[str, Any] = {'date': date, 'ok': False, 'succeeded': 0, 'failed': 0,
+                                   'attempts': 0, 'seconds': 0.0, 'error': None}
+        start = time.perf_counter()
+        payload: Dict[str, Any] = {'date': date}
+        if not self.server_stats:
+            if not self.compute_local_kpis(date):
+                summary['error'] = 'KPI locaux indisponibles'
+                return summary
+            payload['calculateStats'] = False
+        if not self.deliver_inline:
+            payload['deliver'] = False
+        for attempt in range(max_attempts):
+            summary['attempts'] = attempt + 1
+            delay = base_delay * (2 ** attempt) * (1 + random.random() * 0.25)
+            limiter.acquire()
+            request_start = time.perf_counter()
+            try:
+                response = self._request('POST', '/api/reports/generate', json=payload, timeout=300)
+            except requests.exceptions.RequestException as e:
+                summary['error'] = str(e)
+                limiter.release()
+                time.sleep(delay)
+                continue
+            latency = time.perf_counter() - request_start
+            limiter.release()
+            
+            if response.status_code in (429, 503):
+                limiter.on_throttle()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                wait = delay if retry_after is None else retry_after
+                summary['error'] = f"HTTP {response.status_code}"
+                logger.warning(
+                    f"⏳ {date}: HTTP {response.status_code}, nouvelle tentative dans {wait:.0f}s "
+                    f"(concurrence {int(limiter.limit)})"
+                )
+                time.sleep(wait)
+                continue
+            
+            limiter.on_response(latency)
+            if response.status_code == 200:
+                results = response.json().get('results') or {}
+                if results:
+                    self.journal.record_results(date, results)
+                summary.update(
+                    ok=not results.get('failed'),
+                    succeeded=len(results.get('succeeded', [])),
+                    failed=len(results.get('failed', [])),
+                    error=None,
+                )
+                break
+            summary['error'] = f"HTTP {response.status_code}"
+            if response.status_code < 500:
+                # Erreur client : inutile de réessayer
+                break
+            time.sleep(delay)
+        self.invalidate_statistics(date)
+        summary['seconds'] = round(time.perf_counter() - start, 1)
+        return summary
+    
+    def generate_reports_range(self, start_date: str, end_date: str, concurrency: int = 4,
+                               max_attempts: int = 4) -> bool:
+        """
+        Rattrapage : génère les rapports de chaque date de la plage, plusieurs dates à la fois
+        
+        La concurrence (au plus `concurrency`) s'adapte aux latences et aux 429/503
+        renvoyés par l'API (voir AdaptiveConcurrency).
+        
+        Returns:
+            bool: True si toutes les dates ont réussi, False sinon
+        """
+        dates = date_range(start_date, end_date)
+        logger.info(f"🚀 Rattrapage du {start_date} au {end_date}: {len(dates)} dates, jusqu'à {concurrency} en parallèle")
+        limiter = AdaptiveConcurrency(concurrency)
+        summaries: List[Dict[str, Any]] = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(self._generate_date, d, limiter, max_attempts) for d in dates]
+            for future in as_completed(futures):
+                summary = future.result()
+                summaries.append(summary)
+                status = '✅' if summary['ok'] else '❌'
+                logger.info(
+                    f"{status} {summary['date']}: {summary['succeeded']} réussis, {summary['failed']} en échec, "
+                    f"{summary['attempts']} tentative(s), {summary['seconds']}s"
+                    + (f" ({summary['error']})" if summary['error'] else '')
+                )
+        
+        logger.info(f"📊 Bilan du rattrapage ({time.perf_counter() - start:.0f}s, concurrence finale {int(limiter.limit)}):")
+        for summary in sorted(summaries, key=lambda s: s['date']):
+            logger.info(
+                f"   {summary['date']}  {'ok    ' if summary['ok'] else 'ÉCHEC '}"
+                f"{summary['succeeded']:>5} réussis {summary['failed']:>5} en échec  {summary['seconds']:>7}s"
+            )
+        return all(summary['ok'] for summary in summaries)
+    
+    def _fetch_statistics(self, start_date: str, end_date: str) -> Optional[Dict[str, Any]]:
+        """
+        Appelle /api/reports/statistics pour une plage
+        
+        Returns:
+            Réponse de l'API ou None en cas d'erreur
+        """
+        try:
+            response = self._request(
+                'GET',
+                '/api/reports/statistics',
                 params={
                     'startDate': start_date,
                     'endDate': end_date
                 },
-                headers={
-                    'Authorization': f'Bearer {self.api_key}'
-                },
                 timeout=60
             )
             
@@ -114,6 +1424,463 @@ class DailyReportGenerator:
             logger.error(f"❌ Erreur lors de la récupération des statistiques: {e}")
             return None
     
+    def _fetch_statistics_chunks(self, chunks: List[tuple]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Récupère plusieurs sous-plages en parallèle (au plus stats_concurrency à la fois)
+        
+        Returns:
+            Liste des rapports de toutes les sous-plages, ou None si l'une échoue
+        """
+        if not chunks:
+            return []
+        reports: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.stats_concurrency, len(chunks)))) as executor:
+            for result in executor.map(lambda chunk: self._fetch_statistics(*chunk), chunks):
+                if result is None:
+                    return None
+                reports.extend(result.get('reports', []))
+        return reports
+    
+    def get_report_statistics(self, start_date: str, end_date: str,
+                              use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Récupère les statistiques des rapports
+        
+        Les jours révolus sont servis depuis le cache local ; seuls les jours
+        manquants (et toujours aujourd'hui) sont demandés à l'API, découpés par
+        semaine ou par mois (CUBEAI_STATS_CHUNK) et récupérés en parallèle, puis
+        les statistiques sont recalculées sur l'ensemble de la plage.
+        
+        Args:
+            start_date: Date de début au format YYYY-MM-DD
+            end_date: Date de fin au format YYYY-MM-DD
+            use_cache: False pour tout redemander à l'API
+        
+        Returns:
+            Dict avec les statistiques ou None en cas d'erreur
+        """
+        if not use_cache:
+            reports = self._fetch_statistics_chunks(split_range(start_date, end_date, self.stats_chunk))
+            if reports is None:
+                return None
+            reports.sort(key=lambda r: str(r.get('date', '')), reverse=True)
+            return {'success': True, 'reports': reports, 'statistics': summarize_reports(reports)}
+        
+        today = self._resolve_date()
+        days = date_range(start_date, end_date)
+        past_days = [day for day in days if day < today]
+        cached = self.stats_cache.get_days(past_days)
+        missing = [day for day in days if day not in cached]
+        logger.debug(f"🗄️ Statistiques: {len(cached)} jours en cache, {len(missing)} à récupérer")
+        
+        chunks = [
+            chunk
+            for run_start, run_end in contiguous_runs(missing)
+            for chunk in split_range(run_start, run_end, self.stats_chunk)
+        ]
+        fetched_reports = self._fetch_statistics_chunks(chunks)
+        if fetched_reports is None:
+            return None
+        
+        fetched: Dict[str, List[Dict[str, Any]]] = {day: [] for day in missing}
+        for report in fetched_reports:
+            fetched.setdefault(str(report.get('date', ''))[:10], []).append(report)
+        self.stats_cache.put_days({day: r for day, r in fetched.items() if day < today})
+        
+        reports_by_day: Dict[str, List[Dict[str, Any]]] = dict(cached)
+        reports_by_day.update(fetched)
+        reports = [r for day in sorted(reports_by_day, reverse=True) for r in reports_by_day[day]]
+        return {'success': True, 'reports': reports, 'statistics': summarize_reports(reports)}
+    
+    def stream_report_statistics(self, start_date: str, end_date: str, out: TextIO,
+                                 fmt: str = 'ndjson') -> Optional[Dict[str, Any]]:
+        """
+        Exporte les rapports de la plage ligne par ligne (NDJSON ou CSV) sans les
+        garder en mémoire
+        
+        Les sous-plages (CUBEAI_STATS_CHUNK) sont lues dans l'ordre, de la plus récente
+        à la plus ancienne, en flux compressé (gzip) ; chaque rapport est écrit dès
+        qu'il est décodé. Le cache local n'est pas utilisé.
+        
+        Returns:
+            Bloc "statistics" recalculé sur les rapports exportés, ou None en cas d'erreur
+        """
+        writer = None
+        if fmt == 'csv':
+            writer = csv.DictWriter(out, fieldnames=REPORT_CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+        totals = {'count': 0, 'sent': 0, 'failed': 0, 'comprehension': 0.0, 'progression': 0.0}
+        
+        def open_stream(chunk: tuple) -> requests.Response:
+            return self._request(
+                'GET',
+                '/api/reports/statistics',
+                params={'startDate': chunk[0], 'endDate': chunk[1], 'stream': '1'},
+                headers={'Accept-Encoding': 'gzip'},
+                stream=True,
+                timeout=60
+            )
+        
+        # Les requêtes suivantes sont lancées pendant la lecture de la réponse courante
+        # (au plus stats_concurrency ouvertes) ; les rapports restent écrits dans l'ordre
+        chunks = list(reversed(split_range(start_date, end_date, self.stats_chunk)))
+        lookahead = max(1, self.stats_concurrency)
+        executor = ThreadPoolExecutor(max_workers=lookahead)
+        pending = [executor.submit(open_stream, chunk) for chunk in chunks[:lookahead]]
+        try:
+            for index, (chunk_start, chunk_end) in enumerate(chunks):
+                future = pending.pop(0)
+                if index + lookahead < len(chunks):
+                    pending.append(executor.submit(open_stream, chunks[index + lookahead]))
+                try:
+                    with future.result() as response:
+                        if response.status_code != 200:
+                            logger.error(f"❌ Erreur lors de la récupération des statistiques: {response.status_code}")
+                            return None
+                        decoder = codecs.getincrementaldecoder('utf-8')()
+                        text_chunks = (decoder.decode(block) for block in response.iter_content(64 * 1024))
+                        for report in iter_json_array_items(text_chunks, 'reports'):
+                            if writer is not None:
+                                writer.writerow(report_csv_row(report))
+                            else:
+                                out.write(json.dumps(report, ensure_ascii=False) + '\n')
+                            snapshot = report.get('kpisSnapshot') or {}
+                            totals['count'] += 1
+                            totals['sent'] += report.get('status') == 'sent'
+                            totals['failed'] += report.get('status') == 'failed'
+                            totals['comprehension'] += snapshot.get('kpi_comprehension', 0)
+                            totals['progression'] += snapshot.get('kpi_progression', 0)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    logger.error(f"❌ Erreur lors de la récupération des statistiques ({chunk_start} → {chunk_end}): {e}")
+                    return None
+        finally:
+            # Interruption : les réponses déjà ouvertes sont fermées sans être lues
+            for future in pending:
+                future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+            executor.shutdown(wait=False)
+        
+        out.flush()
+        count = totals['count']
+        return {
+            'totalReports': count,
+            'sentReports': totals['sent'],
+            'failedReports': totals['failed'],
+            'averageComprehension': totals['comprehension'] / count if count else 0,
+            'averageProgression': totals['progression'] / count if count else 0,
+        }
+    
+    def _mark_delivered(self, sent: List[str], failed: List[Dict[str, str]],
+                        released: Optional[List[str]] = None, max_attempts: int = 3) -> bool:
+        """
+        Marque un lot de rapports envoyés / refusés / à renvoyer (POST /api/reports/delivered)
+        
+        Un rapport livré mais non marqué serait repris à l'expiration de sa réservation
+        et renvoyé : la requête est donc retentée avec backoff.
+        """
+        released = released or []
+        count = len(sent) + len(failed) + len(released)
+        for attempt in range(max_attempts):
+            if attempt:
+                time.sleep(2 ** attempt)
+            try:
+                response = self._request(
+                    'POST', '/api/reports/delivered',
+                    json={'sent': sent, 'failed': failed, 'released': released}, timeout=60
+                )
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"⚠️ Marquage de {count} rapports: {e}")
+                continue
+            if response.status_code == 200:
+                return True
+            logger.warning(f"⚠️ Marquage de {count} rapports: HTTP {response.status_code}")
+        return False
+    
+    def deliver_reports(self, target_date: Optional[str] = None, concurrency: int = 4,
+                        page_size: int = 200, mark_batch: int = 100) -> bool:
+        """
+        Envoie les rapports générés mais pas encore envoyés d'une date
+        
+        Les rapports sont réservés (POST /api/reports/pending/claim : deux commandes
+        deliver simultanées se partagent les rapports sans doublon) au fur et à mesure que
+        les `concurrency` connexions SMTP persistantes de l'identité noreply (EMAIL_CONFIG
+        de send_welcome_email.py, avec son contrôle de débit) peuvent les prendre : au plus
+        max(16, 2 × concurrency) rapports réservés non envoyés, par requêtes d'au plus page_size. Le
+        bail couvre leur envoi au débit minimal du contrôleur, même sous limitation. Ils
+        sont marqués envoyés par lots de mark_batch (ou après DELIVERY_MARK_MAX_AGE).
+        Un refus définitif (5xx) marque le rapport 'failed' ; une erreur temporaire le
+        rend disponible ('generated') pour le prochain passage.
+        
+        Returns:
+            bool: True si tous les rapports ont été envoyés et marqués
+        """
+        date = self._resolve_date(target_date)
+        try:
+            senders = [BulkSender('noreply') for _ in range(max(1, concurrency))]
+        except ValueError as e:
+            logger.error(f"❌ Configuration SMTP noreply invalide: {e}")
+            return False
+        from_address = get_from_address('noreply')
+        
+        # Rapports réservés non encore traités (en file ou en cours d'envoi) : une place
+        # libérée par rapport traité, une réservation seulement pour les places libres
+        capacity = max(DELIVERY_MIN_CLAIMED, 2 * len(senders))
+        slots = threading.Semaphore(capacity)
+        lease_seconds = max(
+            DELIVERY_LEASE_SECONDS,
+            math.ceil(2 * capacity / SendRateController.MIN_RATE + DELIVERY_MARK_MAX_AGE),
+        )
+        pending: queue.Queue = queue.Queue()
+        lock = threading.Lock()
+        marks: Dict[str, list] = {'sent': [], 'failed': [], 'released': []}
+        counts = {'sent': 0, 'failed': 0, 'retry': 0, 'unmarked': 0}
+        oldest_mark: List[Optional[float]] = [None]
+        
+        def flush(force: bool = False):
+            with lock:
+                size = sum(len(ids) for ids in marks.values())
+                stale = oldest_mark[0] is not None and time.monotonic() - oldest_mark[0] >= DELIVERY_MARK_MAX_AGE
+                if not force and size < mark_batch and not stale:
+                    return
+                sent, failed, released = marks['sent'], marks['failed'], marks['released']
+                marks['sent'], marks['failed'], marks['released'] = [], [], []
+                oldest_mark[0] = None
+            if (sent or failed or released) and not self._mark_delivered(sent, failed, released):
+                logger.error(f"❌ {len(sent) + len(failed) + len(released)} rapports traités mais non marqués")
+                with lock:
+                    counts['unmarked'] += len(sent) + len(failed)
+        
+        def send_loop(sender: BulkSender):
+            with sender:
+                while True:
+                    report = pending.get()
+                    if report is None:
+                        return
+                    try:
+                        msg = EmailMessage()
+                        msg['From'] = from_address
+                        msg['To'] = report['parentEmail']
+                        msg['Subject'] = report['subject']
+                        msg.set_content(report['textContent'])
+                        msg.add_alternative(report['htmlContent'], subtype='html')
+                        sender.send(msg)
+                    except Exception as e:
+                        # Erreurs réseau/SMTP temporaires : le rapport reste à envoyer ;
+                        # refus 5xx ou rapport inexploitable : marqué 'failed'
+                        permanent = is_permanent_smtp_error(e) or not isinstance(e, OSError)
+                        logger.error(f"❌ Rapport {report['id']} ({report.get('parentEmail')}): {e}")
+                        with lock:
+                            if permanent:
+                                marks['failed'].append({'id': report['id'], 'error': str(e)[:1000]})
+                                counts['failed'] += 1
+                            else:
+                                marks['released'].append(report['id'])
+                                counts['retry'] += 1
+                    else:
+                        with lock:
+                            marks['sent'].append(report['id'])
+                            counts['sent'] += 1
+                    with lock:
+                        if oldest_mark[0] is None:
+                            oldest_mark[0] = time.monotonic()
+                    slots.release()
+                    flush()
+        
+        logger.info(f"📬 Envoi des rapports du {date} ({len(senders)} connexions SMTP)")
+        start = time.perf_counter()
+        workers = [
+            threading.Thread(target=send_loop, args=(sender,), name=f"deliver-{index}", daemon=True)
+            for index, sender in enumerate(senders)
+        ]
+        for worker in workers:
+            worker.start()
+        
+        after: Optional[str] = None
+        listed = True
+        try:
+            while True:
+                # Réservation par demi-file : on attend que la moitié des places soit libre
+                # (moins de requêtes), puis on prend aussi celles déjà libérées
+                wanted = min(page_size, capacity)
+                free = 0
+                while free < max(1, wanted // 2) and any(worker.is_alive() for worker in workers):
+                    if slots.acquire(timeout=1.0):
+                        free += 1
+                if free < max(1, wanted // 2):
+                    logger.error("❌ Connexions d'envoi arrêtées")
+                    listed = False
+                    break
+                while free < wanted and slots.acquire(blocking=False):
+                    free += 1
+                payload = {'date': date, 'limit': free, 'leaseSeconds': lease_seconds}
+                if after:
+                    payload['after'] = after
+                try:
+                    response = self._request('POST', '/api/reports/pending/claim', json=payload, timeout=60)
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"❌ Erreur de connexion à l'API: {e}")
+                    listed = False
+                    break
+                if response.status_code != 200:
+                    logger.error(f"❌ Erreur API: {response.status_code} - {response.text}")
+                    listed = False
+                    break
+                reports = response.json().get('reports') or []
+                for _ in range(free - len(reports)):
+                    slots.release()
+                if not reports:
+                    break
+                for report in reports:
+                    pending.put(report)
+                after = reports[-1]['id']
+        finally:
+            for _ in workers:
+                pending.put(None)
+            for worker in workers:
+                worker.join()
+            flush(force=True)
+            self.invalidate_statistics(date)
+        
+        elapsed = time.perf_counter() - start
+        rate = counts['sent'] / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"📧 {counts['sent']} rapports envoyés, {counts['failed']} refusés, "
+            f"{counts['retry']} à réessayer, {counts['unmarked']} non marqués "
+            f"en {elapsed:.1f}s ({rate:.1f}/s)"
+        )
+        return listed and not (counts['failed'] or counts['retry'] or counts['unmarked'])
+    
+    def run_load_test(self, mix: Dict[str, float], concurrency: int = 8, duration: float = 60.0,
+                      ramp_up: float = 0.0, session_ids: Optional[List[str]] = None,
+                      target_date: Optional[str] = None, stats_days: int = 30,
+                      deliver: bool = False, report_date: str = BENCH_REPORT_DATE) -> Dict[str, Any]:
+        """
+        Test de charge des endpoints de rapports (boucle fermée de `concurrency` clients)
+        
+        Chaque client tire un endpoint selon les poids de `mix` et enchaîne les requêtes
+        jusqu'à la fin de `duration` ; les clients démarrent progressivement sur `ramp_up`
+        secondes. generate et test visent une seule session (tirée dans session_ids) à la
+        date jetable report_date et, sauf deliver=True, demandent deliver: false pour ne
+        pas envoyer d'emails. generate étant idempotent, seul le premier appel par session
+        génère vraiment : les suivants mesurent le chemin "rapport déjà généré".
+        
+        Returns:
+            Dict par endpoint (et "all") : latency_summary + codes HTTP
+        """
+        date = self._resolve_date(target_date)
+        needs_sessions = mix.get('generate', 0) > 0 or mix.get('test', 0) > 0
+        if needs_sessions and not session_ids:
+            session_ids = self.list_eligible_sessions(date) if self.server_stats else None
+            session_ids = session_ids or [s['id'] for s in (self.list_scheduled_sessions(date) or [])]
+            if not session_ids:
+                raise ValueError("aucune session disponible pour generate/test (utiliser --sessions)")
+        self._ensure_pool_size(concurrency)
+        
+        end_day = datetime.strptime(date, '%Y-%m-%d').date()
+        stats_params = {
+            'startDate': (end_day - timedelta(days=max(1, stats_days) - 1)).isoformat(),
+            'endDate': end_day.isoformat(),
+        }
+        names = [name for name, weight in mix.items() if weight > 0]
+        weights = [mix[name] for name in names]
+        
+        def call(name: str, rng: random.Random) -> requests.Response:
+            if name == 'statistics':
+                return self._request('GET', '/api/reports/statistics', params=stats_params, timeout=120)
+            session_id = rng.choice(session_ids)
+            payload: Dict[str, Any] = {'date': report_date}
+            if not deliver:
+                payload['deliver'] = False
+            if name == 'test':
+                return self._request('POST', f"/api/reports/test/{session_id}", json=payload, timeout=300)
+            payload['sessionIds'] = [session_id]
+            return self._request('POST', '/api/reports/generate', json=payload, timeout=300)
+        
+        lock = threading.Lock()
+        samples: Dict[str, List[float]] = {name: [] for name in names}
+        errors: Dict[str, int] = {name: 0 for name in names}
+        statuses: Dict[str, Dict[str, int]] = {name: {} for name in names}
+        start = time.monotonic()
+        deadline = start + duration
+        
+        def client(index: int):
+            rng = random.Random(index)
+            delay = ramp_up * index / concurrency
+            if delay:
+                time.sleep(delay)
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                request_start = time.perf_counter()
+                try:
+                    response = call(name, rng)
+                    status, ok = str(response.status_code), response.status_code < 400
+                    if ok and name == 'generate' and (response.json().get('results') or {}).get('failed'):
+                        # Réponse 200 mais génération de la session en échec
+                        status, ok = 'session_failed', False
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    status, ok = type(e).__name__, False
+                latency = time.perf_counter() - request_start
+                with lock:
+                    statuses[name][status] = statuses[name].get(status, 0) + 1
+                    if ok:
+                        samples[name].append(latency)
+                    else:
+                        errors[name] += 1
+        
+        logger.info(
+            f"🏋️ Test de charge de {self.api_url}: {concurrency} clients, {duration:.0f}s "
+            f"(montée {ramp_up:.0f}s), mélange {mix}, rapports datés du {report_date}"
+        )
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(client, index) for index in range(concurrency)]:
+                future.result()
+        elapsed = time.monotonic() - start
+        if 'generate' in names:
+            self.invalidate_statistics(report_date)
+        
+        results: Dict[str, Any] = {}
+        for name in names:
+            results[name] = latency_summary(samples[name], errors[name], elapsed)
+            results[name]['status_codes'] = statuses[name]
+        results['all'] = latency_summary(
+            [latency for name in names for latency in samples[name]], sum(errors.values()), elapsed
+        )
+        for name, summary in results.items():
+            logger.info(
+                f"   {name:<11} {summary['requests']:>6} requêtes  {summary['throughput_per_s']:>7}/s  "
+                f"erreurs {summary['error_rate'] * 100:5.1f}%  p50 {summary['p50_ms']:>8} ms  "
+                f"p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms"
+            )
+        return results
+    
+    def _test_session(self, session_id: str, target_date: Optional[str] = None,
+                      deliver: bool = True) -> Dict[str, Any]:
+        """
+        Appelle /api/reports/test pour une session et mesure la latence
+        (deliver=False : rapport construit par l'API sans être enregistré ni envoyé)
+        
+        Returns:
+            Dict: sessionId, ok, status (code HTTP ou type d'exception), latency_ms, error
+        """
+        payload: Dict[str, Any] = {}
+        if target_date:
+            payload['date'] = target_date
+        if not deliver:
+            payload['deliver'] = False
+        start = time.perf_counter()
+        try:
+            response = self._request('POST', f"/api/reports/test/{session_id}", json=payload, timeout=120)
+            ok, status = response.status_code == 200, str(response.status_code)
+            error = None if ok else response.text[:200]
+        except Exception as e:
+            ok, status, error = False, type(e).__name__, str(e)
+        return {
+            'sessionId': session_id,
+            'ok': ok,
+            'status': status,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            'error': error,
+        }
+    
     def test_report_generation(self, session_id: str, target_date: Optional[str] = None) -> bool:
         """
         Teste la génération d'un rapport pour une session spécifique
@@ -125,72 +1892,404 @@ class DailyReportGenerator:
         Returns:
             bool: True si succès, False sinon
         """
-        try:
-            payload = {}
-            if target_date:
-                payload['date'] = target_date
-            
-            response = requests.post(
-                f"{self.api_url}/api/reports/test/{session_id}",
-                json=payload,
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}'
-                },
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"✅ Test de rapport réussi pour la session {session_id}")
+        result = self._test_session(session_id, target_date)
+        if result['ok']:
+            logger.info(f"✅ Test de rapport réussi pour la session {session_id}")
+            return True
+        logger.error(f"❌ Erreur lors du test: {result['status']} - {result['error']}")
+        return False
+    
+    def test_report_generation_batch(self, session_ids: List[str], target_date: Optional[str] = None,
+                                     concurrency: int = 8, deliver: bool = False) -> List[Dict[str, Any]]:
+        """
+        Teste la génération pour une liste de sessions, `concurrency` à la fois sur le pool partagé
+        
+        Sauf deliver=True, les rapports ne sont ni enregistrés ni envoyés aux parents.
+        
+        Returns:
+            Résultats de _test_session dans l'ordre de session_ids
+        """
+        concurrency = max(1, min(concurrency, len(session_ids)))
+        self._ensure_pool_size(concurrency)
+        logger.info(
+            f"🧪 Test de {len(session_ids)} sessions, {concurrency} en parallèle"
+            f"{', avec envoi des emails' if deliver else ' (sans envoi)'}"
+        )
+        results: Dict[str, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(self._test_session, session_id, target_date, deliver): session_id
+                for session_id in session_ids
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['sessionId']] = result
+                if not result['ok']:
+                    logger.error(f"❌ {result['sessionId']}: {result['status']} - {result['error']}")
+                if len(results) % 50 == 0:
+                    logger.info(f"   {len(results)}/{len(session_ids)} sessions testées")
+        return [results[session_id] for session_id in session_ids]
+
+class ReportScheduler:
+    """
+    Démon de génération étalée selon l'heure d'envoi de chaque session
+    
+    Les sessions d'aujourd'hui et de demain sont rangées dans une file de priorité
+    (heapq) par instant d'envoi ; chaque lot arrivé à échéance part dans une requête
+    /api/reports/generate (au plus batch_size sessions, concurrency lots simultanés).
+    Le planning est rechargé toutes les refresh_interval secondes ; les sessions déjà
+    présentes dans le journal ne sont pas replanifiées, ce qui rend le redémarrage sûr.
+    Les statistiques d'une date sont calculées une fois (/prepare, avant son premier
+    lot) ; les lots suivants ne les recalculent pas.
+    """
+    
+    def __init__(self, generator: DailyReportGenerator, batch_size: int = 25,
+                 concurrency: int = 2, refresh_interval: float = 3600.0,
+                 max_attempts: int = 3, retry_delay: float = 300.0):
+        self.generator = generator
+        self.tz = ZoneInfo(generator.timezone)
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.refresh_interval = refresh_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        # (échéance, date, session_id) ; les entrées obsolètes sont ignorées au dépilage
+        self._heap: List[tuple] = []
+        self._due: Dict[tuple, float] = {}
+        self._planned: Dict[tuple, float] = {}
+        self._attempts: Dict[tuple, int] = {}
+        self._inflight: set = set()
+        self._batches = 0
+        # Dates dont les statistiques sont calculées ; le verrou fait attendre les
+        # lots concurrents pendant le calcul
+        self._stats_days: set = set()
+        self._stats_lock = threading.Lock()
+    
+    def refresh(self):
+        """
+        Recharge le planning d'aujourd'hui et de demain (fuseau TZ)
+        
+        Une session dont l'heure d'envoi a changé est replanifiée ; une session qui
+        n'est plus éligible est retirée.
+        """
+        today = datetime.now(self.tz).date()
+        for day in (today, today + timedelta(days=1)):
+            day_key = day.isoformat()
+            sessions = self.generator.list_scheduled_sessions(day_key)
+            if sessions is None:
+                continue
+            completed = self.generator.journal.completed_sessions(day_key)
+            eligible = set()
+            with self._lock:
+                for session in sessions:
+                    key = (day_key, session['id'])
+                    at = scheduled_at(day, session.get('emailTime'), session.get('emailFrequency'), self.tz)
+                    if at is None or session['id'] in completed or key in self._inflight:
+                        continue
+                    eligible.add(key)
+                    if self._planned.get(key) == at.timestamp():
+                        continue
+                    self._planned[key] = self._due[key] = at.timestamp()
+                    heapq.heappush(self._heap, (at.timestamp(), day_key, session['id']))
+                for key in [k for k in self._due if k[0] == day_key and k not in eligible]:
+                    del self._due[key]
+        
+        # Oubli des jours passés
+        yesterday = (today - timedelta(days=1)).isoformat()
+        with self._lock:
+            for mapping in (self._planned, self._attempts):
+                for key in [k for k in mapping if k[0] < yesterday]:
+                    del mapping[key]
+            pending = len(self._due)
+            next_due = min(self._due.values(), default=None)
+        with self._stats_lock:
+            self._stats_days = {day for day in self._stats_days if day >= yesterday}
+        if next_due is None:
+            logger.info("🗓️ Aucune session planifiée")
+        else:
+            next_at = datetime.fromtimestamp(next_due, self.tz).strftime('%Y-%m-%d %H:%M')
+            logger.info(f"🗓️ {pending} sessions planifiées, prochain envoi le {next_at}")
+    
+    def _pop_due_batch(self, now: float) -> Optional[tuple]:
+        """
+        Dépile jusqu'à batch_size sessions échues de la même date
+        """
+        with self._lock:
+            day_key = None
+            session_ids: List[str] = []
+            deferred = []
+            while self._heap and self._heap[0][0] <= now and len(session_ids) < self.batch_size:
+                due, key_date, session_id = heapq.heappop(self._heap)
+                key = (key_date, session_id)
+                if self._due.get(key) != due:
+                    continue
+                if day_key is not None and key_date != day_key:
+                    deferred.append((due, key_date, session_id))
+                    continue
+                day_key = key_date
+                del self._due[key]
+                self._inflight.add(key)
+                session_ids.append(session_id)
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+            return (day_key, session_ids) if session_ids else None
+    
+    def _next_due(self) -> Optional[float]:
+        with self._lock:
+            while self._heap and self._due.get((self._heap[0][1], self._heap[0][2])) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+    
+    def _ensure_daily_stats(self, day_key: str) -> bool:
+        """
+        Calcule les statistiques de la date au premier lot (une seule fois par date)
+        
+        Returns:
+            bool: True si elles sont calculées, False si /prepare a échoué (le lot les
+            demande alors lui-même)
+        """
+        with self._stats_lock:
+            if day_key in self._stats_days:
                 return True
-            else:
-                logger.error(f"❌ Erreur lors du test: {response.status_code} - {response.text}")
+            logger.info(f"📊 Calcul des statistiques du {day_key}")
+            if self.generator._prepare_sessions(day_key) is None:
                 return False
+            self._stats_days.add(day_key)
+            return True
+    
+    def _run_batch(self, batch_index: int, day_key: str, session_ids: List[str]):
+        try:
+            stats_ready = self._ensure_daily_stats(day_key)
+            results = self.generator._generate_shard(
+                batch_index, session_ids, day_key, calculate_stats=not stats_ready
+            )
+            self.generator.journal.record_results(day_key, results)
+            retry_at = time.time()
+            with self._lock:
+                for failure in results['failed']:
+                    key = (day_key, failure['sessionId'])
+                    attempts = self._attempts[key] = self._attempts.get(key, 0) + 1
+                    if attempts >= self.max_attempts:
+                        logger.error(f"❌ Session {key[1]} ({day_key}): abandon après {attempts} tentatives")
+                        continue
+                    due = retry_at + self.retry_delay * (2 ** (attempts - 1)) * (1 + random.random() * 0.25)
+                    self._due[key] = due
+                    heapq.heappush(self._heap, (due, day_key, key[1]))
+        finally:
+            with self._lock:
+                self._inflight.difference_update((day_key, sid) for sid in session_ids)
+            self._slots.release()
+    
+    def run(self):
+        """
+        Boucle du démon (jusqu'à stop())
+        """
+        logger.info(
+            f"⏰ Démon de génération démarré (TZ {self.generator.timezone}, lots de {self.batch_size}, "
+            f"{self.concurrency} lots simultanés)"
+        )
+        self.refresh()
+        next_refresh = time.time() + self.refresh_interval
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self.stop_event.is_set():
+                now = time.time()
+                if now >= next_refresh:
+                    self.refresh()
+                    next_refresh = now + self.refresh_interval
                 
-        except Exception as e:
-            logger.error(f"❌ Erreur lors du test: {e}")
-            return False
+                next_due = self._next_due()
+                if next_due is not None and next_due <= now:
+                    # Concurrence bornée : on ne dépile que lorsqu'un lot peut partir
+                    if not self._slots.acquire(timeout=1.0):
+                        continue
+                    batch = self._pop_due_batch(time.time())
+                    if batch is None:
+                        self._slots.release()
+                        continue
+                    self._batches += 1
+                    logger.info(f"📤 Lot {self._batches}: {len(batch[1])} sessions du {batch[0]}")
+                    executor.submit(self._run_batch, self._batches, *batch)
+                    continue
+                
+                wake_at = next_refresh if next_due is None else min(next_due, next_refresh)
+                self.stop_event.wait(max(0.05, wake_at - now))
+        logger.info("🛑 Démon de génération arrêté")
+    
+    def stop(self, *_):
+        self.stop_event.set()
 
 def main():
     """
     Fonction principale du script
     """
+    configure_logging()
+    export_at_exit('daily_reports')
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else 'generate'
+    with TRACER.span(f"daily_reports {command}", argv=sys.argv[1:]) as span:
+        logger.info(f"🔎 Trace {span.trace_id}")
+        run_command()
+
+def run_command():
+    """
+    Exécute la commande demandée en ligne de commande
+    """
     # Vérifier les arguments de ligne de commande
     if len(sys.argv) > 1:
         command = sys.argv[1]
         
         if command == 'generate':
-            # Génération normale
+            args = parse_generate_args(sys.argv[2:])
+            generator = DailyReportGenerator()
+            generator.server_stats = not args.local_kpis
+            generator.deliver_inline = not args.no_deliver
+            if args.async_job and (args.from_date or args.to_date or args.resume or args.shards):
+                logger.error("❌ --async ne se combine pas avec --from/--to, --resume ou --shards")
+                sys.exit(1)
+            if args.from_date or args.to_date:
+                if not (args.from_date and args.to_date) or args.date:
+                    logger.error("❌ Usage: python3 daily_reports.py generate --from YYYY-MM-DD --to YYYY-MM-DD")
+                    sys.exit(1)
+                # Rattrapage d'une plage de dates
+                success = generator.generate_reports_range(
+                    args.from_date, args.to_date, args.concurrency, args.max_attempts
+                )
+            elif args.resume:
+                # Reprise : uniquement les sessions en échec ou manquantes
+                success = generator.resume_reports(args.date, args.concurrency, args.max_attempts)
+            elif args.shards:
+                # Génération shardée et parallèle
+                success = generator.generate_reports_sharded(args.date, args.shards, args.concurrency)
+            elif args.async_job:
+                # Job en arrière-plan côté API, suivi de l'avancement (reprise après redémarrage)
+                success = generator.generate_reports_async(args.date)
+            else:
+                # Génération normale
+                success = generator.generate_reports(args.date)
+            sys.exit(0 if success else 1)
+            
+        elif command == 'deliver':
+            # Envoi des rapports générés (generate --no-deliver), indépendamment de la génération
+            args = parse_deliver_args(sys.argv[2:])
+            generator = DailyReportGenerator()
+            success = generator.deliver_reports(args.date, args.concurrency, args.page_size, args.mark_batch)
+            sys.exit(0 if success else 1)
+            
+        elif command == 'bench':
+            # Test de charge des endpoints de rapports (API locale ou de préproduction)
+            args = parse_bench_args(sys.argv[2:])
+            try:
+                mix = parse_mix(args.mix) if args.mix else DEFAULT_BENCH_MIX
+            except ValueError as e:
+                logger.error(f"❌ --mix invalide: {e}")
+                sys.exit(1)
+            if args.api_url:
+                os.environ['CUBEAI_API_URL'] = args.api_url
+            generator = DailyReportGenerator()
+            try:
+                results = generator.run_load_test(
+                    mix, args.concurrency, args.duration, args.ramp_up,
+                    session_ids=args.sessions.split(',') if args.sessions else None,
+                    target_date=args.date, stats_days=args.stats_days, deliver=args.deliver,
+                    report_date=args.report_date,
+                )
+            except ValueError as e:
+                logger.error(f"❌ {e}")
+                sys.exit(1)
+            report = {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'api_url': generator.api_url,
+                'parameters': {**{k: v for k, v in vars(args).items() if k not in ('output', 'api_url')}, 'mix': mix},
+                'results': results,
+            }
+            output = json.dumps(report, indent=2, ensure_ascii=False)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.write(output + '\n')
+                logger.info(f"✅ Résultats écrits dans {args.output}")
+            else:
+                print(output)
+            sys.exit(1 if results['all']['errors'] else 0)
+            
+        elif command == 'kpis':
+            # Calcul local des KPI du jour, sans génération
             target_date = sys.argv[2] if len(sys.argv) > 2 else None
             generator = DailyReportGenerator()
-            success = generator.generate_reports(target_date)
+            success = generator.compute_local_kpis(target_date)
             sys.exit(0 if success else 1)
             
+        elif command == 'daemon':
+            # Génération étalée selon l'heure d'envoi de chaque session
+            args = parse_daemon_args(sys.argv[2:])
+            generator = DailyReportGenerator()
+            generator.deliver_inline = not args.no_deliver
+            scheduler = ReportScheduler(
+                generator,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                refresh_interval=args.refresh,
+                max_attempts=args.max_attempts,
+                retry_delay=args.retry_delay,
+            )
+            signal.signal(signal.SIGTERM, scheduler.stop)
+            signal.signal(signal.SIGINT, scheduler.stop)
+            scheduler.run()
+            sys.exit(0)
+            
         elif command == 'test':
-            # Test pour une session spécifique
-            if len(sys.argv) < 3:
+            # Test pour une session, ou pour toutes celles d'un fichier (--sessions-file)
+            args = parse_test_args(sys.argv[2:])
+            if args.sessions_file:
+                # Seul argument positionnel en mode fichier : la date
+                if args.date:
+                    logger.error("❌ Usage: python3 daily_reports.py test --sessions-file FICHIER [date]")
+                    sys.exit(1)
+                target_date = args.session_id
+                session_ids = read_session_ids(args.sessions_file)
+                if not session_ids:
+                    logger.error(f"❌ Aucune session dans {args.sessions_file}")
+                    sys.exit(1)
+                generator = DailyReportGenerator()
+                start = time.monotonic()
+                results = generator.test_report_generation_batch(
+                    session_ids, target_date, args.concurrency, deliver=args.deliver
+                )
+                print_test_summary(results, time.monotonic() - start)
+                sys.exit(0 if all(result['ok'] for result in results) else 1)
+            if not args.session_id:
                 logger.error("❌ Usage: python3 daily_reports.py test <session_id> [date]")
                 sys.exit(1)
             
-            session_id = sys.argv[2]
-            target_date = sys.argv[3] if len(sys.argv) > 3 else None
-            
             generator = DailyReportGenerator()
-            success = generator.test_report_generation(session_id, target_date)
+            success = generator.test_report_generation(args.session_id, args.date)
             sys.exit(0 if success else 1)
             
         elif command == 'stats':
             # Statistiques
-            if len(sys.argv) < 4:
-                logger.error("❌ Usage: python3 daily_reports.py stats <start_date> <end_date>")
-                sys.exit(1)
-            
-            start_date = sys.argv[2]
-            end_date = sys.argv[3]
+            args = parse_stats_args(sys.argv[2:])
             
             generator = DailyReportGenerator()
-            stats = generator.get_report_statistics(start_date, end_date)
+            if args.chunk:
+                generator.stats_chunk = args.chunk
+            if args.concurrency:
+                generator.stats_concurrency = args.concurrency
+            if args.format != 'json':
+                # Export en flux : une ligne par rapport, bilan sur stderr
+                out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+                try:
+                    stats = generator.stream_report_statistics(args.start_date, args.end_date, out, args.format)
+                finally:
+                    if args.output:
+                        out.close()
+                if stats is None:
+                    sys.exit(1)
+                print(json.dumps(stats), file=sys.stderr)
+                sys.exit(0)
+            
+            stats = generator.get_report_statistics(args.start_date, args.end_date, use_cache=not args.no_cache)
             
             if stats:
                 print(json.dumps(stats, indent=2))
@@ -208,6 +2307,123 @@ def main():
         success = generator.generate_reports()
         sys.exit(0 if success else 1)
 
+def parse_generate_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Analyse les options de la commande generate
+    """
+    parser = argparse.ArgumentParser(prog='daily_reports.py generate')
+    parser.add_argument('date', nargs='?', help="Date au format YYYY-MM-DD (défaut: aujourd'hui)")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Répartit les sessions en N requêtes indépendantes")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Nombre maximum de requêtes simultanées (défaut: 4)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Relance uniquement les sessions en échec ou absentes du journal")
+    parser.add_argument('--max-attempts', type=int, default=4,
+                        help="Tentatives par session (--resume) ou par date (--from/--to) (défaut: 4)")
+    parser.add_argument('--from', dest='from_date', help="Début de la plage à rattraper (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='to_date', help="Fin de la plage à rattraper (YYYY-MM-DD, incluse)")
+    parser.add_argument('--local-kpis', action='store_true',
+                        help="Calcule les KPI localement (kpi_aggregation) au lieu de calculate_daily_stats")
+    parser.add_argument('--no-deliver', action='store_true',
+                        help="Génère seulement (statut 'generated') ; l'envoi se fait avec la commande deliver")
+    parser.add_argument('--async', dest='async_job', action='store_true',
+                        help="Soumet un job en arrière-plan à l'API et suit son avancement "
+                             "(reprend le job en cours de la date après un redémarrage)")
+    return parser.parse_args(argv)
+
+def parse_deliver_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Analyse les options de la commande deliver
+    """
+    parser = argparse.ArgumentParser(prog='daily_reports.py deliver')
+    parser.add_argument('date', nargs='?', help="Date au format YYYY-MM-DD (défaut: aujourd'hui)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Connexions SMTP noreply utilisées en parallèle (défaut: 4)")
+    parser.add_argument('--page-size', type=int, default=200,
+                        help="Rapports lus par page depuis l'API (défaut: 200)")
+    parser.add_argument('--mark-batch', type=int, default=100,
+                        help="Rapports marqués envoyés par requête (défaut: 100)")
+    return parser.parse_args(argv)
+
+def parse_daemon_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Analyse les options de la commande daemon
+    """
+    parser = argparse.ArgumentParser(prog='daily_reports.py daemon')
+    parser.add_argument('--batch-size', type=int, default=25,
+                        help="Sessions maximum par requête de génération (défaut: 25)")
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help="Lots générés simultanément (défaut: 2)")
+    parser.add_argument('--refresh', type=float, default=3600,
+                        help="Secondes entre deux rechargements du planning (défaut: 3600)")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="Tentatives par session avant abandon (défaut: 3)")
+    parser.add_argument('--retry-delay', type=float, default=300,
+                        help="Délai avant la première nouvelle tentative, doublé ensuite (défaut: 300s)")
+    parser.add_argument('--no-deliver', action='store_true',
+                        help="Génère seulement ; l'envoi se fait avec la commande deliver")
+    return parser.parse_args(argv)
+
+def parse_bench_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Analyse les options de la commande bench
+    """
+    parser = argparse.ArgumentParser(prog='daily_reports.py bench')
+    parser.add_argument('--mix', help="Poids relatifs des endpoints, ex. generate=1,statistics=6,test=3 (défaut)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Clients simultanés (défaut: 8)")
+    parser.add_argument('--duration', type=float, default=60, help="Durée du test en secondes (défaut: 60)")
+    parser.add_argument('--ramp-up', type=float, default=0,
+                        help="Secondes pour démarrer progressivement tous les clients (défaut: 0)")
+    parser.add_argument('--sessions', help="Sessions utilisées par generate/test, séparées par des virgules "
+                                           "(défaut: sessions éligibles de la date)")
+    parser.add_argument('--date', help="Fin de la plage de statistics et date des sessions éligibles "
+                                       "(YYYY-MM-DD, défaut: aujourd'hui)")
+    parser.add_argument('--report-date', default=BENCH_REPORT_DATE,
+                        help=f"Date des rapports créés par generate / test (défaut: {BENCH_REPORT_DATE}, jetable)")
+    parser.add_argument('--stats-days', type=int, default=30,
+                        help="Jours couverts par chaque requête statistics (défaut: 30)")
+    parser.add_argument('--deliver', action='store_true',
+                        help="Laisse generate et test envoyer les emails (défaut: génération seule)")
+    parser.add_argument('--api-url', help="API ciblée (défaut: CUBEAI_API_URL), ex. http://localhost:4000")
+    parser.add_argument('--output', help="Fichier JSON des résultats (défaut: stdout)")
+    return parser.parse_args(argv)
+
+def parse_test_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Analyse les options de la commande test
+    """
+    parser = argparse.ArgumentParser(prog='daily_reports.py test')
+    parser.add_argument('session_id', nargs='?',
+                        help="Session à tester (avec --sessions-file : date au format YYYY-MM-DD)")
+    parser.add_argument('date', nargs='?', help="Date au format YYYY-MM-DD (défaut: aujourd'hui)")
+    parser.add_argument('--sessions-file',
+                        help="Fichier des sessions à tester, une par ligne (- pour stdin)")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Tests simultanés avec --sessions-file (défaut: 8)")
+    parser.add_argument('--deliver', action='store_true',
+                        help="Avec --sessions-file, enregistre et envoie les rapports aux parents "
+                             "(défaut: rapports seulement construits)")
+    return parser.parse_args(argv)
+
+def parse_stats_args(argv: List[str]) -> argparse.Namespace:
+    """
+    Analyse les options de la commande stats
+    """
+    parser = argparse.ArgumentParser(prog='daily_reports.py stats')
+    parser.add_argument('start_date', help="Date de début au format YYYY-MM-DD")
+    parser.add_argument('end_date', help="Date de fin au format YYYY-MM-DD")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignore le cache local et redemande toute la plage à l'API")
+    parser.add_argument('--chunk', choices=['week', 'month', 'none'],
+                        help="Découpage des plages demandées à l'API (défaut: CUBEAI_STATS_CHUNK ou month)")
+    parser.add_argument('--concurrency', type=int,
+                        help="Sous-plages récupérées simultanément (défaut: CUBEAI_STATS_CONCURRENCY ou 4)")
+    parser.add_argument('--format', choices=['json', 'ndjson', 'csv'], default='json',
+                        help="ndjson/csv : export en flux d'une ligne par rapport (défaut: json)")
+    parser.add_argument('--output', help="Fichier de sortie de l'export (défaut: stdout)")
+    return parser.parse_args(argv)
+
 def print_usage():
     """
     Affiche l'aide du script
@@ -217,23 +2433,91 @@ Usage: python3 daily_reports.py [command] [options]
 
 Commandes:
   generate [date]     Génère les rapports quotidiens (date optionnelle au format YYYY-MM-DD)
+    --shards N          Répartit les sessions en N shards envoyés en parallèle
+    --concurrency M     Nombre maximum de requêtes simultanées (défaut: 4)
+    --resume            Relance uniquement les sessions en échec ou absentes du journal
+    --max-attempts N    Tentatives par session avec backoff exponentiel (défaut: 4)
+    --from D --to D     Rattrapage d'une plage de dates, jusqu'à --concurrency dates en parallèle
+                        (concurrence adaptée aux latences et aux 429/503 Retry-After)
+    --local-kpis        Calcule les KPI du jour localement et les importe avant la génération
+    --no-deliver        Génère seulement (statut 'generated'), sans envoyer les emails
+    --async             Job en arrière-plan côté API : avancement (sessions traitées, en échec,
+                        restantes, débit) et reprise du suivi si la commande est relancée
+  deliver [date]      Envoie les rapports générés non envoyés (SMTP noreply, connexions poolées)
+    --concurrency N     Connexions SMTP en parallèle (défaut: 4)
+    --page-size N       Rapports lus par page (défaut: 200)
+    --mark-batch N      Rapports marqués envoyés par requête (défaut: 100)
+  kpis [date]         Calcule les KPI du jour localement (kpi_aggregation.py) et les importe
+  daemon              Démon : génère chaque session à son heure d'envoi (fuseau TZ)
+    --batch-size N      Sessions maximum par requête (défaut: 25)
+    --concurrency N     Lots générés simultanément (défaut: 2)
+    --refresh S         Rechargement du planning toutes les S secondes (défaut: 3600)
+    --max-attempts N    Tentatives par session (défaut: 3)
+    --retry-delay S     Délai avant nouvelle tentative, doublé à chaque échec (défaut: 300)
+    --no-deliver        Génère seulement, l'envoi se fait avec deliver
   test <session_id> [date]  Teste la génération pour une session spécifique
+  test --sessions-file FICHIER [date]  Teste toutes les sessions du fichier (une par ligne)
+    --concurrency N     Tests simultanés sur le pool HTTP partagé (défaut: 8)
+    --deliver           Enregistre et envoie les rapports (défaut: construits seulement, deliver: false)
+                        Tableau latence / statut par session, code de sortie 1 si un test échoue
+  bench               Test de charge de generate / statistics / test (débit, erreurs, p50/p95/p99)
+    --mix generate=1,statistics=6,test=3  Poids relatifs des endpoints
+    --concurrency N     Clients simultanés (défaut: 8)
+    --duration S        Durée en secondes (défaut: 60)
+    --ramp-up S         Démarrage progressif des clients sur S secondes
+    --sessions a,b      Sessions utilisées par generate/test (défaut: sessions éligibles)
+    --report-date DATE  Date des rapports de generate/test (défaut: 2000-01-01, jetable)
+    --deliver           generate et test envoient les emails (défaut: deliver: false)
+    --api-url URL       API ciblée, ex. une préproduction locale (défaut: CUBEAI_API_URL)
+    --output FICHIER    Résultats JSON (défaut: stdout)
   stats <start_date> <end_date>  Récupère les statistiques des rapports
+    --no-cache          Ignore le cache local des jours révolus
+    --chunk week|month|none  Découpage des plages longues (défaut: month)
+    --concurrency N     Sous-plages récupérées en parallèle (défaut: 4)
+    --format ndjson|csv Export en flux, une ligne par rapport, mémoire constante (défaut: json)
+    --output FICHIER    Fichier de l'export (défaut: stdout ; bilan sur stderr)
 
 Exemples:
   python3 daily_reports.py generate
   python3 daily_reports.py generate 2024-12-19
+  python3 daily_reports.py generate --shards 16 --concurrency 4
+  python3 daily_reports.py generate --resume 2024-12-19
+  python3 daily_reports.py generate --from 2024-12-13 --to 2024-12-19 --concurrency 3
+  python3 daily_reports.py generate --local-kpis
+  python3 daily_reports.py generate --async 2024-12-19
+  python3 daily_reports.py kpis 2024-12-19
+  python3 daily_reports.py generate --no-deliver && python3 daily_reports.py deliver --concurrency 8
+  python3 daily_reports.py daemon --batch-size 20
   python3 daily_reports.py test session123
   python3 daily_reports.py test session123 2024-12-19
+  python3 daily_reports.py test --sessions-file sessions-qa.txt --concurrency 16
   python3 daily_reports.py stats 2024-12-01 2024-12-31
+  python3 daily_reports.py bench --api-url http://localhost:4000 --concurrency 16 --duration 120 --ramp-up 30
+  python3 daily_reports.py stats 2024-01-01 2024-12-31 --format csv --output rapports-2024.csv
 
 Variables d'environnement:
   CUBEAI_API_URL     URL de l'API CubeAI (défaut: http://localhost:4000)
   CUBEAI_API_KEY     Clé API pour l'authentification
+  CUBEAI_LOG_FILE    Fichier de log (défaut: /var/log/cubeai-daily-reports.log, off = console seule)
   TZ                  Timezone (défaut: Europe/Paris)
+  CUBEAI_HTTP_POOL_SIZE  Connexions keep-alive par hôte (défaut: 10, 0 = sans keep-alive)
+  CUBEAI_REPORTS_JOURNAL Journal des sessions traitées (défaut: ~/.cubeai/daily-reports-journal.db)
+  CUBEAI_REPORT_JOBS     Jobs asynchrones en cours (défaut: ~/.cubeai/daily-reports-jobs.json)
+  CUBEAI_STATS_CACHE     Cache des statistiques par API et par jour (défaut: ~/.cubeai/statistics-cache.db)
+  CUBEAI_STATS_CACHE_MAX_BYTES  Taille maximale du cache (défaut: 50 Mo)
+  CUBEAI_STATS_CHUNK     Découpage des plages de statistiques: week, month, none (défaut: month)
+  CUBEAI_STATS_CONCURRENCY  Sous-plages de statistiques récupérées en parallèle (défaut: 4)
+  CUBEAI_METRICS_DIR     Répertoire du textfile collector Prometheus (latences par phase)
+  CUBEAI_TRACE_FILE      Spans JSON lines des commandes et requêtes (défaut: aucun, rotation à CUBEAI_TRACE_MAX_MB)
+  NOREPLY_EMAIL_PASSWORD, NOREPLY_SMTP_*  Identité SMTP de la commande deliver (voir send_welcome_email.py)
 
 Cron (tous les jours à 19:30):
   30 19 * * * /usr/bin/python3 /path/to/daily_reports.py
+
+Démon (à la place du cron, par ex. sous systemd avec Restart=always):
+  /usr/bin/python3 /path/to/daily_reports.py daemon
+  Heure et fréquence d'envoi : préférences de rapport du compte (preferred_time,
+  frequency = daily | weekly (dimanche) | never)
 """)
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+File d'attente SQLite (outbox) pour les emails transactionnels CubeAI.
+
+send_welcome_email.py --enqueue y dépose le message déjà rendu et rend la main
+immédiatement ; send_welcome_email.py --drain le livre ensuite en arrière-plan
+(concurrence bornée, nouvelles tentatives planifiées, dead-letter).
+
+  CUBEAI_EMAIL_OUTBOX              Fichier de la file (défaut: ~/.cubeai/email-outbox.db)
+  CUBEAI_OUTBOX_MAX_PENDING        Messages en attente au-delà desquels --enqueue refuse (défaut: 10000)
+  CUBEAI_OUTBOX_MAX_ATTEMPTS       Tentatives avant dead-letter (défaut: 8)
+  CUBEAI_OUTBOX_RETENTION_DAYS     Conservation des messages en dead-letter (défaut: 7)
+
+Les messages rendus contiennent les mots de passe des comptes : le fichier (et ses
+-wal / -shm) est créé en 0600, les messages livrés sont supprimés (secure_delete)
+et ceux en dead-letter purgés après la période de conservation.
+
+États d'un message : pending -> sending -> (supprimé) | pending (nouvelle tentative) | dead
+"""
+
+import os
+import time
+import random
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+DEFAULT_PATH = os.path.expanduser("~/.cubeai/email-outbox.db")
+
+# Un message "sending" dont le bail a expiré (drain interrompu) redevient éligible
+LEASE_SECONDS = 300.0
+RETRY_BASE_SECONDS = 30.0
+RETRY_MAX_SECONDS = 3600.0
+# Purge des dead-letters expirés au plus une fois par intervalle (drain continu)
+PURGE_INTERVAL_SECONDS = 3600.0
+SQLITE_SUFFIXES = ("", "-wal", "-shm")
+
+
+def _restrict_permissions(path: str):
+    """
+    Fichier de la file lisible par son seul propriétaire (créé en 0600 s'il n'existe pas)
+    """
+    os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+    for suffix in SQLITE_SUFFIXES:
+        try:
+            os.chmod(path + suffix, 0o600)
+        except FileNotFoundError:
+            pass
+
+
+class OutboxFull(Exception):
+    """
+    Levée par enqueue quand la file dépasse max_pending (contre-pression)
+    """
+
+
+class Outbox:
+    """
+    File persistante de messages prêts à envoyer, partageable entre processus
+    """
+
+    def __init__(self, path: Optional[str] = None, max_pending: Optional[int] = None,
+                 max_attempts: Optional[int] = None, retention_days: Optional[float] = None):
+        path = path or os.getenv("CUBEAI_EMAIL_OUTBOX", DEFAULT_PATH)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.path = path
+        self.max_pending = max_pending or int(os.getenv("CUBEAI_OUTBOX_MAX_PENDING", "10000"))
+        self.max_attempts = max_attempts or int(os.getenv("CUBEAI_OUTBOX_MAX_ATTEMPTS", "8"))
+        self.retention_days = (retention_days if retention_days is not None
+                               else float(os.getenv("CUBEAI_OUTBOX_RETENTION_DAYS", "7")))
+        self._lock = threading.Lock()
+        _restrict_permissions(path)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Contenu des messages supprimés écrasé sur disque (mots de passe)
+        self._conn.execute("PRAGMA secure_delete=ON")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email_type TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                message BLOB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                lease_until REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        # -wal / -shm créés par la connexion (SQLite reprend normalement les droits du fichier)
+        _restrict_permissions(path)
+        self.purge_expired()
+
+    def enqueue(self, email_type: str, recipient: str, message: bytes) -> int:
+        """
+        Ajoute un message rendu (octets RFC 5322) à la file
+
+        Raises:
+            OutboxFull: si max_pending messages attendent déjà
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+                ).fetchone()[0]
+                if pending >= self.max_pending:
+                    raise OutboxFull(f"{pending} messages en attente (max {self.max_pending})")
+                cursor = self._conn.execute(
+                    "INSERT INTO outbox (email_type, recipient, message, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (email_type, recipient, message, now, now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.lastrowid
+
+    def claim(self) -> Optional[dict]:
+        """
+        Réserve le plus ancien message dû (bail de LEASE_SECONDS), ou None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("""
+                UPDATE outbox SET status = 'sending', lease_until = ?, attempts = attempts + 1
+                WHERE id = (
+                    SELECT id FROM outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= ?)
+                       OR (status = 'sending' AND lease_until < ?)
+                    ORDER BY next_attempt_at LIMIT 1
+                )
+                RETURNING id, email_type, recipient, message, attempts, created_at
+            """, (now + LEASE_SECONDS, now, now)).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "email_type", "recipient", "message", "attempts", "created_at")
+        return dict(zip(keys, row))
+
+    def ack(self, message_id: int):
+        """
+        Message livré : retiré de la file
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+
+    def fail(self, message_id: int, attempts: int, error: str, permanent: bool = False) -> bool:
+        """
+        Replanifie le message (backoff exponentiel avec jitter) ou le passe en dead-letter
+
+        Returns:
+            bool: True si le message est en dead-letter
+        """
+        dead = permanent or attempts >= self.max_attempts
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+        next_attempt_at = time.time() + delay * random.uniform(0.8, 1.2)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, next_attempt_at = ?, lease_until = NULL, last_error = ? "
+                "WHERE id = ?",
+                ("dead" if dead else "pending", next_attempt_at, error[:1000], message_id),
+            )
+        return dead
+
+    def next_due_in(self) -> Optional[float]:
+        """
+        Secondes avant la prochaine échéance (0 si un message est dû), None si la file est vide
+        """
+        if time.time() >= self._next_purge:
+            self.purge_expired()
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT MIN(CASE WHEN status = 'pending' THEN next_attempt_at ELSE lease_until END)
+                FROM outbox WHERE status IN ('pending', 'sending')
+            """).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def requeue_dead(self) -> int:
+        """
+        Remet les messages en dead-letter dans la file avec un compteur de tentatives à zéro
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'",
+                (time.time(),),
+            )
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """
+        Supprime les messages en dead-letter plus anciens que la période de conservation
+        """
+        cutoff = time.time() - self.retention_days * 86400
+        self._next_purge = time.time() + PURGE_INTERVAL_SECONDS
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'dead' AND created_at < ?", (cutoff,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        counts = {"pending": 0, "sending": 0, "dead": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Calcul local des KPI journaliers (session_stats_daily) de toutes les sessions en une passe.
+
+Reproduit la fonction SQL calculate_daily_stats (migrations/create_daily_reports_tables.sql)
+à partir de l'export en colonnes de GET /api/reports/kpi-inputs :
+
+  {
+    "date": "2024-12-19",
+    "sessions": ["s1", ...],
+    "previousConsecutiveDays": {"s1": 3, ...},
+    "learningEvents": {"sessionId": [...], "ts": [...], "durationSec": [...], "successRatio": [...]},
+    "quizResults": {"sessionId": [...], "ts": [...], "module": [...], "score": [...]}
+  }
+
+quizResults couvre les 7 jours précédant la date (progression). Les lignes produites
+sont renvoyées en bloc à PUT /api/reports/kpis ; l'API n'a plus qu'à générer les textes.
+
+Usage:
+  python3 kpi_aggregation.py export.json    Calcule les KPI d'un export enregistré
+
+Conformité à calculate_daily_stats : tests/test_kpi_aggregation.py
+"""
+
+import sys
+import json
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List
+
+CENT = Decimal("0.01")
+# success_ratio (NUMERIC(5,4)) à partir duquel un événement compte comme réussi
+# (kpi_assiduite) ; à 4 décimales, la comparaison en flottant est exacte
+SUCCESS_THRESHOLD = 0.8
+PROGRESSION_WINDOW_DAYS = 7
+
+
+def _numeric(value: Decimal) -> float:
+    """
+    Arrondi NUMERIC(5,2) de PostgreSQL (demi-unité arrondie vers l'extérieur)
+    """
+    return float(value.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def _decimal(value: Any) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def compute_daily_kpis(export: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Calcule les KPI du jour de chaque session à partir d'un export en colonnes
+
+    Une passe par table : les colonnes sont parcourues ensemble (zip) et agrégées
+    par session, sans regroupement préalable des lignes. Bibliothèque standard
+    seulement (environ 1 s pour 500 000 événements).
+
+    Returns:
+        Une ligne par session (champs de DailyReportSessionStatsDaily), triées par sessionId
+    """
+    day = export["date"]
+    window_start = (date.fromisoformat(day) - timedelta(days=PROGRESSION_WINDOW_DAYS)).isoformat()
+
+    # learning_events du jour : durée totale, nombre, événements notés / réussis, heures actives
+    duration_sum: Dict[str, int] = defaultdict(int)
+    event_count: Dict[str, int] = defaultdict(int)
+    rated_count: Dict[str, int] = defaultdict(int)
+    success_count: Dict[str, int] = defaultdict(int)
+    active_hours: Dict[str, set] = defaultdict(set)
+    events = export.get("learningEvents") or {}
+    for session_id, ts, duration, ratio in zip(
+        events.get("sessionId", []), events.get("ts", []),
+        events.get("durationSec", []), events.get("successRatio", []),
+    ):
+        if ts[:10] != day:
+            continue
+        duration_sum[session_id] += duration
+        event_count[session_id] += 1
+        active_hours[session_id].add(ts[:13])
+        if ratio is not None:
+            rated_count[session_id] += 1
+            if ratio >= SUCCESS_THRESHOLD:
+                success_count[session_id] += 1
+
+    # quiz_results : moyenne et meilleur module du jour, moyennes par jour sur la fenêtre
+    score_sum: Dict[str, Decimal] = defaultdict(Decimal)
+    score_count: Dict[str, int] = defaultdict(int)
+    best: Dict[str, tuple] = {}
+    daily_scores: Dict[str, Dict[str, list]] = defaultdict(dict)
+    quizzes = export.get("quizResults") or {}
+    for session_id, ts, module, score in zip(
+        quizzes.get("sessionId", []), quizzes.get("ts", []),
+        quizzes.get("module", []), quizzes.get("score", []),
+    ):
+        quiz_day = ts[:10]
+        if not window_start <= quiz_day <= day:
+            continue
+        score = _decimal(score)
+        totals = daily_scores[session_id].setdefault(quiz_day, [Decimal(0), 0])
+        totals[0] += score
+        totals[1] += 1
+        if quiz_day != day:
+            continue
+        score_sum[session_id] += score
+        score_count[session_id] += 1
+        if session_id not in best or score > best[session_id][0]:
+            best[session_id] = (score, module)
+
+    previous = export.get("previousConsecutiveDays") or {}
+    session_ids = set(export.get("sessions") or []) | set(event_count) | set(daily_scores)
+    rows = []
+    for session_id in sorted(session_ids):
+        events_today = event_count.get(session_id, 0)
+        rated = rated_count.get(session_id, 0)
+        quizzes_today = score_count.get(session_id, 0)
+        rows.append({
+            "sessionId": session_id,
+            "totalTimeMin": duration_sum.get(session_id, 0) // 60,
+            "kpiAssiduite": _numeric(Decimal(success_count.get(session_id, 0) * 100) / rated) if rated else 0.0,
+            "kpiComprehension": _numeric(score_sum[session_id] / quizzes_today) if quizzes_today else 0.0,
+            "kpiProgression": _progression(daily_scores.get(session_id, {})),
+            "sessionsCount": len(active_hours.get(session_id, ())),
+            "bestModule": best[session_id][1] if session_id in best else None,
+            "needsHelp": None,
+            "consecutiveDays": int(previous.get(session_id) or 0) + 1,
+            "focusScore": _numeric(Decimal(duration_sum[session_id]) / events_today) if events_today else 0.0,
+        })
+    return rows
+
+
+def _progression(daily_scores: Dict[str, list]) -> float:
+    """
+    Évolution en % de la moyenne du dernier jour avec quiz par rapport au précédent
+    dans la fenêtre (0 sans jour précédent ou si sa moyenne est nulle)
+    """
+    days = sorted(daily_scores)
+    if len(days) < 2:
+        return 0.0
+    last_sum, last_count = daily_scores[days[-1]]
+    prev_sum, prev_count = daily_scores[days[-2]]
+    previous_avg = prev_sum / prev_count
+    if not previous_avg:
+        return 0.0
+    return _numeric((last_sum / last_count - previous_avg) / previous_avg * 100)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        # Calcul sur un export enregistré : python3 kpi_aggregation.py export.json
+        with open(sys.argv[1], encoding="utf-8") as f:
+            print(json.dumps(compute_daily_kpis(json.load(f)), indent=2, ensure_ascii=False))
+        sys.exit(0)
+    print(__doc__)
+    sys.exit(1)
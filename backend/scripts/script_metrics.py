@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Histogrammes de latence par phase pour les scripts Python CubeAI.
+
+Les mesures sont écrites à la sortie du processus au format Prometheus
+(textfile collector de node_exporter) ou OpenMetrics, sans service à lancer :
+
+  CUBEAI_METRICS_DIR     Répertoire du textfile collector
+                         (ex. /var/lib/node_exporter/textfile_collector)
+  CUBEAI_METRICS_FORMAT  prometheus (défaut) ou openmetrics
+
+Chaque script écrit son propre fichier cubeai_<job>.prom, remplacé de
+manière atomique à chaque exécution.
+"""
+
+import os
+import time
+import atexit
+import threading
+import contextlib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """
+    Histogramme Prometheus (buckets cumulés, somme, nombre) avec labels
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [compteurs par bucket..., +Inf, somme]
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Mesure la durée du bloc (y compris s'il lève une exception)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = list(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', repr(bound))])} {int(count)}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {int(values[-2])}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {values[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {int(values[-2])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Retourne l'histogramme du nom donné, créé au premier appel
+        """
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._histograms[name]
+
+    def render(self, job: str, openmetrics: bool = False) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms.values():
+            lines.extend(histogram.render())
+        gauge = f"cubeai_{job}_last_run_timestamp_seconds"
+        lines += [
+            f"# HELP {gauge} Fin de la dernière exécution du script",
+            f"# TYPE {gauge} gauge",
+            f"{gauge} {time.time():.3f}",
+        ]
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str, job: str, openmetrics: bool = False):
+        """
+        Écrit les métriques de manière atomique (le collector ne lit jamais un fichier partiel)
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render(job, openmetrics))
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def export_at_exit(job: str, directory: Optional[str] = None):
+    """
+    Programme l'écriture de cubeai_<job>.prom dans CUBEAI_METRICS_DIR à la sortie
+    """
+    directory = directory or os.getenv("CUBEAI_METRICS_DIR")
+    if not directory:
+        return
+    openmetrics = os.getenv("CUBEAI_METRICS_FORMAT", "prometheus").lower() == "openmetrics"
+    path = os.path.join(directory, f"cubeai_{job}.prom")
+
+    def write():
+        try:
+            REGISTRY.write_textfile(path, job, openmetrics)
+        except OSError as e:
+            print(f"⚠️ Écriture des métriques impossible ({path}): {e}")
+
+    atexit.register(write)
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """
+    Percentile (interpolation linéaire) d'une liste déjà triée
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = (len(sorted_samples) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_samples) - 1)
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (rank - low)
+
+
+def latency_summary(samples: List[float], errors: int = 0, elapsed: Optional[float] = None) -> Dict[str, float]:
+    """
+    Résume des latences (en secondes) : débit, p50/p95/p99 en millisecondes
+    """
+    ordered = sorted(samples)
+    total = len(ordered) + errors
+    elapsed = elapsed if elapsed is not None else sum(ordered)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_per_s": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
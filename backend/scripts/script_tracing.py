@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Traces W3C (Trace Context) pour les scripts Python CubeAI.
+
+Chaque requête sortante porte un en-tête traceparent (00-<trace_id>-<span_id>-01)
+que l'API journalise : un span client se retrouve dans les logs serveur par son
+trace_id. Les spans (début, fin, durée, statut, tailles) sont écrits en JSON lines
+par un thread dédié (QueueHandler / QueueListener) : l'appelant ne fait jamais
+d'écriture disque. L'écriture est désactivée par défaut (l'en-tête traceparent
+est envoyé dans tous les cas) ; le fichier tourne à CUBEAI_TRACE_MAX_MB.
+
+  CUBEAI_TRACE_FILE     Fichier des spans (non défini ou "off": pas de fichier)
+  CUBEAI_TRACE_MAX_MB   Taille avant rotation (défaut: 50, 3 fichiers conservés)
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextlib
+import contextvars
+import logging.handlers
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_MAX_MB = 50
+BACKUP_COUNT = 3
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("cubeai_span", default=None)
+
+
+def queued_handler(handler: logging.Handler) -> logging.handlers.QueueHandler:
+    """
+    Place un handler derrière une file : les enregistrements sont écrits par un
+    thread QueueListener (arrêté, et donc vidé, à la sortie du processus)
+    """
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    queue_handler = logging.handlers.QueueHandler(records)
+    # Le message seul : la mise en forme complète est celle du handler final
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    return queue_handler
+
+
+class _SpanFormatter(logging.Formatter):
+    # La sérialisation JSON se fait dans le thread d'écriture
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.span, ensure_ascii=False, default=str)
+
+
+class Span:
+    """
+    Opération chronométrée d'une trace ; terminée par end()
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start = time.time()
+        self._start = time.perf_counter()
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def end(self, status: Optional[str] = None):
+        if status:
+            self.status = status
+        duration = time.perf_counter() - self._start
+        self.tracer._emit({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.tracer.service,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "end": round(self.start + duration, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        })
+
+
+class Tracer:
+    """
+    Crée les spans d'un script ; le span courant est suivi par contextvars
+
+    Un span ouvert sans parent devient la racine du processus : les spans créés
+    ensuite dans des threads (qui n'héritent pas du contexte) s'y rattachent.
+    """
+
+    def __init__(self, service: str, path: Optional[str] = None):
+        self.service = service
+        path = path or os.getenv("CUBEAI_TRACE_FILE", "")
+        self.path = None if path.lower() in ("off", "0", "") else os.path.expanduser(path)
+        self.root: Optional[Span] = None
+        self._logger: Optional[logging.Logger] = None
+        self._lock = threading.Lock()
+
+    def _emit(self, span: Dict[str, Any]):
+        if self.path is None:
+            return
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None and self.path is not None:
+                    self._logger = self._open_logger()
+            if self._logger is None:
+                return
+        self._logger.info(span["name"], extra={"span": span})
+
+    def _open_logger(self) -> Optional[logging.Logger]:
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            max_bytes = int(float(os.getenv("CUBEAI_TRACE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=max_bytes, backupCount=BACKUP_COUNT, encoding="utf-8")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Fichier de traces inutilisable ({self.path}): {e}")
+            self.path = None
+            return None
+        handler.setFormatter(_SpanFormatter())
+        trace_logger = logging.getLogger(f"cubeai.trace.{self.service}")
+        trace_logger.propagate = False
+        trace_logger.setLevel(logging.INFO)
+        trace_logger.addHandler(queued_handler(handler))
+        return trace_logger
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        parent = _CURRENT.get() or self.root
+        if parent is None:
+            span = Span(self, name, os.urandom(16).hex(), None, attributes)
+            self.root = span
+        else:
+            span = Span(self, name, parent.trace_id, parent.span_id, attributes)
+        return span
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Span courant pendant le bloc (statut error si le bloc lève une exception)
+        """
+        span = self.start_span(name, **attributes)
+        token = _CURRENT.set(span)
+        status = "ok"
+        try:
+            yield span
+        except SystemExit as e:
+            if e.code:
+                status = "error"
+                span.set(exit_code=e.code)
+            raise
+        except BaseException as e:
+            status = "error"
+            span.set(error=str(e) or type(e).__name__)
+            raise
+        finally:
+            _CURRENT.reset(token)
+            span.end(None if span.status != "ok" else status)
@@ -10,23 +10,86 @@ Usage:
     --account-password "TempPass123" \
     --plan STARTER
 
+Batch mode (one authenticated SMTP connection for the whole batch):
+  python backend/scripts/send_welcome_email.py --batch recipients.jsonl
+  cat recipients.jsonl | python backend/scripts/send_welcome_email.py --batch -
+
+  Each line: {"to": ..., "to_name": ..., "account_username": ...,
+              "account_password": ..., "plan": "PRO", "members": [...], "registration_id": ...}
+
+Render only (no network, no SMTP password; stable file names so runs can be diffed):
+  python backend/scripts/send_welcome_email.py --batch recipients.jsonl --render-only out/
+  python backend/scripts/send_welcome_email.py --to ... --plan PRO --render-only out/ --render-format maildir
+
+Render in a process pool while sending (bounded memory, rendering scales with cores):
+  python backend/scripts/send_welcome_email.py --batch recipients.jsonl --render-workers 4
+
+Worker pool across identities (N connections each, per-identity hourly quota):
+  python backend/scripts/send_welcome_email.py --batch recipients.jsonl \
+    --identities hello,noreply --connections-per-identity 3
+
+Persistent worker (config loaded once, warm SMTP connection, one JSON result per line):
+  python backend/scripts/send_welcome_email.py --worker < requests.jsonl
+  python backend/scripts/send_welcome_email.py --socket /run/cubeai/welcome-email.sock
+
+  Requests use the --batch fields plus optional "id" and "email_type"; replies are
+  {"id", "ok", "to", "elapsed_ms"} or {"id", "ok": false, "error"}, after a first
+  {"event": "ready", "startup_ms", "smtp_connect_ms", "ready_ms"} line.
+
+Outbox (returns immediately, delivery by a separate drain process):
+  python backend/scripts/send_welcome_email.py --enqueue --to ... --plan STARTER
+  python backend/scripts/send_welcome_email.py --enqueue --batch recipients.jsonl
+  python backend/scripts/send_welcome_email.py --drain --drain-concurrency 4
+  python backend/scripts/send_welcome_email.py --drain --once       (exit when nothing is due)
+  python backend/scripts/send_welcome_email.py --outbox-stats | --requeue-dead
+
 Environment variables (recommended):
   HELLO_EMAIL_USER      = hello@cube-ai.fr (communication générale)
   HELLO_EMAIL_PASSWORD  = <SMTP password>
   HELLO_SMTP_SERVER     = smtp.ionos.fr
   HELLO_SMTP_PORT       = 465 (implicit TLS)
+  HELLO_SMTP_HOURLY_QUOTA = 0 (messages/heure en mode pool, 0 = illimité)
+  HELLO_SMTP_MAX_RATE   = 20 (messages/s max ; le débit est divisé par deux à chaque 421/451/452
+                          puis remonte progressivement, les messages refusés sont renvoyés)
   APP_BASE_URL          = https://cube-ai.fr (used for CTA links)
+  CUBEAI_METRICS_DIR    = textfile collector directory for per-phase SMTP latency histograms
+  CUBEAI_SMTP_TRANSPORT_CACHE = ~/.cubeai/smtp-transports.json (working transport per SMTP server)
+  CUBEAI_SMTP_TRANSPORT_TTL   = 86400 (seconds before the remembered transport is re-probed)
+  CUBEAI_SMTP_RACE      = 1 to try SSL and STARTTLS in parallel when no transport is remembered
+  CUBEAI_EMAIL_OUTBOX   = ~/.cubeai/email-outbox.db (outbox spool, see email_outbox.py)
+  CUBEAI_OUTBOX_MAX_PENDING  = 10000 (--enqueue exits with code 75 above this)
+  CUBEAI_OUTBOX_MAX_ATTEMPTS = 8 (delivery attempts before dead-letter)
+  CUBEAI_OUTBOX_RETENTION_DAYS = 7 (dead-letter messages are purged after this)
 
 Note: Network sending is not executed here; this script prepares and sends via
 standard SMTP using TLS. Ensure the credentials are valid in your environment.
 """
 
 import os
+import sys
 import ssl
+import re
+import json
+import time
+import string
+import functools
 import argparse
+import queue
+import signal
+import socketserver
 import smtplib
+import threading
+import email
+import email.policy
+import email.utils
+import mailbox
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from email.message import EmailMessage
-from typing import List, Dict
+from typing import Iterator, List, Dict
+
+from email_outbox import Outbox, OutboxFull
+from script_metrics import REGISTRY, export_at_exit, latency_summary
 
 # Load .env securely if available
 try:
@@ -42,6 +105,8 @@ EMAIL_CONFIG = {
         "password": os.getenv("HELLO_EMAIL_PASSWORD"),
         "smtp_server": os.getenv("HELLO_SMTP_SERVER", "smtp.ionos.fr"),
         "smtp_port": int(os.getenv("HELLO_SMTP_PORT", "465")),
+        "hourly_quota": int(os.getenv("HELLO_SMTP_HOURLY_QUOTA", "0")),  # 0 = illimité
+        "max_rate": float(os.getenv("HELLO_SMTP_MAX_RATE", "20")),  # messages/s, plafond du débit adaptatif
         "from_name": "CubeAI - Équipe"
     },
     "support": {
@@ -49,6 +114,8 @@ EMAIL_CONFIG = {
         "password": os.getenv("SUPPORT_EMAIL_PASSWORD"),
         "smtp_server": os.getenv("SUPPORT_SMTP_SERVER", "smtp.ionos.fr"),
         "smtp_port": int(os.getenv("SUPPORT_SMTP_PORT", "465")),
+        "hourly_quota": int(os.getenv("SUPPORT_SMTP_HOURLY_QUOTA", "0")),  # 0 = illimité
+        "max_rate": float(os.getenv("SUPPORT_SMTP_MAX_RATE", "20")),  # messages/s, plafond du débit adaptatif
         "from_name": "CubeAI - Support"
     },
     "noreply": {
@@ -56,16 +123,19 @@ EMAIL_CONFIG = {
         "password": os.getenv("NOREPLY_EMAIL_PASSWORD"),
         "smtp_server": os.getenv("NOREPLY_SMTP_SERVER", "smtp.ionos.fr"),
         "smtp_port": int(os.getenv("NOREPLY_SMTP_PORT", "465")),
+        "hourly_quota": int(os.getenv("NOREPLY_SMTP_HOURLY_QUOTA", "0")),  # 0 = illimité
+        "max_rate": float(os.getenv("NOREPLY_SMTP_MAX_RATE", "20")),  # messages/s, plafond du débit adaptatif
         "from_name": "CubeAI"
     }
 }
 
-def get_email_config(email_type: str = "hello"):
+def get_email_config(email_type: str = "hello", require_password: bool = True):
     """
     Récupère la configuration email selon le type d'email
     
     Args:
         email_type: "hello" (communication générale), "support" (assistance), "noreply" (automatique)
+        require_password: False pour un usage sans connexion SMTP (adresse d'expédition, rendu seul)
     
     Returns:
         dict: Configuration SMTP pour le type d'email spécifié
@@ -75,7 +145,7 @@ def get_email_config(email_type: str = "hello"):
     
     config = EMAIL_CONFIG[email_type]
     
-    if not config["password"]:
+    if require_password and not config["password"]:
         raise ValueError(f"Mot de passe manquant pour {email_type}@cube-ai.fr")
     
     return config
@@ -90,7 +160,7 @@ def get_from_address(email_type: str = "hello"):
     Returns:
         str: Adresse d'expédition formatée
     """
-    config = get_email_config(email_type)
+    config = get_email_config(email_type, require_password=False)
     return f"{config['from_name']} <{config['user']}>"
 
 PLANS: Dict[str, Dict[str, object]] = {
@@ -142,65 +212,46 @@ PLANS: Dict[str, Dict[str, object]] = {
 }
 
 
-def build_email_html(
-    to_name: str,
-    account_username: str,
-    account_password: str,
-    plan: str,
-    app_base_url: str,
-    members: List[Dict[str, str]] | None = None,
-    registration_id: str | None = None,
-) -> str:
-    plan_key = plan.upper()
-    plan_info = PLANS.get(plan_key, PLANS["STARTER"])  # fallback
-    plan_label = plan_info["label"]
-    plan_price = plan_info["price"]
-    plan_period = plan_info["period"]
-    features: List[str] = plan_info["features"]  # type: ignore
+class CompiledTemplate:
+    """
+    Gabarit précompilé : les parties statiques sont découpées une seule fois,
+    le rendu ne fait plus qu'assembler les morceaux.
 
-    features_html = "".join(
-        f"<li style='margin:6px 0;color:#111827;'>{feat}</li>" for feat in features
-    )
+    partial() fige une partie des champs (ex. le plan) et renvoie un gabarit
+    plus court, mis en cache par les fonctions de rendu.
+    """
+
+    def __init__(self, source: str):
+        self.parts: List[tuple] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(source)
+        ]
 
-    login_url = f"{app_base_url.rstrip('/')}/login"
+    def partial(self, **values: str) -> "CompiledTemplate":
+        compiled = CompiledTemplate.__new__(CompiledTemplate)
+        compiled.parts = []
+        pending = ""
+        for literal, field in self.parts:
+            pending += literal
+            if field is None:
+                continue
+            if field in values:
+                pending += values[field]
+            else:
+                compiled.parts.append((pending, field))
+                pending = ""
+        compiled.parts.append((pending, None))
+        return compiled
 
-    members_section = ""
-    if members:
-        rows = []
-        for m in members:
-            full_name = f"{m.get('firstName','')} {m.get('lastName','')}".strip()
-            ident = m.get('sessionId') or m.get('username') or ''
-            pwd = m.get('password') or ''
-            role = m.get('userType') or ''
-            rows.append(
-                "<tr>"
-                + f"<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#111827;'>{full_name}</td>"
-                + f"<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#111827;'><code>{ident}</code></td>"
-                + f"<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#111827;'><code>{pwd}</code></td>"
-                + f"<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#374151;'>{role}</td>"
-                + "</tr>"
-            )
-        members_table = (
-            "<div style=\"background:#f9fafb;border-radius:12px;padding:16px;margin-bottom:16px;\">"
-            "<div style=\"font-weight:700;color:#111827;margin-bottom:8px;\">Identifiants des membres</div>"
-            "<table style=\"width:100%;border-collapse:collapse;\">"
-            "<thead>\n<tr>"
-            "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Membre</th>"
-            "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Identifiant</th>"
-            "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Mot de passe</th>"
-            "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Rôle</th>"
-            "</tr>\n</thead>\n<tbody>"
-            + "".join(rows)
-            + "</tbody></table></div>"
-        )
-        members_section = members_table
+    def render(self, **values: str) -> str:
+        chunks = []
+        for literal, field in self.parts:
+            chunks.append(literal)
+            if field is not None:
+                chunks.append(values[field])
+        return "".join(chunks)
 
-    reg_block = (
-        f"<p style='margin:0 0 8px 0;color:#6b7280;font-size:12px;'>ID d'inscription: <strong style='color:#111827;'>{registration_id}</strong></p>"
-        if registration_id else ""
-    )
 
-    return f"""
+_HTML_TEMPLATE = CompiledTemplate("""
 <!doctype html>
 <html>
   <head>
@@ -234,10 +285,64 @@ def build_email_html(
     </div>
   </body>
 </html>
-"""
+""")
 
+_MEMBERS_TABLE_HEAD = (
+    "<div style=\"background:#f9fafb;border-radius:12px;padding:16px;margin-bottom:16px;\">"
+    "<div style=\"font-weight:700;color:#111827;margin-bottom:8px;\">Identifiants des membres</div>"
+    "<table style=\"width:100%;border-collapse:collapse;\">"
+    "<thead>\n<tr>"
+    "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Membre</th>"
+    "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Identifiant</th>"
+    "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Mot de passe</th>"
+    "<th align='left' style=\"padding:6px 12px;color:#6b7280;font-size:12px;font-weight:700;\">Rôle</th>"
+    "</tr>\n</thead>\n<tbody>"
+)
+_MEMBERS_TABLE_TAIL = "</tbody></table></div>"
+_MEMBERS_ROW = CompiledTemplate(
+    "<tr>"
+    "<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#111827;'>{full_name}</td>"
+    "<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#111827;'><code>{ident}</code></td>"
+    "<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#111827;'><code>{pwd}</code></td>"
+    "<td style='padding:8px 12px;border-bottom:1px solid #e5e7eb;color:#374151;'>{role}</td>"
+    "</tr>"
+)
 
-def build_email_text(
+
+def _member_fields(m: Dict[str, str]) -> Dict[str, str]:
+    return {
+        "full_name": f"{m.get('firstName','')} {m.get('lastName','')}".strip(),
+        "ident": m.get('sessionId') or m.get('username') or '',
+        "pwd": m.get('password') or '',
+        "role": m.get('userType') or '',
+    }
+
+
+def _plan_key(plan: str) -> str:
+    plan_key = plan.upper()
+    return plan_key if plan_key in PLANS else "STARTER"  # fallback
+
+
+@functools.lru_cache(maxsize=64)
+def _html_template_for(plan_key: str, app_base_url: str) -> CompiledTemplate:
+    """
+    Gabarit HTML avec le bloc d'offre (plan, avantages) et le lien de connexion figés
+    """
+    plan_info = PLANS[plan_key]
+    features: List[str] = plan_info["features"]  # type: ignore
+    features_html = "".join(
+        f"<li style='margin:6px 0;color:#111827;'>{feat}</li>" for feat in features
+    )
+    return _HTML_TEMPLATE.partial(
+        plan_label=str(plan_info["label"]),
+        plan_price=str(plan_info["price"]),
+        plan_period=str(plan_info["period"]),
+        features_html=features_html,
+        login_url=f"{app_base_url.rstrip('/')}/login",
+    )
+
+
+def build_email_html(
     to_name: str,
     account_username: str,
     account_password: str,
@@ -246,13 +351,60 @@ def build_email_text(
     members: List[Dict[str, str]] | None = None,
     registration_id: str | None = None,
 ) -> str:
-    plan_key = plan.upper()
-    plan_info = PLANS.get(plan_key, PLANS["STARTER"])  # fallback
-    plan_label = plan_info["label"]
-    plan_price = plan_info["price"]
-    plan_period = plan_info["period"]
+    members_section = ""
+    if members:
+        members_section = (
+            _MEMBERS_TABLE_HEAD
+            + "".join(_MEMBERS_ROW.render(**_member_fields(m)) for m in members)
+            + _MEMBERS_TABLE_TAIL
+        )
+
+    reg_block = (
+        f"<p style='margin:0 0 8px 0;color:#6b7280;font-size:12px;'>ID d'inscription: <strong style='color:#111827;'>{registration_id}</strong></p>"
+        if registration_id else ""
+    )
+
+    return _html_template_for(_plan_key(plan), app_base_url).render(
+        to_name=to_name,
+        reg_block=reg_block,
+        account_username=account_username,
+        account_password=account_password,
+        members_section=members_section,
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _text_fragments_for(plan_key: str, app_base_url: str) -> tuple:
+    """
+    Blocs texte figés par plan : offre + avantages, et pied de message
+    """
+    plan_info = PLANS[plan_key]
     features: List[str] = plan_info["features"]  # type: ignore
-    login_url = f"{app_base_url.rstrip('/')}/login"
+    offer = "\n".join([
+        f"Offre: {plan_info['label']} — {plan_info['price']} {plan_info['period']}",
+        "Avantages:",
+    ] + [f"  • {feat}" for feat in features])
+    footer = "\n".join([
+        "",
+        f"Se connecter: {app_base_url.rstrip('/')}/login",
+        "",
+        "Besoin d'aide ? Répondez à ce message ou contactez notre support.",
+        "",
+        "— CubeAI - Équipe",
+    ])
+    return offer, footer
+
+
+def build_email_text(
+    to_name: str,
+    account_username: str,
+    account_password: str,
+    plan: str,
+    app_base_url: str,
+    members: List[Dict[str, str]] | None = None,
+    registration_id: str | None = None,
+) -> str:
+    offer, footer = _text_fragments_for(_plan_key(plan), app_base_url)
 
     lines = [
         f"Bienvenue {to_name}",
@@ -268,10 +420,8 @@ def build_email_text(
         f"  • Identifiant: {account_username}",
         f"  • Mot de passe: {account_password}",
         "",
-        f"Offre: {plan_label} — {plan_price} {plan_period}",
-        "Avantages:",
+        offer,
     ]
-    lines += [f"  • {feat}" for feat in features]
 
     if members:
         lines += [
@@ -279,24 +429,51 @@ def build_email_text(
             "Identifiants des membres:",
         ]
         for m in members:
-            full_name = f"{m.get('firstName','')} {m.get('lastName','')}".strip()
-            ident = m.get('sessionId') or m.get('username') or ''
-            pwd = m.get('password') or ''
-            role = m.get('userType') or ''
-            lines += [f"  • {full_name} ({role}) — {ident} / {pwd}"]
+            f = _member_fields(m)
+            lines += [f"  • {f['full_name']} ({f['role']}) — {f['ident']} / {f['pwd']}"]
 
-    lines += [
-        "",
-        f"Se connecter: {login_url}",
-        "",
-        "Besoin d'aide ? Répondez à ce message ou contactez notre support.",
-        "",
-        "— CubeAI - Équipe",
-    ]
+    lines.append(footer)
     return "\n".join(lines)
 
 
-def send_email(
+def benchmark_templates(iterations: int = 2000) -> List[dict]:
+    """
+    Microbenchmark du rendu HTML + texte par message, pour chaque plan,
+    avec et sans tableau des membres.
+
+    "cold" vide les caches avant chaque rendu (coût d'un gabarit non précompilé),
+    "warm" mesure le cas courant d'un envoi en masse.
+    """
+    members = [
+        {"firstName": "Lina", "lastName": "Martin", "sessionId": "lina.m", "password": "Cube-1234", "userType": "CHILD"},
+        {"firstName": "Noé", "lastName": "Martin", "sessionId": "noe.m", "password": "Cube-5678", "userType": "CHILD"},
+        {"firstName": "Claire", "lastName": "Martin", "username": "claire.m", "password": "Cube-9012", "userType": "PARENT"},
+    ]
+    results = []
+    for plan in PLANS:
+        for with_members in (False, True):
+            args = ("Jean Dupont", "jean.dupont", "TempPass123", plan, "https://cube-ai.fr",
+                    members if with_members else None, "REG-2024-0001")
+            timings = {}
+            for mode in ("cold", "warm"):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    if mode == "cold":
+                        _html_template_for.cache_clear()
+                        _text_fragments_for.cache_clear()
+                    build_email_html(*args)
+                    build_email_text(*args)
+                timings[mode] = (time.perf_counter() - start) / iterations * 1e6
+            results.append({
+                "plan": plan,
+                "members": with_members,
+                "cold_us": round(timings["cold"], 1),
+                "warm_us": round(timings["warm"], 1),
+            })
+    return results
+
+
+def build_message(
     to_email: str,
     to_name: str,
     account_username: str,
@@ -307,12 +484,9 @@ def send_email(
     app_base_url: str = "https://cube-ai.fr",
     members: List[Dict[str, str]] | None = None,
     registration_id: str | None = None,
-):
+) -> EmailMessage:
     subject = "Bienvenue sur CubeAI — Vos accès et avantages"
 
-    # Récupérer la configuration email
-    email_config = get_email_config(email_type)
-
     # Build message
     msg = EmailMessage()
     msg["From"] = get_from_address(email_type)
@@ -324,38 +498,1365 @@ def send_email(
 
     msg.set_content(text)
     msg.add_alternative(html, subtype="html")
+    return msg
+
+
+SMTP_PHASE_SECONDS = REGISTRY.histogram(
+    "cubeai_smtp_phase_seconds",
+    "Durée des phases SMTP par compte (connect = DNS + TCP, data = envoi du message)",
+    ["account", "phase"],
+)
+
+
+class _TimedSMTPMixin:
+    """
+    Mesure les phases d'une session SMTP : connect, tls, login, data, quit
+    """
+
+    def __init__(self, *args, account: str = "", **kwargs):
+        self._account = account
+        super().__init__(*args, **kwargs)
+
+    def _phase(self, phase: str):
+        return SMTP_PHASE_SECONDS.time(account=self._account, phase=phase)
+
+    def login(self, *args, **kwargs):
+        with self._phase("login"):
+            return super().login(*args, **kwargs)
+
+    def sendmail(self, *args, **kwargs):
+        # send_message passe aussi par sendmail : un seul point de mesure
+        with self._phase("data"):
+            return super().sendmail(*args, **kwargs)
+
+    def quit(self):
+        with self._phase("quit"):
+            return super().quit()
+
+
+class TimedSMTP(_TimedSMTPMixin, smtplib.SMTP):
+    def _get_socket(self, host, port, timeout):
+        with self._phase("connect"):
+            return super()._get_socket(host, port, timeout)
+
+    def starttls(self, *args, **kwargs):
+        with self._phase("tls"):
+            return super().starttls(*args, **kwargs)
+
+
+class TimedSMTP_SSL(_TimedSMTPMixin, smtplib.SMTP_SSL):
+    def _get_socket(self, host, port, timeout):
+        with self._phase("connect"):
+            sock = smtplib.SMTP._get_socket(self, host, port, timeout)
+        with self._phase("tls"):
+            return self.context.wrap_socket(sock, server_hostname=self._host)
+
+
+_SSL_CONTEXT: ssl.SSLContext | None = None
+_SSL_LOCK = threading.Lock()
+_TLS_SESSIONS: Dict[tuple, ssl.SSLSession] = {}
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    Contexte TLS partagé par toutes les connexions du processus
+
+    create_default_context() recharge le magasin de certificats à chaque appel ;
+    le partager évite ce coût et permet la reprise de session TLS.
+    """
+    global _SSL_CONTEXT
+    with _SSL_LOCK:
+        if _SSL_CONTEXT is None:
+            _SSL_CONTEXT = ssl.create_default_context()
+        return _SSL_CONTEXT
+
+
+class _SessionReusingContext:
+    """
+    Enveloppe du contexte TLS qui reprend la dernière session connue pour le serveur
+    """
+
+    def __init__(self, context: ssl.SSLContext, key: tuple):
+        self.context = context
+        self.key = key
+
+    def wrap_socket(self, sock, server_hostname=None, **kwargs):
+        session = _TLS_SESSIONS.get(self.key)
+        try:
+            return self.context.wrap_socket(sock, server_hostname=server_hostname, session=session, **kwargs)
+        except ValueError:
+            # Session refusée (expirée, autre contexte) : poignée de main complète
+            _TLS_SESSIONS.pop(self.key, None)
+            return self.context.wrap_socket(sock, server_hostname=server_hostname, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+
+class TransportMemory:
+    """
+    Mémorise par serveur SMTP le transport qui fonctionne ("ssl" ou "starttls"),
+    persisté entre les exécutions avec une durée de validité.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] | None = None
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, server: str) -> str | None:
+        with self._lock:
+            entry = self._load().get(server)
+        if entry and entry.get("expires_at", 0) > time.time():
+            return entry.get("transport")
+        return None
+
+    def remember(self, server: str, transport: str):
+        with self._lock:
+            entries = self._load()
+            if entries.get(server, {}).get("transport") == transport and entries[server]["expires_at"] > time.time():
+                return
+            entries[server] = {"transport": transport, "expires_at": time.time() + self.ttl}
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+
+TRANSPORT_MEMORY = TransportMemory(
+    os.getenv("CUBEAI_SMTP_TRANSPORT_CACHE", os.path.expanduser("~/.cubeai/smtp-transports.json")),
+    float(os.getenv("CUBEAI_SMTP_TRANSPORT_TTL", "86400")),
+)
+
+
+def _connect_transport(email_config: dict, transport: str, context: ssl.SSLContext) -> smtplib.SMTP:
+    """
+    Ouvre et authentifie une connexion avec le transport donné ("ssl" ou "starttls")
+    """
+    host = email_config["smtp_server"]
+    if transport == "ssl":
+        port = email_config["smtp_port"]
+        tls_context = _SessionReusingContext(context, (host, port))
+        server = TimedSMTP_SSL(host, port, context=tls_context, account=email_config["user"])
+    else:
+        port = 587
+        tls_context = _SessionReusingContext(context, (host, port))
+        server = TimedSMTP(host, port, account=email_config["user"])
+    try:
+        if transport == "starttls":
+            server.ehlo()
+            server.starttls(context=tls_context)
+            server.ehlo()
+        server.login(email_config["user"], email_config["password"])
+    except Exception:
+        server.close()
+        raise
+    # Après l'échange (TLS 1.3 : ticket reçu), la session peut être reprise
+    if isinstance(server.sock, ssl.SSLSocket) and server.sock.session is not None:
+        _TLS_SESSIONS[(host, port)] = server.sock.session
+    return server
+
+
+def _discard_connection(future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    server = future.result()
+    try:
+        server.quit()
+    except Exception:
+        server.close()
 
-    context = ssl.create_default_context()
+
+def _race_transports(email_config: dict, context: ssl.SSLContext) -> tuple:
+    """
+    Tente SSL et STARTTLS en parallèle ; la première connexion authentifiée gagne,
+    l'autre est fermée dès qu'elle aboutit.
+
+    Returns:
+        (transport, server) ou (None, {transport: erreur})
+    """
+    executor = ThreadPoolExecutor(max_workers=2)
+    futures = {executor.submit(_connect_transport, email_config, t, context): t for t in ("ssl", "starttls")}
+    errors: Dict[str, Exception] = {}
+    winner = None
+    winning_future = None
+    for future in as_completed(futures):
+        transport = futures[future]
+        try:
+            server = future.result()
+        except Exception as e:
+            errors[transport] = e
+            continue
+        winner = (transport, server)
+        winning_future = future
+        break
+    # Toute autre connexion établie est fermée, qu'elle ait déjà abouti ou non
+    # (add_done_callback s'exécute immédiatement sur un future terminé)
+    for future in futures:
+        if future is not winning_future:
+            future.add_done_callback(_discard_connection)
+    executor.shutdown(wait=False)
+    return winner if winner else (None, errors)
+
+
+def open_smtp_connection(email_config: dict, context: ssl.SSLContext | None = None) -> smtplib.SMTP:
+    """
+    Ouvre une connexion SMTP authentifiée
+
+    Implicit TLS (port configuré) en priorité, puis STARTTLS sur 587 en secours.
+    Le transport qui a fonctionné est mémorisé par serveur (TRANSPORT_MEMORY) et
+    essayé en premier ensuite ; sans mémoire, CUBEAI_SMTP_RACE=1 tente les deux
+    en parallèle.
+    """
+    context = context or get_ssl_context()
+    host = email_config["smtp_server"]
+    preferred = TRANSPORT_MEMORY.get(host)
+    errors: Dict[str, Exception] = {}
+
+    if preferred is None and os.getenv("CUBEAI_SMTP_RACE") == "1":
+        transport, result = _race_transports(email_config, context)
+        if transport:
+            TRANSPORT_MEMORY.remember(host, transport)
+            return result
+        errors = result
+    else:
+        order = ["ssl", "starttls"]
+        if preferred == "starttls":
+            order.reverse()
+        for transport in order:
+            try:
+                server = _connect_transport(email_config, transport, context)
+            except Exception as e:
+                errors[transport] = e
+                continue
+            TRANSPORT_MEMORY.remember(host, transport)
+            return server
+
+    raise RuntimeError(f"SMTP sending failed (SSL:{errors.get('ssl')}) and (STARTTLS:{errors.get('starttls')})")
+
+
+def send_email(
+    to_email: str,
+    to_name: str,
+    account_username: str,
+    account_password: str,
+    plan: str,
+    *,
+    email_type: str = "hello",
+    app_base_url: str = "https://cube-ai.fr",
+    members: List[Dict[str, str]] | None = None,
+    registration_id: str | None = None,
+):
+    # Récupérer la configuration email
+    email_config = get_email_config(email_type)
+
+    msg = build_message(
+        to_email, to_name, account_username, account_password, plan,
+        email_type=email_type, app_base_url=app_base_url, members=members, registration_id=registration_id,
+    )
 
     # Prefer implicit TLS (465). If fails, fallback to STARTTLS (587)
+    with open_smtp_connection(email_config) as server:
+        server.send_message(msg)
+        print(f"📧 Email de bienvenue envoyé avec succès depuis {email_config['user']}")
+
+
+# Réponses SMTP indiquant que le serveur ferme la session (à rouvrir)
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, ssl.SSLError)
+
+# Refus temporaires du fournisseur par limitation de débit (421 service indisponible,
+# 451 action interrompue, 452 ressources insuffisantes / trop de destinataires)
+THROTTLE_CODES = (421, 451, 452)
+
+
+def _is_throttling_smtp_error(error: Exception) -> bool:
+    """
+    Refus temporaire dû à la limitation de débit du compte (le message est à renvoyer plus tard)
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(code in THROTTLE_CODES for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code in THROTTLE_CODES
+
+
+class SendRateController:
+    """
+    Débit d'envoi adaptatif d'une identité : seau à jetons réglé en AIMD
+
+    Le débit augmente d'environ `increase` messages/s par seconde d'envois réussis
+    (+increase/rate à chaque succès), jusqu'à max_rate, et est divisé par deux à
+    chaque refus temporaire (421/451/452) ; le seau est alors vidé pour marquer une
+    pause. Partagé par toutes les connexions de l'identité dans le processus : les
+    refus reçus pendant `hold_off` secondes après une réduction (messages déjà en vol
+    sur les autres connexions) ne réduisent pas le débit une seconde fois.
+    """
+
+    MIN_RATE = 0.05
+
+    def __init__(self, max_rate: float, increase: float = 1.0, hold_off: float = 2.0):
+        self.max_rate = max(self.MIN_RATE, max_rate)
+        self.rate = self.max_rate
+        self.increase = increase
+        self.hold_off = hold_off
+        self.tokens = 1.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._last_cut = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        # Rafale maximale d'une seconde de débit (au moins un message)
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Attend un jeton ; retourne le temps passé à attendre en secondes
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            if now - self._last_cut < self.hold_off:
+                return
+            self._last_cut = now
+            self.rate = max(self.MIN_RATE, self.rate / 2)
+            self.tokens = 0.0
+            self._updated = now
+
+
+_RATE_CONTROLLERS: Dict[str, SendRateController] = {}
+_RATE_LOCK = threading.Lock()
+
+
+def get_rate_controller(email_type: str) -> SendRateController:
+    """
+    Contrôleur de débit de l'identité, créé au premier appel (un par processus)
+    """
+    with _RATE_LOCK:
+        if email_type not in _RATE_CONTROLLERS:
+            _RATE_CONTROLLERS[email_type] = SendRateController(EMAIL_CONFIG[email_type]["max_rate"])
+        return _RATE_CONTROLLERS[email_type]
+
+
+class BulkSender:
+    """
+    Envoie plusieurs messages sur une seule connexion SMTP authentifiée
+
+    La connexion est rouverte de manière transparente si le serveur la ferme ; le
+    message en cours est alors renvoyé une fois. Chaque envoi attend un jeton du
+    contrôleur de débit de l'identité : un refus temporaire (421/451/452) réduit le
+    débit et le message est remis en attente, jusqu'à THROTTLE_RETRIES fois. Si le
+    serveur n'en refuse que certains destinataires, seuls ceux-là sont remis en
+    attente ; les refus restants lèvent SMTPRecipientsRefused.
+    """
+
+    THROTTLE_RETRIES = 8
+
+    def __init__(self, email_type: str = "hello"):
+        self.email_type = email_type
+        self.email_config = get_email_config(email_type)
+        self.context = get_ssl_context()
+        self.rate = get_rate_controller(email_type)
+        self.server: smtplib.SMTP | None = None
+        self.sent = 0
+        self.reconnects = 0
+        self.throttled = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.server is None:
+            self.server = open_smtp_connection(self.email_config, self.context)
+        return self.server
+
+    def _drop(self):
+        if self.server is not None:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+            self.server = None
+
+    def send(self, msg: EmailMessage):
+        self._send(lambda server, recipients: server.send_message(msg, to_addrs=recipients))
+
+    def send_raw(self, from_addr: str, to_addrs: List[str], data: bytes):
+        """
+        Envoie un message déjà sérialisé (octets RFC 5322 avec fins de ligne CRLF)
+        """
+        self._send(lambda server, recipients: server.sendmail(from_addr, recipients or to_addrs, data))
+
+    def _send(self, deliver):
+        reconnected = False
+        throttled = 0
+        # None : tous les destinataires du message ; sinon ceux refusés temporairement
+        recipients = None
+        rejected: Dict[str, tuple] = {}
+        while True:
+            self.rate.acquire()
+            server = self._connect()
+            try:
+                refused = deliver(server, recipients)
+                if refused:
+                    # Accepté pour une partie des destinataires seulement (ex. 452) : on ne
+                    # renvoie qu'aux destinataires limités, les autres l'ont déjà reçu
+                    limited = [recipient for recipient, (code, _) in refused.items() if code in THROTTLE_CODES]
+                    rejected.update({r: reply for r, reply in refused.items() if r not in limited})
+                    if limited and throttled < self.THROTTLE_RETRIES:
+                        recipients = limited
+                        throttled += 1
+                        self.throttled += 1
+                        self.rate.on_throttle()
+                        continue
+                    raise smtplib.SMTPRecipientsRefused({**rejected, **refused})
+                if rejected:
+                    raise smtplib.SMTPRecipientsRefused(rejected)
+                self.sent += 1
+                self.rate.on_success()
+                return
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                if not _is_throttling_smtp_error(e) or throttled >= self.THROTTLE_RETRIES:
+                    raise
+                # Limitation de débit : on ralentit et le message repart après un jeton
+                throttled += 1
+                self.throttled += 1
+                self.rate.on_throttle()
+                if getattr(e, "smtp_code", None) != 421:
+                    continue
+            except RECONNECT_ERRORS:
+                if reconnected:
+                    raise
+                reconnected = True
+            # Le serveur a fermé la session : on se reconnecte et on renvoie
+            self._drop()
+            self.reconnects += 1
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_batch_records(source: str) -> Iterator[dict]:
+    """
+    Lit les destinataires au format JSON lines depuis un fichier ou stdin ("-")
+
+    Chaque ligne contient: to, to_name, account_username, account_password, plan
+    et optionnellement members, registration_id. Une ligne JSON invalide est renvoyée
+    marquée (_invalid) : message_from_record la refuse et elle compte comme un échec.
+    """
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
     try:
-        with smtplib.SMTP_SSL(email_config["smtp_server"], email_config["smtp_port"], context=context) as server:
-            server.login(email_config["user"], email_config["password"])
-            server.send_message(msg)
-            print(f"📧 Email de bienvenue envoyé avec succès depuis {email_config['user']}")
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"_line": line_number, "_invalid": f"JSON invalide: {e}"}
+                continue
+            record["_line"] = line_number
+            yield record
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class IdentityQuota:
+    """
+    Quota d'envoi glissant sur une heure, partagé par les connexions d'une identité
+    """
+
+    def __init__(self, per_hour: int):
+        self.per_hour = per_hour
+        self._sent: deque = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._sent and now - self._sent[0] >= 3600:
+            self._sent.popleft()
+
+    def remaining(self) -> float:
+        if not self.per_hour:
+            return float("inf")
+        with self._lock:
+            self._prune(time.monotonic())
+            return self.per_hour - len(self._sent)
+
+    def acquire(self) -> float:
+        """
+        Réserve un envoi. Retourne 0 si accordé, sinon le délai d'attente en secondes.
+        """
+        if not self.per_hour:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            if len(self._sent) < self.per_hour:
+                self._sent.append(now)
+                return 0.0
+            return 3600 - (now - self._sent[0])
+
+
+class SMTPWorker(threading.Thread):
+    """
+    Connexion SMTP persistante d'une identité, avec sa propre file et son état de santé
+
+    Après une erreur de connexion, la connexion est mise de côté (backoff croissant)
+    et ses messages sont redistribués par le pool. Un refus propre au message
+    (destinataires refusés, 5xx) ne touche ni la connexion ni son état de santé ;
+    un refus définitif n'est pas réessayé.
+    """
+
+    MAX_BACKOFF = 300.0
+
+    def __init__(self, pool: "SMTPWorkerPool", identity: str, index: int, quota: IdentityQuota):
+        super().__init__(name=f"smtp-{identity}-{index}", daemon=True)
+        self.pool = pool
+        self.identity = identity
+        self.quota = quota
+        self.from_address = get_from_address(identity)
+        self.queue: queue.Queue = queue.Queue()
+        self.sender = BulkSender(identity)
+        self.sent = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.last_error: str | None = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            msg, attempts = item
+            if not self.healthy:
+                time.sleep(max(0.0, self.unhealthy_until - time.monotonic()))
+            wait = self.quota.acquire()
+            if wait > 0:
+                # Quota de l'identité épuisé : une autre identité peut prendre le message
+                target = self.pool._pick_worker(exclude=self)
+                if target.identity != self.identity and self.pool._has_quota(target.identity):
+                    target.queue.put(item)
+                    continue
+                while wait > 0:
+                    time.sleep(min(wait, 60))
+                    wait = self.quota.acquire()
+            try:
+                msg.replace_header("From", self.from_address)
+                self.sender.send(msg)
+            except Exception as e:
+                if is_permanent_smtp_error(e) or isinstance(e, smtplib.SMTPRecipientsRefused):
+                    self.failed += 1
+                    self.last_error = str(e)
+                    self.pool._on_done(self, msg, attempts, e, retry=not is_permanent_smtp_error(e))
+                    continue
+                self.failed += 1
+                self.consecutive_failures += 1
+                self.last_error = str(e)
+                backoff = min(self.MAX_BACKOFF, 2 ** self.consecutive_failures)
+                self.unhealthy_until = time.monotonic() + backoff
+                self.sender._drop()
+                self.pool._on_done(self, msg, attempts, e)
+                self._redistribute()
+            else:
+                self.sent += 1
+                self.consecutive_failures = 0
+                self.pool._on_done(self, msg, attempts, None)
+        self.sender.close()
+
+    def _redistribute(self):
+        """
+        Confie les messages en attente à une connexion saine pendant la pause
+        """
+        target = self.pool._pick_worker(exclude=self)
+        if target is self or not target.healthy:
             return
-    except Exception as e:
-        # Fallback: try STARTTLS on 587
-        try:
-            with smtplib.SMTP(email_config["smtp_server"], 587) as server:
-                server.ehlo()
-                server.starttls(context=context)
-                server.ehlo()
-                server.login(email_config["user"], email_config["password"])
-                server.send_message(msg)
-                print(f"📧 Email de bienvenue envoyé avec succès depuis {email_config['user']}")
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is None:
+                self.queue.put(None)
                 return
-        except Exception as e2:
-            raise RuntimeError(f"SMTP sending failed (SSL:{e}) and (STARTTLS:{e2})")
+            target.queue.put(item)
+
+    def health(self) -> dict:
+        return {
+            "worker": self.name,
+            "identity": self.identity,
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+            "throttled": self.sender.throttled,
+            "rate": round(self.sender.rate.rate, 2),
+        }
+
+
+class SMTPWorkerPool:
+    """
+    Pool de connexions SMTP réparties sur plusieurs identités EMAIL_CONFIG
+
+    Chaque message part vers la connexion saine la moins chargée dont l'identité
+    a encore du quota ; un message en échec est réessayé sur une autre connexion.
+    """
+
+    def __init__(
+        self,
+        identities: List[str],
+        connections_per_identity: int = 2,
+        max_pending: int = 1000,
+        max_attempts: int = 3,
+    ):
+        eligible = [i for i in identities if EMAIL_CONFIG[i]["password"]]
+        if not eligible:
+            raise ValueError(f"Aucune identité SMTP configurée parmi: {identities}")
+        self.max_attempts = max_attempts
+        self.quotas = {i: IdentityQuota(EMAIL_CONFIG[i]["hourly_quota"]) for i in eligible}
+        self.workers = [
+            SMTPWorker(self, identity, index, self.quotas[identity])
+            for identity in eligible
+            for index in range(connections_per_identity)
+        ]
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0
+        self.failures: List[tuple] = []
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def _has_quota(self, identity: str) -> bool:
+        """
+        Vrai si l'identité a encore du quota en tenant compte des messages déjà en file
+        """
+        queued = sum(w.queue.qsize() for w in self.workers if w.identity == identity)
+        return self.quotas[identity].remaining() - queued > 0
+
+    def _pick_worker(self, exclude: SMTPWorker | None = None) -> SMTPWorker:
+        candidates = [w for w in self.workers if w is not exclude] or self.workers
+        return min(
+            candidates,
+            key=lambda w: (not w.healthy, not self._has_quota(w.identity), w.queue.qsize()),
+        )
+
+    def submit(self, msg: EmailMessage):
+        """
+        Met un message en file (bloque si trop de messages sont en attente)
+        """
+        self._slots.acquire()
+        with self._lock:
+            self._outstanding += 1
+        self._pick_worker().queue.put((msg, 0))
+
+    def _on_done(self, worker: SMTPWorker, msg: EmailMessage, attempts: int, error: Exception | None,
+                 retry: bool = True):
+        if error is not None and retry and attempts + 1 < self.max_attempts:
+            self._pick_worker(exclude=worker).queue.put((msg, attempts + 1))
+            return
+        if error is not None:
+            self.failures.append((msg["To"], str(error)))
+            print(f"❌ {msg['To']}: {error}", file=sys.stderr)
+        self._slots.release()
+        with self._lock:
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._idle.notify_all()
+
+    def join(self):
+        """
+        Attend la fin des envois puis ferme les connexions
+        """
+        with self._lock:
+            while self._outstanding:
+                self._idle.wait()
+        for worker in self.workers:
+            worker.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def health_report(self) -> List[dict]:
+        return [worker.health() for worker in self.workers]
+
+
+def message_from_record(record: dict, *, email_type: str, app_base_url: str) -> EmailMessage:
+    if "_invalid" in record:
+        raise ValueError(record["_invalid"])
+    return build_message(
+        record["to"],
+        record["to_name"],
+        record["account_username"],
+        record["account_password"],
+        record["plan"],
+        email_type=email_type,
+        app_base_url=app_base_url,
+        members=record.get("members"),
+        registration_id=record.get("registration_id"),
+    )
+
+
+def send_batch(
+    source: str,
+    *,
+    email_type: str = "hello",
+    app_base_url: str = "https://cube-ai.fr",
+    identities: List[str] | None = None,
+    connections_per_identity: int = 1,
+) -> int:
+    """
+    Envoie les emails de bienvenue d'un lot sur des connexions SMTP persistantes
+
+    Sans identities, tout passe par une seule connexion de email_type ; sinon par
+    un SMTPWorkerPool réparti sur les identités demandées.
+
+    Returns:
+        int: Nombre de messages en échec
+    """
+    failed = 0
+    start = time.perf_counter()
+
+    if identities:
+        pool = SMTPWorkerPool(identities, connections_per_identity)
+        pool.start()
+        try:
+            for record in iter_batch_records(source):
+                try:
+                    pool.submit(message_from_record(record, email_type=email_type, app_base_url=app_base_url))
+                except KeyError as e:
+                    failed += 1
+                    print(f"❌ Ligne {record['_line']}: champ manquant {e}", file=sys.stderr)
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Ligne {record['_line']} ({record.get('to')}): {e}", file=sys.stderr)
+        finally:
+            # Messages déjà soumis livrés et workers arrêtés, même si la lecture du lot échoue
+            pool.join()
+        failed += len(pool.failures)
+        health = pool.health_report()
+        sent = sum(w["sent"] for w in health)
+        reconnects = sum(w.sender.reconnects for w in pool.workers)
+        throttled = sum(w["throttled"] for w in health)
+        for w in health:
+            status = "ok" if w["healthy"] else f"en pause ({w['last_error']})"
+            print(
+                f"   {w['worker']}: {w['sent']} envoyés, {w['failed']} erreurs, "
+                f"{w['throttled']} limitations (débit {w['rate']} msg/s), {status}"
+            )
+    else:
+        with BulkSender(email_type) as sender:
+            for record in iter_batch_records(source):
+                try:
+                    sender.send(message_from_record(record, email_type=email_type, app_base_url=app_base_url))
+                except KeyError as e:
+                    failed += 1
+                    print(f"❌ Ligne {record['_line']}: champ manquant {e}", file=sys.stderr)
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Ligne {record['_line']} ({record.get('to')}): {e}", file=sys.stderr)
+            sent, reconnects, throttled = sender.sent, sender.reconnects, sender.throttled
+
+    elapsed = time.perf_counter() - start
+    rate = sent / elapsed if elapsed > 0 else 0.0
+    print(
+        f"📧 {sent} emails envoyés, {failed} en échec, {reconnects} reconnexions, "
+        f"{throttled} limitations de débit en {elapsed:.1f}s ({rate:.1f} messages/s)"
+    )
+    return failed
+
+# Destinataires envoyés ensemble à un processus de rendu (amortit le coût des échanges)
+RENDER_CHUNK_SIZE = 32
+
+
+def render_records(records: List[dict], email_type: str, app_base_url: str) -> List[tuple]:
+    """
+    Rend des destinataires du lot en octets prêts pour sendmail (exécuté dans le pool de processus)
+
+    Returns:
+        Par destinataire, (ligne, To, expéditeur d'enveloppe, destinataires d'enveloppe, octets CRLF)
+        ou (ligne, To, None, None, message d'erreur) si le rendu échoue
+    """
+    rendered = []
+    for record in records:
+        try:
+            msg = message_from_record(record, email_type=email_type, app_base_url=app_base_url)
+        except KeyError as e:
+            rendered.append((record["_line"], record.get("to"), None, None, f"champ manquant {e}"))
+            continue
+        except Exception as e:
+            rendered.append((record["_line"], record.get("to"), None, None, f"rendu impossible: {e}"))
+            continue
+        to_addrs = [address for _, address in email.utils.getaddresses(msg.get_all("To", []))]
+        from_addr = email.utils.parseaddr(msg["From"])[1]
+        rendered.append((record["_line"], msg["To"], from_addr, to_addrs, msg.as_bytes(policy=email.policy.SMTP)))
+    return rendered
+
+
+def _chunked(records: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    chunk: List[dict] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def send_batch_pipelined(
+    source: str,
+    *,
+    email_type: str = "hello",
+    app_base_url: str = "https://cube-ai.fr",
+    render_workers: int = 2,
+    queue_size: int = 256,
+) -> int:
+    """
+    Envoie un lot en recouvrant rendu et envoi : les messages sont rendus dans un pool
+    de processus et passent à la connexion SMTP par une file bornée
+
+    Le fichier est lu au fil de l'eau ; au plus 2 × render_workers paquets de
+    RENDER_CHUNK_SIZE rendus en cours et queue_size messages prêts sont gardés en
+    mémoire, quelle que soit la taille du lot.
+
+    Returns:
+        int: Nombre de messages en échec
+    """
+    ready: queue.Queue = queue.Queue(maxsize=queue_size)
+    # Compteurs séparés : send_failed n'est modifié que par le thread d'envoi,
+    # render_failed que par le thread principal
+    state = {"send_failed": 0, "render_failed": 0, "sent": 0, "reconnects": 0, "throttled": 0, "error": None}
+    # Configuration SMTP invalide (ValueError) : erreur immédiate, avant de lancer le rendu
+    sender = BulkSender(email_type)
+
+    def send_loop():
+        try:
+            with sender:
+                while True:
+                    item = ready.get()
+                    if item is None:
+                        break
+                    line, to, from_addr, to_addrs, data = item
+                    try:
+                        sender.send_raw(from_addr, to_addrs, data)
+                    except Exception as e:
+                        state["send_failed"] += 1
+                        print(f"❌ Ligne {line} ({to}): {e}", file=sys.stderr)
+        except BaseException as e:
+            state["error"] = e
+        finally:
+            state["sent"], state["reconnects"], state["throttled"] = sender.sent, sender.reconnects, sender.throttled
+
+    def put(item) -> bool:
+        # File pleine et thread d'envoi arrêté : personne ne la viderait plus
+        while True:
+            try:
+                ready.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if not sender_thread.is_alive():
+                    return False
+
+    def hand_over(future) -> bool:
+        for line, to, from_addr, to_addrs, data in future.result():
+            if from_addr is None:
+                state["render_failed"] += 1
+                print(f"❌ Ligne {line} ({to}): {data}", file=sys.stderr)
+            elif not put((line, to, from_addr, to_addrs, data)):
+                return False
+        return True
+
+    start = time.perf_counter()
+    sender_thread = threading.Thread(target=send_loop, name="smtp-send", daemon=True)
+    sender_thread.start()
+    in_flight: deque = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=render_workers) as executor:
+            for chunk in _chunked(iter_batch_records(source), RENDER_CHUNK_SIZE):
+                in_flight.append(executor.submit(render_records, chunk, email_type, app_base_url))
+                # Fenêtre bornée : on attend le plus ancien paquet (ordre du fichier conservé)
+                if len(in_flight) >= 2 * render_workers and not hand_over(in_flight.popleft()):
+                    break
+            while in_flight and sender_thread.is_alive():
+                if not hand_over(in_flight.popleft()):
+                    break
+            for future in in_flight:
+                future.cancel()
+    finally:
+        put(None)
+        sender_thread.join()
+
+    if state["error"] is not None:
+        print(f"❌ Envoi interrompu: {state['error']!r}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    sent, failed = state["sent"], state["send_failed"] + state["render_failed"]
+    if state["error"] is not None:
+        failed = max(1, failed)
+    rate = sent / elapsed if elapsed > 0 else 0.0
+    print(
+        f"📧 {sent} emails envoyés, {failed} en échec, {state['reconnects']} reconnexions, "
+        f"{state['throttled']} limitations de débit en {elapsed:.1f}s ({rate:.1f} messages/s, rendu sur {render_workers} processus)"
+    )
+    return failed
+
+
+def _eml_filename(index: int, to: str) -> str:
+    address = email.utils.parseaddr(to)[1] or "destinataire"
+    return f"{index:06d}-{re.sub(r'[^A-Za-z0-9@._-]', '_', address)}.eml"
+
+
+def render_to_directory(
+    records: Iterator[dict],
+    out_dir: str,
+    *,
+    fmt: str = "eml",
+    email_type: str = "hello",
+    app_base_url: str = "https://cube-ai.fr",
+) -> dict:
+    """
+    Rend les messages complets sans aucun échange réseau ni identifiants SMTP
+
+    fmt="eml" écrit un fichier NNNNNN-<adresse>.eml par message (CRLF, noms stables :
+    deux rendus se comparent avec diff -r) ; fmt="maildir" les dépose dans un Maildir.
+
+    Returns:
+        dict: Résumé latency_summary du rendu (construction + sérialisation) par message,
+        plus le volume écrit et le temps d'écriture
+    """
+
+    maildir = mailbox.Maildir(out_dir, create=True) if fmt == "maildir" else None
+    if maildir is None:
+        os.makedirs(out_dir, exist_ok=True)
+    samples: List[float] = []
+    errors = 0
+    total_bytes = 0
+    write_seconds = 0.0
+    start = time.perf_counter()
+    for index, record in enumerate(records, 1):
+        line = record.get("_line", index)
+        render_start = time.perf_counter()
+        try:
+            msg = message_from_record(record, email_type=email_type, app_base_url=app_base_url)
+            # Frontière MIME stable (aléatoire par défaut) pour que deux rendus se comparent
+            msg.set_boundary(f"=_cubeai-render-{line:06d}")
+            # Maildir attend des fins de ligne locales, un .eml le message tel qu'envoyé
+            data = msg.as_bytes() if maildir is not None else msg.as_bytes(policy=email.policy.SMTP)
+        except KeyError as e:
+            errors += 1
+            print(f"❌ Ligne {line}: champ manquant {e}", file=sys.stderr)
+            continue
+        except Exception as e:
+            errors += 1
+            print(f"❌ Ligne {line} ({record.get('to')}): {e}", file=sys.stderr)
+            continue
+        samples.append(time.perf_counter() - render_start)
+
+        write_start = time.perf_counter()
+        if maildir is not None:
+            maildir.add(data)
+        else:
+            with open(os.path.join(out_dir, _eml_filename(line, msg["To"])), "wb") as f:
+                f.write(data)
+        write_seconds += time.perf_counter() - write_start
+        total_bytes += len(data)
+
+    summary = latency_summary(samples, errors, time.perf_counter() - start)
+    summary["bytes"] = total_bytes
+    summary["render_s"] = round(sum(samples), 3)
+    summary["write_s"] = round(write_seconds, 3)
+    return summary
+
+
+def enqueue_message(outbox: Outbox, msg: EmailMessage, email_type: str) -> int:
+    """
+    Dépose un message rendu dans l'outbox (aucun échange SMTP)
+    """
+    return outbox.enqueue(email_type, msg["To"], msg.as_bytes())
+
+
+OUTBOX_DELAY_SECONDS = REGISTRY.histogram(
+    "cubeai_outbox_delivery_delay_seconds",
+    "Délai entre la mise en file et la livraison d'un message de l'outbox",
+    ("account",),
+)
+
+
+def is_permanent_smtp_error(error: Exception) -> bool:
+    """
+    Refus définitif du message (5xx sur l'expéditeur, les destinataires ou les données)
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+class OutboxDrainer:
+    """
+    Livre les messages de l'outbox avec `concurrency` connexions SMTP persistantes
+
+    Chaque worker ne réserve un message que lorsqu'il est libre : la concurrence
+    reste bornée quel que soit le volume en file. Les erreurs temporaires sont
+    replanifiées (backoff exponentiel), les refus 5xx et les messages ayant épuisé
+    leurs tentatives passent en dead-letter.
+    """
+
+    def __init__(self, outbox: Outbox, concurrency: int = 2, poll_interval: float = 1.0, once: bool = False):
+        self.outbox = outbox
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _deliver(self, senders: Dict[str, BulkSender], item: dict):
+        email_type = item["email_type"]
+        try:
+            sender = senders.get(email_type)
+            if sender is None:
+                sender = senders[email_type] = BulkSender(email_type)
+            sender.send(email.message_from_bytes(item["message"], policy=email.policy.default))
+        except Exception as e:
+            if email_type in senders:
+                senders[email_type]._drop()
+            if self.outbox.fail(item["id"], item["attempts"], str(e), is_permanent_smtp_error(e)):
+                self._count("dead")
+                print(f"💀 #{item['id']} {item['recipient']}: {e} (dead-letter)", file=sys.stderr)
+            else:
+                self._count("retried")
+                print(f"⚠️ #{item['id']} {item['recipient']}: {e} (nouvelle tentative planifiée)", file=sys.stderr)
+        else:
+            self.outbox.ack(item["id"])
+            self._count("sent")
+            OUTBOX_DELAY_SECONDS.observe(time.time() - item["created_at"], account=email_type)
+
+    def _work(self):
+        senders: Dict[str, BulkSender] = {}
+        try:
+            while not self.stop_event.is_set():
+                item = self.outbox.claim()
+                if item is None:
+                    if self.once:
+                        return
+                    due_in = self.outbox.next_due_in()
+                    self.stop_event.wait(self.poll_interval if due_in is None else min(due_in, self.poll_interval) or 0.05)
+                    continue
+                self._deliver(senders, item)
+        finally:
+            for sender in senders.values():
+                sender.close()
+
+    def run(self):
+        """
+        Démarre les workers et attend leur fin (file vide avec once, sinon stop())
+        """
+        workers = [
+            threading.Thread(target=self._work, name=f"outbox-{index}", daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.5)
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+
+def drain_outbox(outbox: Outbox, *, concurrency: int = 2, poll_interval: float = 1.0, once: bool = False) -> int:
+    """
+    Vide l'outbox (en continu, ou jusqu'à épuisement des messages dus avec once)
+
+    Returns:
+        int: Nombre de messages passés en dead-letter
+    """
+    drainer = OutboxDrainer(outbox, concurrency, poll_interval, once)
+    signal.signal(signal.SIGTERM, drainer.stop)
+    signal.signal(signal.SIGINT, drainer.stop)
+    mode = "jusqu'à épuisement" if once else "en continu"
+    print(f"📤 Drain de l'outbox {outbox.path} ({concurrency} connexions, {mode})")
+    start = time.perf_counter()
+    drainer.run()
+    stats = outbox.stats()
+    print(
+        f"📧 {drainer.sent} emails envoyés, {drainer.retried} replanifiés, {drainer.dead} en dead-letter "
+        f"en {time.perf_counter() - start:.1f}s — file: {stats['pending']} en attente, {stats['dead']} dead-letter"
+    )
+    return drainer.dead
+
+def process_age() -> float | None:
+    """
+    Secondes écoulées depuis le lancement du processus (Linux, via /proc), sinon None
+    """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+class WelcomeEmailWorker:
+    """
+    Processus longue durée : configuration chargée une fois, connexions SMTP gardées chaudes
+
+    Protocole JSON lines : une requête par ligne (champs de --batch, plus "id" et
+    "email_type" optionnels), une réponse par ligne dans le même ordre :
+      {"id": ..., "ok": true, "to": ..., "elapsed_ms": ...}
+      {"id": ..., "ok": false, "error": ...}
+    La première ligne émise est {"event": "ready", ...} avec les temps de démarrage.
+    """
+
+    def __init__(self, email_type: str = "hello", app_base_url: str = "https://cube-ai.fr",
+                 keepalive: float = 60.0):
+        self.email_type = email_type
+        self.app_base_url = app_base_url
+        self.keepalive = keepalive
+        self.senders: Dict[str, BulkSender] = {}
+        self._sender_locks: Dict[str, threading.Lock] = {}
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def _sender(self, email_type: str) -> tuple:
+        with self._lock:
+            if email_type not in self.senders:
+                self.senders[email_type] = BulkSender(email_type)
+                self._sender_locks[email_type] = threading.Lock()
+            return self.senders[email_type], self._sender_locks[email_type]
+
+    def warm(self) -> dict:
+        """
+        Ouvre la connexion SMTP par défaut et mesure le démarrage
+        """
+        started_ms = process_age()
+        ready = {"event": "ready", "pid": os.getpid()}
+        if started_ms is not None:
+            ready["startup_ms"] = round(started_ms * 1000, 1)
+        start = time.perf_counter()
+        try:
+            sender, lock = self._sender(self.email_type)
+            with lock:
+                sender._connect()
+            self._last_used[self.email_type] = time.monotonic()
+        except Exception as e:
+            ready["smtp_error"] = str(e)
+        ready["smtp_connect_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        ready_s = process_age()
+        if ready_s is not None:
+            ready["ready_ms"] = round(ready_s * 1000, 1)
+        print(
+            f"🚀 Worker prêt (démarrage {ready.get('startup_ms', '?')} ms, "
+            f"connexion SMTP {ready['smtp_connect_ms']} ms)",
+            file=sys.stderr,
+        )
+        return ready
+
+    def handle(self, request: dict) -> dict:
+        """
+        Envoie un email de bienvenue et renvoie le résultat de la requête
+        """
+        start = time.perf_counter()
+        email_type = request.get("email_type") or self.email_type
+        response = {"id": request.get("id"), "ok": False}
+        try:
+            if email_type not in EMAIL_CONFIG:
+                raise ValueError(f"Type d'email invalide: {email_type}")
+            msg = message_from_record(request, email_type=email_type, app_base_url=self.app_base_url)
+            sender, lock = self._sender(email_type)
+            with lock:
+                try:
+                    sender.send(msg)
+                except Exception as e:
+                    # Connexion inutilisable : fermée sous le verrou, rouverte à la requête suivante ;
+                    # un refus SMTP (destinataire, expéditeur, contenu) laisse la connexion ouverte
+                    # (SMTPException hérite d'OSError)
+                    if isinstance(e, smtplib.SMTPServerDisconnected) or (
+                        isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)
+                    ):
+                        sender._drop()
+                    raise
+                self._last_used[email_type] = time.monotonic()
+        except KeyError as e:
+            response["error"] = f"champ manquant {e}"
+        except Exception as e:
+            response["error"] = str(e)
+        else:
+            response.update(ok=True, to=request["to"])
+        response["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return response
+
+    def handle_line(self, line: str) -> str | None:
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("objet JSON attendu")
+        except ValueError as e:
+            return json.dumps({"id": None, "ok": False, "error": f"requête invalide: {e}"}, ensure_ascii=False)
+        return json.dumps(self.handle(request), ensure_ascii=False)
+
+    def _keepalive_loop(self):
+        """
+        NOOP sur les connexions inactives pour qu'elles restent ouvertes ; une connexion
+        refusée est fermée et sera rouverte à la prochaine requête
+        """
+        while not self.stop_event.wait(self.keepalive / 2):
+            for email_type, sender in list(self.senders.items()):
+                lock = self._sender_locks[email_type]
+                if time.monotonic() - self._last_used.get(email_type, 0) < self.keepalive:
+                    continue
+                if sender.server is None or not lock.acquire(blocking=False):
+                    continue
+                try:
+                    sender.server.noop()
+                    self._last_used[email_type] = time.monotonic()
+                except Exception:
+                    sender._drop()
+                finally:
+                    lock.release()
+
+    def _start(self, out) -> None:
+        out.write(json.dumps(self.warm()) + "\n")
+        out.flush()
+        if self.keepalive > 0:
+            threading.Thread(target=self._keepalive_loop, name="smtp-keepalive", daemon=True).start()
+
+    def serve_stdio(self):
+        """
+        Lit les requêtes sur stdin, répond sur stdout (jusqu'à EOF)
+        """
+        self._start(sys.stdout)
+        for line in sys.stdin:
+            reply = self.handle_line(line)
+            if reply is not None:
+                sys.stdout.write(reply + "\n")
+                sys.stdout.flush()
+        self.close()
+
+    def serve_unix(self, path: str):
+        """
+        Écoute sur une socket Unix (une connexion par client, requêtes JSON lines)
+        """
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    reply = worker.handle_line(raw.decode("utf-8", "replace"))
+                    if reply is not None:
+                        self.wfile.write(reply.encode("utf-8") + b"\n")
+                        self.wfile.flush()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        os.chmod(path, 0o660)
+
+        def shutdown(*_):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        self._start(sys.stdout)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(path):
+                os.unlink(path)
+            self.close()
+
+    def close(self):
+        self.stop_event.set()
+        for sender in self.senders.values():
+            sender.close()
+
+
+def print_render_summary(summary: dict, out_dir: str):
+    rendered = summary["requests"] - summary["errors"]
+    print(
+        f"🧪 {rendered} messages rendus dans {out_dir} ({summary['bytes'] / 1024:.0f} Ko), "
+        f"{summary['errors']} en échec — {summary['throughput_per_s']} messages/s"
+    )
+    print(
+        f"   rendu + sérialisation: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+        f"p99 {summary['p99_ms']} ms, total {summary['render_s']}s ; écriture {summary['write_s']}s"
+    )
 
 
 def main():
     parser = argparse.ArgumentParser(description="Send CubeAI welcome email")
-    parser.add_argument("--to", required=True, help="Recipient email")
-    parser.add_argument("--to-name", required=True, help="Recipient display name")
-    parser.add_argument("--account-username", required=True, help="CubeAI account username")
-    parser.add_argument("--account-password", required=True, help="CubeAI account password")
-    parser.add_argument("--plan", choices=["STARTER", "PRO", "PREMIUM"], required=True, help="Selected plan")
+    parser.add_argument("--to", help="Recipient email")
+    parser.add_argument("--to-name", help="Recipient display name")
+    parser.add_argument("--account-username", help="CubeAI account username")
+    parser.add_argument("--account-password", help="CubeAI account password")
+    parser.add_argument("--plan", choices=["STARTER", "PRO", "PREMIUM"], help="Selected plan")
+    parser.add_argument("--batch", metavar="FILE", help="JSON lines file of recipients ('-' for stdin), sent over one SMTP connection")
+    parser.add_argument("--identities", help="Comma-separated EMAIL_CONFIG identities to spread a --batch across (worker pool)")
+    parser.add_argument("--connections-per-identity", type=int, default=2, help="SMTP connections per identity in pool mode")
+    parser.add_argument("--render-workers", type=int, default=0, help="Render a --batch in N processes while sending (0 = render inline)")
+    parser.add_argument("--render-queue", type=int, default=256, help="Rendered messages buffered ahead of the SMTP connection with --render-workers")
     parser.add_argument("--members-json", help="JSON array of members with firstName,lastName,sessionId/username,password,userType")
     parser.add_argument("--registration-id", help="Registration identifier to include in the email")
     parser.add_argument("--email-type", choices=["hello", "support", "noreply"], default="hello", help="Type d'email à utiliser")
@@ -363,11 +1864,122 @@ def main():
     # Optional overrides
     parser.add_argument("--app-base-url", default=os.getenv("APP_BASE_URL", "https://cube-ai.fr"))
 
+    parser.add_argument("--render-only", metavar="DIR", help="Write the rendered message(s) to DIR instead of sending (no network, no SMTP password)")
+    parser.add_argument("--render-format", choices=["eml", "maildir"], default="eml", help="Output layout for --render-only")
+
+    parser.add_argument("--bench-templates", type=int, metavar="N", help="Benchmark template rendering over N iterations and exit")
+
+    # Outbox
+    parser.add_argument("--enqueue", action="store_true", help="Render and store the message(s) in the outbox instead of sending")
+    parser.add_argument("--drain", action="store_true", help="Deliver messages from the outbox")
+    parser.add_argument("--once", action="store_true", help="With --drain, exit when no message is due")
+    parser.add_argument("--drain-concurrency", type=int, default=2, help="SMTP connections used by --drain")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between outbox polls when idle")
+    parser.add_argument("--outbox-stats", action="store_true", help="Print outbox message counts per status and exit")
+    parser.add_argument("--requeue-dead", action="store_true", help="Move dead-lettered messages back to the queue and exit")
+
+    # Worker longue durée
+    parser.add_argument("--worker", action="store_true", help="Serve JSON line requests on stdin/stdout with a warm SMTP connection")
+    parser.add_argument("--socket", metavar="PATH", help="Serve JSON line requests on a Unix domain socket instead of stdin")
+    parser.add_argument("--keepalive", type=float, default=60.0, help="Seconds of inactivity before a NOOP keeps the worker's SMTP connection open (0 = off)")
+
     args = parser.parse_args()
+    export_at_exit("welcome_email")
+
+    if args.worker or args.socket:
+        worker = WelcomeEmailWorker(args.email_type, args.app_base_url, args.keepalive)
+        if args.socket:
+            worker.serve_unix(args.socket)
+        else:
+            worker.serve_stdio()
+        return
+
+    if args.bench_templates:
+        print(f"{'plan':<10}{'membres':<10}{'cold (µs)':>12}{'warm (µs)':>12}")
+        for row in benchmark_templates(args.bench_templates):
+            print(f"{row['plan']:<10}{'oui' if row['members'] else 'non':<10}{row['cold_us']:>12}{row['warm_us']:>12}")
+        return
+
+    if args.outbox_stats or args.requeue_dead or args.drain:
+        outbox = Outbox()
+        if args.requeue_dead:
+            print(f"♻️ {outbox.requeue_dead()} messages remis en file")
+        if args.outbox_stats:
+            print(json.dumps(outbox.stats()))
+        if args.drain:
+            dead = drain_outbox(
+                outbox, concurrency=args.drain_concurrency, poll_interval=args.poll_interval, once=args.once,
+            )
+            sys.exit(1 if dead else 0)
+        return
+
+    if args.render_only and args.batch:
+        summary = render_to_directory(
+            iter_batch_records(args.batch), args.render_only,
+            fmt=args.render_format, email_type=args.email_type, app_base_url=args.app_base_url,
+        )
+        print_render_summary(summary, args.render_only)
+        sys.exit(1 if summary["errors"] else 0)
+
+    if args.enqueue and args.batch:
+        outbox = Outbox()
+        queued = failed = 0
+        for record in iter_batch_records(args.batch):
+            try:
+                enqueue_message(
+                    outbox, message_from_record(record, email_type=args.email_type, app_base_url=args.app_base_url),
+                    args.email_type,
+                )
+                queued += 1
+            except KeyError as e:
+                failed += 1
+                print(f"❌ Ligne {record['_line']}: champ manquant {e}", file=sys.stderr)
+            except OutboxFull as e:
+                print(f"⏸️ Outbox pleine après {queued} messages: {e}", file=sys.stderr)
+                sys.exit(75)
+            except Exception as e:
+                failed += 1
+                print(f"❌ Ligne {record['_line']} ({record.get('to')}): {e}", file=sys.stderr)
+        print(f"📥 {queued} emails mis en file, {failed} en échec")
+        sys.exit(1 if failed else 0)
+
+    if args.batch:
+        identities = [i.strip() for i in args.identities.split(",") if i.strip()] if args.identities else None
+        unknown = [i for i in identities or [] if i not in EMAIL_CONFIG]
+        if unknown:
+            parser.error(f"unknown identities: {', '.join(unknown)}")
+        if args.render_workers > 0 and not identities:
+            failed = send_batch_pipelined(
+                args.batch,
+                email_type=args.email_type,
+                app_base_url=args.app_base_url,
+                render_workers=args.render_workers,
+                queue_size=max(1, args.render_queue),
+            )
+            sys.exit(1 if failed else 0)
+        failed = send_batch(
+            args.batch,
+            email_type=args.email_type,
+            app_base_url=args.app_base_url,
+            identities=identities,
+            connections_per_identity=args.connections_per_identity,
+        )
+        sys.exit(1 if failed else 0)
+
+    missing = [
+        flag for flag, value in (
+            ("--to", args.to),
+            ("--to-name", args.to_name),
+            ("--account-username", args.account_username),
+            ("--account-password", args.account_password),
+            ("--plan", args.plan),
+        ) if not value
+    ]
+    if missing:
+        parser.error(f"the following arguments are required: {', '.join(missing)}")
 
     members = None
     if args.members_json:
-        import json
         try:
             members = json.loads(args.members_json)
             if not isinstance(members, list):
@@ -375,6 +1987,33 @@ def main():
         except Exception:
             members = None
 
+    if args.render_only:
+        record = {
+            "to": args.to, "to_name": args.to_name, "account_username": args.account_username,
+            "account_password": args.account_password, "plan": args.plan,
+            "members": members, "registration_id": args.registration_id,
+        }
+        summary = render_to_directory(
+            iter([record]), args.render_only,
+            fmt=args.render_format, email_type=args.email_type, app_base_url=args.app_base_url,
+        )
+        print_render_summary(summary, args.render_only)
+        sys.exit(1 if summary["errors"] else 0)
+
+    if args.enqueue:
+        msg = build_message(
+            args.to, args.to_name, args.account_username, args.account_password, args.plan,
+            email_type=args.email_type, app_base_url=args.app_base_url,
+            members=members, registration_id=args.registration_id,
+        )
+        try:
+            message_id = enqueue_message(Outbox(), msg, args.email_type)
+        except OutboxFull as e:
+            print(f"⏸️ Outbox pleine, email non mis en file: {e}", file=sys.stderr)
+            sys.exit(75)
+        print(f"📥 Email de bienvenue mis en file (#{message_id})")
+        return
+
     send_email(
         to_email=args.to,
         to_name=args.to_name,
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+kpi_aggregation.compute_daily_kpis comparé à calculate_daily_stats
+(migrations/create_daily_reports_tables.sql)
+
+Les valeurs attendues sont calculées par sql_daily_stats, transcription requête par
+requête de la fonction SQL pour une session (filtre sur la session et le jour, puis
+agrégat), avec l'arrondi des variables NUMERIC(5,2).
+
+  python3 -m pytest backend/scripts/tests
+"""
+
+import os
+import sys
+import random
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kpi_aggregation import compute_daily_kpis  # noqa: E402
+
+
+def numeric_5_2(value) -> float:
+    # Affectation à une variable NUMERIC(5,2) : arrondi demi-unité vers l'extérieur
+    return float(Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def rows(columns: dict) -> list:
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def sql_daily_stats(export: dict, session_id: str) -> dict:
+    """
+    calculate_daily_stats(session_id, date) sur les lignes de l'export
+    """
+    p_date = export["date"]
+    events = [e for e in rows(export.get("learningEvents") or {})
+              if e["sessionId"] == session_id and e["ts"][:10] == p_date]
+    quizzes = [q for q in rows(export.get("quizResults") or {})
+               if q["sessionId"] == session_id and q["ts"][:10] == p_date]
+
+    # SELECT COALESCE(SUM(duration_sec) / 60, 0) : division entière
+    total_time_min = sum(e["durationSec"] for e in events) // 60
+    # SELECT COUNT(DISTINCT DATE_TRUNC('hour', ts))
+    sessions_count = len({e["ts"][:13] for e in events})
+    # SELECT COALESCE(AVG(score), 0)
+    scores = [Decimal(str(q["score"])) for q in quizzes]
+    kpi_comprehension = numeric_5_2(sum(scores) / len(scores)) if scores else 0.0
+    # COUNT(*) / COUNT(CASE WHEN success_ratio >= 0.8 THEN 1 END) ... AND success_ratio IS NOT NULL
+    rated = [e for e in events if e["successRatio"] is not None]
+    successful = [e for e in rated if Decimal(str(e["successRatio"])) >= Decimal("0.8")]
+    kpi_assiduite = numeric_5_2(Decimal(len(successful)) / len(rated) * 100) if rated else 0.0
+    # SELECT module ... ORDER BY score DESC LIMIT 1
+    best_module = max(quizzes, key=lambda q: Decimal(str(q["score"])))["module"] if quizzes else None
+    # SELECT COALESCE(MAX(consecutive_days), 0) + 1 ... AND date < p_date
+    consecutive_days = int((export.get("previousConsecutiveDays") or {}).get(session_id) or 0) + 1
+    # SELECT COALESCE(AVG(duration_sec), 0)
+    focus_score = numeric_5_2(Decimal(sum(e["durationSec"] for e in events)) / len(events)) if events else 0.0
+
+    # AVG(score) par DATE(ts) sur [p_date - 7 jours, p_date], dernier jour comparé au
+    # précédent (LAG), NULLIF(..., 0) puis COALESCE(..., 0)
+    window_start = (date.fromisoformat(p_date) - timedelta(days=7)).isoformat()
+    by_day: dict = {}
+    for q in rows(export.get("quizResults") or {}):
+        if q["sessionId"] == session_id and window_start <= q["ts"][:10] <= p_date:
+            by_day.setdefault(q["ts"][:10], []).append(Decimal(str(q["score"])))
+    averages = [sum(by_day[day]) / len(by_day[day]) for day in sorted(by_day)]
+    kpi_progression = 0.0
+    if len(averages) >= 2 and averages[-2] != 0:
+        kpi_progression = numeric_5_2((averages[-1] - averages[-2]) / averages[-2] * 100)
+
+    return {
+        "sessionId": session_id,
+        "totalTimeMin": total_time_min,
+        "kpiAssiduite": kpi_assiduite,
+        "kpiComprehension": kpi_comprehension,
+        "kpiProgression": kpi_progression,
+        "sessionsCount": sessions_count,
+        "bestModule": best_module,
+        "needsHelp": None,
+        "consecutiveDays": consecutive_days,
+        "focusScore": focus_score,
+    }
+
+
+def expected_kpis(export: dict) -> list:
+    sessions = set(export.get("sessions") or [])
+    sessions |= set((export.get("learningEvents") or {}).get("sessionId", []))
+    sessions |= set((export.get("quizResults") or {}).get("sessionId", []))
+    return [sql_daily_stats(export, session_id) for session_id in sorted(sessions)]
+
+
+# Cas limites : événement de la veille, quiz hors fenêtre, ratios non notés,
+# arrondi d'un score à 0.0075, session sans activité du jour
+REFERENCE_EXPORT = {
+    "date": "2024-12-19",
+    "sessions": ["alice", "bob", "chloe"],
+    "previousConsecutiveDays": {"alice": 4},
+    "learningEvents": {
+        "sessionId": ["alice", "alice", "alice", "alice", "bob", "bob", "alice"],
+        "ts": [
+            "2024-12-19T08:05:00.000Z", "2024-12-19T08:40:00.000Z", "2024-12-19T17:10:00.000Z",
+            "2024-12-19T17:30:00.000Z", "2024-12-19T10:00:00.000Z", "2024-12-19T10:20:00.000Z",
+            "2024-12-18T09:00:00.000Z",
+        ],
+        "durationSec": [600, 125, 300, 1, 90, 45, 999],
+        "successRatio": [0.9, 0.8, 0.5, None, None, None, 1.0],
+    },
+    "quizResults": {
+        "sessionId": ["alice", "alice", "alice", "alice", "bob", "bob", "chloe"],
+        "ts": [
+            "2024-12-19T08:10:00.000Z", "2024-12-19T17:15:00.000Z", "2024-12-16T09:00:00.000Z",
+            "2024-12-10T09:00:00.000Z", "2024-12-19T10:05:00.000Z", "2024-12-19T10:25:00.000Z",
+            "2024-12-17T11:00:00.000Z",
+        ],
+        "module": ["maths", "programmation", "maths", "maths", "playcube", "maths", "maths"],
+        "score": [72.5, 88.25, 64, 10, 0.005, 0.01, 50],
+    },
+}
+
+
+def random_export(seed: int, sessions: int = 40, events: int = 2000, quizzes: int = 600) -> dict:
+    rng = random.Random(seed)
+    day = date(2024, 12, 19)
+    ids = [f"session-{i:03d}" for i in range(sessions)]
+
+    def timestamp(days_back: int) -> str:
+        return f"{day - timedelta(days=days_back)}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.000Z"
+
+    # Scores distincts : ORDER BY score DESC LIMIT 1 n'a pas d'ordre défini en cas d'égalité
+    scores = rng.sample(range(0, 10001), quizzes)
+    return {
+        "date": day.isoformat(),
+        "sessions": ids[: sessions // 2],
+        "previousConsecutiveDays": {sid: rng.randint(0, 30) for sid in rng.sample(ids, sessions // 3)},
+        "learningEvents": {
+            "sessionId": [rng.choice(ids) for _ in range(events)],
+            "ts": [timestamp(rng.choice((0, 0, 0, 1))) for _ in range(events)],
+            "durationSec": [rng.randint(0, 3600) for _ in range(events)],
+            "successRatio": [rng.choice((None, round(rng.random(), 4), 0.8)) for _ in range(events)],
+        },
+        "quizResults": {
+            "sessionId": [rng.choice(ids) for _ in range(quizzes)],
+            "ts": [timestamp(rng.randint(0, 9)) for _ in range(quizzes)],
+            "module": [rng.choice(("maths", "programmation", "playcube")) for _ in range(quizzes)],
+            "score": [score / 100 for score in scores],
+        },
+    }
+
+
+class ComputeDailyKpisTest(unittest.TestCase):
+    def test_reference_export(self):
+        self.assertEqual(compute_daily_kpis(REFERENCE_EXPORT), expected_kpis(REFERENCE_EXPORT))
+
+    def test_reference_values(self):
+        # Quelques valeurs établies à la main, pour ne pas dépendre de la seule transcription
+        alice, bob, chloe = compute_daily_kpis(REFERENCE_EXPORT)
+        self.assertEqual(alice["totalTimeMin"], 17)          # (600 + 125 + 300 + 1) // 60
+        self.assertEqual(alice["kpiAssiduite"], 66.67)       # 2 réussis sur 3 notés
+        self.assertEqual(alice["kpiProgression"], 25.59)     # (80.375 - 64) / 64 * 100
+        self.assertEqual(alice["consecutiveDays"], 5)
+        self.assertEqual(bob["kpiComprehension"], 0.01)      # 0.0075 arrondi vers le haut
+        self.assertEqual(chloe["kpiComprehension"], 0.0)     # quiz du 17 seulement
+
+    def test_random_exports(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                export = random_export(seed)
+                self.assertEqual(compute_daily_kpis(export), expected_kpis(export))
+
+    def test_empty_export(self):
+        self.assertEqual(compute_daily_kpis({"date": "2024-12-19"}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+daily_reports.iter_json_array_items (lecture en flux des statistiques) comparé à
+json.loads sur des réponses reçues par morceaux de toutes les tailles
+
+  python3 -m pytest backend/scripts/tests
+"""
+
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daily_reports import iter_json_array_items  # noqa: E402
+
+# Nombres, chaînes et objets coupés à toutes les positions possibles
+SAMPLES = [
+    '{"reports":[1.5]}',
+    '{"reports": [-12, 3e2, 0.25E-1, 7, true, null, false]}',
+    '{"total": 3, "reports": [{"id": "r1", "kpi": 72.5, "tags": ["a]", "b,"]}, '
+    '{"id": "r\\"2\\u00e9", "kpi": -0.5}], "summary": {"sent": 2}}',
+    '{ "meta" : { "reports" : [9] } , "reports" : [ ] }',
+    '{"reports": null, "other": [1, 2]}',
+]
+
+
+def chunked(doc: str, size: int):
+    return (doc[i:i + size] for i in range(0, len(doc), size))
+
+
+class IterJsonArrayItemsTest(unittest.TestCase):
+    def test_every_chunk_size(self):
+        for doc in SAMPLES:
+            expected = json.loads(doc)["reports"] or []
+            for size in range(1, len(doc) + 1):
+                with self.subTest(doc=doc, size=size):
+                    self.assertEqual(list(iter_json_array_items(chunked(doc, size), "reports")), expected)
+
+    def test_missing_key(self):
+        self.assertEqual(list(iter_json_array_items(['{"total": 0}'], "reports")), [])
+        self.assertEqual(list(iter_json_array_items(["{}"], "reports")), [])
+
+    def test_truncated_response(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array_items(chunked('{"reports": [1, 2', 3), "reports"))
+
+    def test_not_an_object(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array_items(["[1, 2]"], "reports"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -51,14 +51,14 @@ export async function cleanupOldReportsJob() {
     const { PrismaClient } = await import('@prisma/client');
     const prisma = new PrismaClient();
     
-    // Supprimer les rapports de plus de 1 an
+    // Supprimer les rapports de plus de 1 an (y compris ceux générés mais jamais envoyés)
     const oneYearAgo = new Date();
     oneYearAgo.setFullYear(oneYearAgo.getFullYear() - 1);
     
     const deletedCount = await prisma.dailyReport.deleteMany({
       where: {
         date: { lt: oneYearAgo },
-        status: { in: ['sent', 'failed'] }
+        status: { in: ['sent', 'failed', 'generated', 'delivering'] }
       }
     });
     
@@ -1,25 +1,151 @@
 import express from 'express';
+import zlib from 'zlib';
 import { PrismaClient } from '@prisma/client';
 import { DailyReportService } from '../services/dailyReportService';
+import { ReportJobService } from '../services/reportJobService';
 import { requireAuth } from '../middleware/requireAuth';
 
 const router = express.Router();
 const prisma = new PrismaClient();
 
+const STATISTICS_PAGE_SIZE = 500;
+// Attente maximale d'un GET /jobs/:id?wait= (sous les timeouts usuels des proxys)
+const JOB_MAX_WAIT_SECONDS = 30;
+
+/**
+ * trace_id d'un en-tête W3C traceparent (00-<trace_id>-<span_id>-<flags>), envoyé
+ * par les scripts Python (scripts/script_tracing.py)
+ */
+function traceIdOf(req: express.Request): string | undefined {
+  const match = /^[\da-f]{2}-([\da-f]{32})-[\da-f]{16}-[\da-f]{2}$/.exec(String(req.headers.traceparent || ''));
+  return match ? match[1] : undefined;
+}
+
+// Journalise la durée des requêtes tracées pour les rapprocher des spans client
+router.use((req, res, next) => {
+  const traceId = traceIdOf(req);
+  if (traceId) {
+    const start = process.hrtime.bigint();
+    res.on('finish', () => {
+      const ms = Number(process.hrtime.bigint() - start) / 1e6;
+      console.log(`🔎 [trace ${traceId}] ${req.method} ${req.originalUrl} ${res.statusCode} ${ms.toFixed(1)} ms`);
+    });
+  }
+  next();
+});
+
+/**
+ * Écrit la réponse de /statistics page par page (curseur Prisma), compressée en gzip
+ * si le client l'accepte : la mémoire reste constante quelle que soit la plage.
+ * Même format JSON que la réponse classique.
+ *
+ * En cas d'erreur, le flux gzip est détaché de la réponse avant de relancer l'erreur :
+ * l'appelant répond 500 si rien n'est encore parti, sinon il coupe la connexion.
+ */
+async function streamStatistics(req: express.Request, res: express.Response, where: any) {
+  const gzip = /\bgzip\b/.test(String(req.headers['accept-encoding'] || ''));
+  res.setHeader('Content-Type', 'application/json; charset=utf-8');
+  res.setHeader('Vary', 'Accept-Encoding');
+  if (gzip) res.setHeader('Content-Encoding', 'gzip');
+
+  const gzipStream = gzip ? zlib.createGzip() : undefined;
+  if (gzipStream) gzipStream.pipe(res);
+  const out: NodeJS.WritableStream = gzipStream ?? res;
+  const write = (chunk: string) => new Promise<void>((resolve, reject) => {
+    if (res.destroyed) return reject(new Error('Connexion fermée par le client'));
+    if (out.write(chunk)) return resolve();
+    // Client déconnecté pendant l'attente : 'drain' ne viendrait jamais
+    const done = () => {
+      out.removeListener('drain', done);
+      res.removeListener('close', done);
+      resolve();
+    };
+    out.once('drain', done);
+    res.once('close', done);
+  });
+
+  try {
+    await writeStatistics(write, where);
+    out.end();
+  } catch (error) {
+    if (gzipStream) {
+      gzipStream.unpipe(res);
+      gzipStream.destroy();
+      if (!res.headersSent) res.removeHeader('Content-Encoding');
+    }
+    throw error;
+  }
+}
+
+/**
+ * Corps JSON de /statistics?stream=1 : rapports page par page puis totaux
+ */
+async function writeStatistics(write: (chunk: string) => Promise<void>, where: any) {
+  const totals = { count: 0, sent: 0, failed: 0, comprehension: 0, progression: 0 };
+  let cursor: string | undefined;
+  await write('{"success":true,"reports":[');
+  for (;;) {
+    const page = await prisma.dailyReport.findMany({
+      where,
+      orderBy: [{ date: 'desc' }, { id: 'asc' }],
+      include: {
+        session: {
+          select: {
+            childNickname: true,
+            childAge: true
+          }
+        }
+      },
+      take: STATISTICS_PAGE_SIZE,
+      ...(cursor ? { skip: 1, cursor: { id: cursor } } : {})
+    });
+    for (const report of page) {
+      await write((totals.count ? ',' : '') + JSON.stringify(report));
+      totals.count++;
+      if (report.status === 'sent') totals.sent++;
+      if (report.status === 'failed') totals.failed++;
+      totals.comprehension += (report.kpisSnapshot as any)?.kpi_comprehension || 0;
+      totals.progression += (report.kpisSnapshot as any)?.kpi_progression || 0;
+    }
+    if (page.length < STATISTICS_PAGE_SIZE) break;
+    cursor = page[page.length - 1].id;
+  }
+
+  const stats = {
+    totalReports: totals.count,
+    sentReports: totals.sent,
+    failedReports: totals.failed,
+    averageComprehension: totals.count > 0 ? totals.comprehension / totals.count : 0,
+    averageProgression: totals.count > 0 ? totals.progression / totals.count : 0
+  };
+  await write(`],"statistics":${JSON.stringify(stats)}}`);
+}
+
 /**
  * POST /api/reports/generate
  * Génère et envoie les rapports quotidiens (appelé par cron)
  */
 router.post('/generate', async (req, res) => {
   try {
-    const { date } = req.body;
+    const { date, sessionIds, calculateStats, deliver } = req.body;
     const targetDate = date ? new Date(date) : new Date();
-    
-    await DailyReportService.generateAndSendDailyReports(targetDate);
+
+    // Les shards envoient leurs sessions : les statistiques ont déjà été calculées par /prepare
+    // (le planificateur les calcule une fois par date via /prepare, avant son premier lot)
+    // calculateStats: false quand les KPI ont été calculés et importés par le script (PUT /kpis)
+    // deliver: false pour seulement générer (envoi par daily_reports.py deliver)
+    const traceId = traceIdOf(req);
+    const results = await DailyReportService.generateAndSendDailyReports(
+      targetDate,
+      Array.isArray(sessionIds)
+        ? { sessionIds, calculateStats: calculateStats === true, deliver: deliver !== false, traceId }
+        : { calculateStats: calculateStats !== false, deliver: deliver !== false, traceId }
+    );
     
     res.json({ 
       success: true, 
-      message: `Rapports générés pour ${targetDate.toISOString().split('T')[0]}` 
+      message: `Rapports générés pour ${targetDate.toISOString().split('T')[0]}`,
+      results
     });
   } catch (error) {
     console.error('Erreur lors de la génération des rapports:', error);
@@ -27,6 +153,180 @@ router.post('/generate', async (req, res) => {
   }
 });
 
+/**
+ * POST /api/reports/jobs
+ * Même génération que /generate, exécutée en arrière-plan : répond 202 avec l'identifiant
+ * du job (200 avec le job existant si une génération identique est déjà en cours)
+ */
+router.post('/jobs', requireAuth, async (req, res) => {
+  try {
+    const { date, sessionIds, calculateStats, deliver } = req.body;
+    const targetDate = date ? new Date(date) : new Date();
+
+    const traceId = traceIdOf(req);
+    const { job, created } = ReportJobService.submit(
+      targetDate,
+      Array.isArray(sessionIds)
+        ? { sessionIds, calculateStats: calculateStats === true, deliver: deliver !== false, traceId }
+        : { calculateStats: calculateStats !== false, deliver: deliver !== false, traceId }
+    );
+
+    res.status(created ? 202 : 200).json({ success: true, ...ReportJobService.toJSON(job) });
+  } catch (error) {
+    console.error('Erreur lors de la création du job de génération:', error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * GET /api/reports/jobs/:jobId
+ * Avancement d'un job de génération ; avec ?wait=<s>&since=<version>, attend
+ * (attente longue) un changement après cette version avant de répondre
+ */
+router.get('/jobs/:jobId', requireAuth, async (req, res) => {
+  try {
+    const wait = Math.min(Math.max(Number(req.query.wait) || 0, 0), JOB_MAX_WAIT_SECONDS);
+    const since = Number(req.query.since);
+    const job = await ReportJobService.waitForChange(
+      req.params.jobId,
+      Number.isFinite(since) ? since : -1,
+      wait * 1000
+    );
+
+    if (!job) {
+      return res.status(404).json({ error: 'Job introuvable' });
+    }
+
+    res.json({ success: true, ...ReportJobService.toJSON(job) });
+  } catch (error) {
+    console.error('Erreur lors de la lecture du job de génération:', error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * POST /api/reports/prepare
+ * Calcule les statistiques du jour et liste les sessions éligibles (génération shardée)
+ * avec leur heure et fréquence d'envoi (planificateur ; calculateStats: false pour
+ * ne lire que le planning)
+ */
+router.post('/prepare', requireAuth, async (req, res) => {
+  try {
+    const { date, calculateStats } = req.body;
+    const targetDate = date ? new Date(date) : new Date();
+
+    const sessions = await DailyReportService.prepareDailyReports(targetDate, {
+      calculateStats: calculateStats !== false
+    });
+
+    res.json({ success: true, sessions });
+  } catch (error) {
+    console.error('Erreur lors de la préparation des rapports:', error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * GET /api/reports/kpi-inputs
+ * Exporte en colonnes les événements et quiz nécessaires au calcul local des KPI
+ */
+router.get('/kpi-inputs', requireAuth, async (req, res) => {
+  try {
+    const { date } = req.query;
+    const targetDate = date ? new Date(date as string) : new Date();
+
+    res.json(await DailyReportService.exportKpiInputs(targetDate));
+  } catch (error) {
+    console.error("Erreur lors de l'export des données KPI:", error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * PUT /api/reports/kpis
+ * Importe en bloc les KPI du jour calculés par scripts/kpi_aggregation.py
+ */
+router.put('/kpis', requireAuth, async (req, res) => {
+  try {
+    const { date, stats } = req.body;
+    if (!date || !Array.isArray(stats)) {
+      return res.status(400).json({ error: 'date et stats requis' });
+    }
+
+    const imported = await DailyReportService.importDailyKpis(new Date(date), stats);
+
+    res.json({ success: true, imported });
+  } catch (error) {
+    console.error("Erreur lors de l'import des KPI:", error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * GET /api/reports/pending?date=YYYY-MM-DD&after=<id>&limit=100
+ * Page de rapports générés mais pas encore envoyés (livraison par daily_reports.py deliver)
+ */
+router.get('/pending', requireAuth, async (req, res) => {
+  try {
+    const { date, after, limit } = req.query;
+    const targetDate = date ? new Date(date as string) : new Date();
+
+    const reports = await DailyReportService.listPendingReports(targetDate, {
+      after: after ? String(after) : undefined,
+      limit: limit ? parseInt(limit as string) : undefined
+    });
+
+    res.json({ success: true, reports });
+  } catch (error) {
+    console.error('Erreur lors de la récupération des rapports à envoyer:', error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * POST /api/reports/pending/claim
+ * Réserve une page de rapports à envoyer ({ date, after, limit, leaseSeconds }) :
+ * ils passent 'delivering' jusqu'à la fin de la réservation (livraison par daily_reports.py deliver)
+ */
+router.post('/pending/claim', requireAuth, async (req, res) => {
+  try {
+    const { date, after, limit, leaseSeconds } = req.body;
+    const targetDate = date ? new Date(date) : new Date();
+
+    const reports = await DailyReportService.claimPendingReports(targetDate, {
+      after: after ? String(after) : undefined,
+      limit: limit ? parseInt(limit) : undefined,
+      leaseSeconds: leaseSeconds ? parseInt(leaseSeconds) : undefined
+    });
+
+    res.json({ success: true, reports });
+  } catch (error) {
+    console.error('Erreur lors de la réservation des rapports à envoyer:', error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
+/**
+ * POST /api/reports/delivered
+ * Marque en bloc les rapports envoyés ({ sent: [id...] }), refusés ({ failed: [{ id, error }] })
+ * ou à renvoyer plus tard ({ released: [id...] }, rendus disponibles sans attendre la fin de la réservation)
+ */
+router.post('/delivered', requireAuth, async (req, res) => {
+  try {
+    const { sent = [], failed = [], released = [] } = req.body;
+    if (!Array.isArray(sent) || !Array.isArray(failed) || !Array.isArray(released)) {
+      return res.status(400).json({ error: 'sent, failed et released doivent être des tableaux' });
+    }
+
+    const marked = await DailyReportService.markReportsDelivered(sent, failed, released);
+
+    res.json({ success: true, ...marked });
+  } catch (error) {
+    console.error('Erreur lors du marquage des rapports envoyés:', error);
+    res.status(500).json({ error: 'Erreur interne du serveur' });
+  }
+});
+
 /**
  * GET /api/reports/session/:sessionId
  * Récupère les rapports d'une session
@@ -82,7 +382,7 @@ router.post('/disable/:sessionId', requireAuth, async (req, res) => {
 
 /**
  * GET /api/reports/statistics
- * Récupère les statistiques des rapports
+ * Récupère les statistiques des rapports (?stream=1 : réponse en flux, gzip si accepté)
  */
 router.get('/statistics', requireAuth, async (req, res) => {
   try {
@@ -96,6 +396,12 @@ router.get('/statistics', requireAuth, async (req, res) => {
       if (endDate) where.date.lte = new Date(endDate as string);
     }
 
+    // Exports volumineux : réponse écrite au fil de l'eau (?stream=1)
+    if (req.query.stream === '1') {
+      await streamStatistics(req, res, where);
+      return;
+    }
+
     const reports = await prisma.dailyReport.findMany({
       where,
       orderBy: { date: 'desc' },
@@ -123,6 +429,11 @@ router.get('/statistics', requireAuth, async (req, res) => {
     res.json({ success: true, reports, statistics: stats });
   } catch (error) {
     console.error('Erreur lors de la récupération des statistiques:', error);
+    if (res.headersSent) {
+      // Flux déjà commencé : on coupe la connexion, le client détecte la réponse tronquée
+      res.destroy(error as Error);
+      return;
+    }
     res.status(500).json({ error: 'Erreur interne du serveur' });
   }
 });
@@ -130,11 +441,12 @@ router.get('/statistics', requireAuth, async (req, res) => {
 /**
  * POST /api/reports/test/:sessionId
  * Génère un rapport de test pour une session
+ * (deliver: false : rapport construit puis renvoyé, ni enregistré ni envoyé au parent)
  */
 router.post('/test/:sessionId', requireAuth, async (req, res) => {
   try {
     const { sessionId } = req.params;
-    const { date } = req.body;
+    const { date, deliver } = req.body;
     const targetDate = date ? new Date(date) : new Date();
 
     // Récupérer la session
@@ -149,6 +461,11 @@ router.post('/test/:sessionId', requireAuth, async (req, res) => {
       return res.status(404).json({ error: 'Session non trouvée' });
     }
 
+    if (deliver === false) {
+      const { subject, textContent } = await DailyReportService.buildReportForSession(session, targetDate);
+      return res.json({ success: true, message: 'Rapport de test généré (non envoyé)', subject, textContent });
+    }
+
     // Générer le rapport de test
     await DailyReportService.generateAndSendReportForSession(session, targetDate);
     
@@ -8,6 +8,43 @@ const openai = new OpenAI({
   apiKey: process.env.OPENAI_API_KEY,
 });
 
+/**
+ * KPI journaliers d'une session (une ligne de session_stats_daily)
+ */
+export interface DailyKpis {
+  sessionId: string;
+  totalTimeMin: number;
+  kpiAssiduite: number;
+  kpiComprehension: number;
+  kpiProgression: number;
+  sessionsCount: number;
+  bestModule: string | null;
+  needsHelp: string | null;
+  consecutiveDays: number;
+  focusScore: number;
+}
+
+/**
+ * Avancement d'une génération (sessions traitées sur le total)
+ */
+export interface DailyReportProgress {
+  total: number;
+  succeeded: number;
+  failed: number;
+}
+
+/**
+ * Rapport réservé pour l'envoi (daily_reports.py deliver)
+ */
+export interface PendingReport {
+  id: string;
+  sessionId: string;
+  subject: string;
+  htmlContent: string;
+  textContent: string;
+  parentEmail: string;
+}
+
 /**
  * Service de génération des rapports quotidiens automatisés
  */
@@ -20,21 +57,63 @@ export class DailyReportService {
 concis, orienté actions concrètes (2–3 conseils max). Jamais culpabilisant.
 Pas d'emoji. Pas d'exagération. Pas de jargon.`;
 
+  /**
+   * Statuts d'un rapport du jour qui n'est plus à générer
+   */
+  private static readonly COMPLETED_STATUSES = ['sent', 'generated', 'delivering'];
+
+  /**
+   * Durée par défaut de la réservation d'un rapport en cours d'envoi (statut 'delivering')
+   */
+  private static readonly DELIVERY_LEASE_SECONDS = 15 * 60;
+
+  /**
+   * Sessions en cours de génération dans ce processus (`${sessionId}:${date}`)
+   */
+  private static inFlight = new Set<string>();
+
+  private static async hasCompletedReport(sessionId: string, dateKey: string): Promise<boolean> {
+    const report = await prisma.dailyReport.findFirst({
+      where: { sessionId, date: new Date(dateKey), status: { in: this.COMPLETED_STATUSES } },
+      select: { id: true }
+    });
+    return report !== null;
+  }
+
   /**
    * Génère et envoie les rapports quotidiens pour une date donnée
+   * (optionnellement limité à une liste de sessions, pour les exécutions shardées ;
+   * deliver: false pour seulement générer, l'envoi étant fait par daily_reports.py deliver ;
+   * traceId : trace du script appelant, reprise dans les durées journalisées par étape ;
+   * onProgress : appelé après chaque session, utilisé par les jobs asynchrones)
    */
-  static async generateAndSendDailyReports(targetDate: Date = new Date()) {
+  static async generateAndSendDailyReports(
+    targetDate: Date = new Date(),
+    options: {
+      sessionIds?: string[];
+      calculateStats?: boolean;
+      deliver?: boolean;
+      traceId?: string;
+      onProgress?: (progress: DailyReportProgress) => void;
+    } = {}
+  ) {
+    const trace = options.traceId ? `[trace ${options.traceId}] ` : '';
     console.log(`📊 Démarrage de la génération des rapports quotidiens pour ${targetDate.toISOString().split('T')[0]}`);
 
     try {
-      // Calculer les statistiques pour la date
-      await this.calculateDailyStats(targetDate);
+      // Calculer les statistiques pour la date (déjà fait par /prepare pour les shards)
+      if (options.calculateStats !== false) {
+        const statsStart = Date.now();
+        await this.calculateDailyStats(targetDate);
+        console.log(`⏱️ ${trace}statistiques du jour: ${Date.now() - statsStart} ms`);
+      }
 
       // Récupérer toutes les sessions avec consentement email
       const sessions = await prisma.userSession.findMany({
         where: {
           userType: 'CHILD',
-          isActive: true
+          isActive: true,
+          ...(options.sessionIds ? { id: { in: options.sessionIds } } : {})
         },
         include: {
           account: {
@@ -47,15 +126,71 @@ Pas d'emoji. Pas d'exagération. Pas de jargon.`;
 
       console.log(`📧 ${sessions.length} sessions à traiter`);
 
+      const results = {
+        succeeded: [] as string[],
+        failed: [] as { sessionId: string; error: string }[]
+      };
+      const reportProgress = () => options.onProgress?.({
+        total: sessions.length,
+        succeeded: results.succeeded.length,
+        failed: results.failed.length
+      });
+      reportProgress();
+
+      // Idempotence (toutes les exécutions, avec ou sans sessionIds) : une session dont
+      // le rapport du jour est déjà envoyé (ou déjà généré, en attente de livraison)
+      // est ignorée ; une relance de la date entière ne renvoie donc aucun email
+      const dateKey = targetDate.toISOString().split('T')[0];
+      const alreadySent = new Set<string>();
+      const sentReports = await prisma.dailyReport.findMany({
+        where: {
+          ...(options.sessionIds ? { sessionId: { in: options.sessionIds } } : {}),
+          date: new Date(dateKey),
+          status: { in: this.COMPLETED_STATUSES }
+        },
+        select: { sessionId: true }
+      });
+      sentReports.forEach(report => alreadySent.add(report.sessionId));
+
       for (const session of sessions) {
+        if (alreadySent.has(session.id)) {
+          results.succeeded.push(session.id);
+          reportProgress();
+          continue;
+        }
+        // Exécution concurrente de la même date (requête relancée pendant que la
+        // première tourne encore) : une session en cours n'est générée qu'une fois
+        const claim = `${session.id}:${dateKey}`;
+        if (this.inFlight.has(claim)) {
+          results.failed.push({ sessionId: session.id, error: 'Génération déjà en cours pour cette session' });
+          reportProgress();
+          continue;
+        }
+        this.inFlight.add(claim);
+        const sessionStart = Date.now();
         try {
-          await this.generateAndSendReportForSession(session, targetDate);
+          // Terminée par une autre exécution depuis le début de celle-ci
+          if (await this.hasCompletedReport(session.id, dateKey)) {
+            results.succeeded.push(session.id);
+            continue;
+          }
+          await this.generateAndSendReportForSession(session, targetDate, { deliver: options.deliver });
+          console.log(`⏱️ ${trace}session ${session.id}: ${Date.now() - sessionStart} ms`);
+          results.succeeded.push(session.id);
         } catch (error) {
           console.error(`❌ Erreur pour la session ${session.id}:`, error);
+          results.failed.push({
+            sessionId: session.id,
+            error: error instanceof Error ? error.message : String(error)
+          });
+        } finally {
+          this.inFlight.delete(claim);
+          reportProgress();
         }
       }
 
       console.log('✅ Génération des rapports quotidiens terminée');
+      return results;
     } catch (error) {
       console.error('❌ Erreur lors de la génération des rapports:', error);
       throw error;
@@ -63,9 +198,244 @@ Pas d'emoji. Pas d'exagération. Pas de jargon.`;
   }
 
   /**
-   * Génère et envoie un rapport pour une session spécifique
+   * Calcule les statistiques du jour et liste les sessions éligibles aux rapports,
+   * avec l'heure et la fréquence d'envoi choisies par le compte (planificateur)
    */
-  static async generateAndSendReportForSession(session: any, targetDate: Date) {
+  static async prepareDailyReports(
+    targetDate: Date = new Date(),
+    options: { calculateStats?: boolean } = {}
+  ) {
+    if (options.calculateStats !== false) {
+      await this.calculateDailyStats(targetDate);
+    }
+
+    const sessions = await prisma.userSession.findMany({
+      where: {
+        userType: 'CHILD',
+        isActive: true
+      },
+      select: {
+        id: true,
+        account: {
+          select: {
+            reportPreferences: {
+              select: { preferredTime: true, frequency: true }
+            }
+          }
+        }
+      },
+      orderBy: { id: 'asc' }
+    });
+
+    return sessions.map(session => ({
+      id: session.id,
+      emailTime: session.account?.reportPreferences?.preferredTime ?? '19:30:00',
+      emailFrequency: session.account?.reportPreferences?.frequency ?? 'daily'
+    }));
+  }
+
+  /**
+   * Exporte en colonnes les données nécessaires au calcul local des KPI du jour
+   * (scripts/kpi_aggregation.py) : événements du jour, quiz des 7 jours précédents
+   * et derniers jours consécutifs connus
+   */
+  static async exportKpiInputs(targetDate: Date = new Date()) {
+    const day = new Date(targetDate.toISOString().split('T')[0]);
+    const nextDay = new Date(day.getTime() + 24 * 60 * 60 * 1000);
+    const windowStart = new Date(day.getTime() - 7 * 24 * 60 * 60 * 1000);
+
+    const [sessions, events, quizzes, previous] = await Promise.all([
+      prisma.dailyReportUserSession.findMany({ select: { id: true }, orderBy: { id: 'asc' } }),
+      prisma.dailyReportLearningEvent.findMany({
+        where: { ts: { gte: day, lt: nextDay } },
+        select: { sessionId: true, ts: true, durationSec: true, successRatio: true },
+        orderBy: { ts: 'asc' }
+      }),
+      prisma.dailyReportQuizResult.findMany({
+        where: { ts: { gte: windowStart, lt: nextDay } },
+        select: { sessionId: true, ts: true, module: true, score: true },
+        orderBy: { ts: 'asc' }
+      }),
+      prisma.dailyReportSessionStatsDaily.groupBy({
+        by: ['sessionId'],
+        where: { date: { lt: day } },
+        _max: { consecutiveDays: true }
+      })
+    ]);
+
+    return {
+      date: day.toISOString().split('T')[0],
+      sessions: sessions.map(session => session.id),
+      previousConsecutiveDays: Object.fromEntries(
+        previous.map(row => [row.sessionId, row._max.consecutiveDays ?? 0])
+      ),
+      learningEvents: {
+        sessionId: events.map(event => event.sessionId),
+        ts: events.map(event => event.ts.toISOString()),
+        durationSec: events.map(event => event.durationSec),
+        successRatio: events.map(event => event.successRatio)
+      },
+      quizResults: {
+        sessionId: quizzes.map(quiz => quiz.sessionId),
+        ts: quizzes.map(quiz => quiz.ts.toISOString()),
+        module: quizzes.map(quiz => quiz.module),
+        score: quizzes.map(quiz => quiz.score)
+      }
+    };
+  }
+
+  /**
+   * Enregistre en bloc les KPI du jour calculés hors de l'API
+   */
+  static async importDailyKpis(targetDate: Date, stats: DailyKpis[]) {
+    const date = new Date(targetDate.toISOString().split('T')[0]);
+    const BATCH_SIZE = 500;
+
+    for (let i = 0; i < stats.length; i += BATCH_SIZE) {
+      await prisma.$transaction(
+        stats.slice(i, i + BATCH_SIZE).map(row => {
+          const kpis = {
+            totalTimeMin: row.totalTimeMin,
+            kpiAssiduite: row.kpiAssiduite,
+            kpiComprehension: row.kpiComprehension,
+            kpiProgression: row.kpiProgression,
+            sessionsCount: row.sessionsCount,
+            bestModule: row.bestModule,
+            needsHelp: row.needsHelp,
+            consecutiveDays: row.consecutiveDays,
+            focusScore: row.focusScore
+          };
+          return prisma.dailyReportSessionStatsDaily.upsert({
+            where: { sessionId_date: { sessionId: row.sessionId, date } },
+            update: kpis,
+            create: { sessionId: row.sessionId, date, ...kpis }
+          });
+        })
+      );
+    }
+
+    console.log(`📊 ${stats.length} statistiques importées pour ${date.toISOString().split('T')[0]}`);
+    return stats.length;
+  }
+
+  /**
+   * Liste une page de rapports générés mais pas encore envoyés pour une date
+   * (pagination par id croissant : after = dernier id de la page précédente)
+   */
+  static async listPendingReports(targetDate: Date, options: { after?: string; limit?: number } = {}) {
+    return prisma.dailyReport.findMany({
+      where: {
+        date: new Date(targetDate.toISOString().split('T')[0]),
+        status: 'generated',
+        ...(options.after ? { id: { gt: options.after } } : {})
+      },
+      select: {
+        id: true,
+        sessionId: true,
+        subject: true,
+        htmlContent: true,
+        textContent: true,
+        parentEmail: true
+      },
+      orderBy: { id: 'asc' },
+      take: Math.min(Math.max(options.limit ?? 100, 1), 1000)
+    });
+  }
+
+  /**
+   * Réserve une page de rapports à envoyer pour une date : 'generated' → 'delivering'
+   * jusqu'à lease_until, en une requête (SKIP LOCKED). Deux livreurs simultanés ne
+   * reçoivent jamais le même rapport ; un rapport dont la réservation a expiré (livreur
+   * interrompu) redevient disponible. Pagination par id croissant comme listPendingReports.
+   */
+  static async claimPendingReports(
+    targetDate: Date,
+    options: { after?: string; limit?: number; leaseSeconds?: number } = {}
+  ): Promise<PendingReport[]> {
+    const day = targetDate.toISOString().split('T')[0];
+    const limit = Math.min(Math.max(options.limit ?? 100, 1), 1000);
+    const leaseSeconds = Math.min(Math.max(options.leaseSeconds ?? this.DELIVERY_LEASE_SECONDS, 60), 24 * 60 * 60);
+    return prisma.$queryRaw<PendingReport[]>`
+      WITH claimed AS (
+        UPDATE daily_reports
+        SET status = 'delivering', lease_until = NOW() + ${leaseSeconds}::int * INTERVAL '1 second'
+        WHERE id IN (
+          SELECT id FROM daily_reports
+          WHERE date = ${day}::date
+            AND (status = 'generated' OR (status = 'delivering' AND lease_until < NOW()))
+            AND id > ${options.after ?? ''}
+          ORDER BY id
+          LIMIT ${limit}
+          FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, session_id, subject, html_content, text_content, parent_email
+      )
+      SELECT id, session_id AS "sessionId", subject, html_content AS "htmlContent",
+        text_content AS "textContent", parent_email AS "parentEmail"
+      FROM claimed
+      ORDER BY id`;
+  }
+
+  /**
+   * Marque en bloc les rapports livrés (sent) ou refusés définitivement (failed), et
+   * rend disponibles ceux à renvoyer plus tard (released) ; seuls les rapports encore
+   * 'generated' ou 'delivering' sont modifiés
+   *
+   * Les rapports envoyés sont journalisés dans email_logs d'après les lignes réellement
+   * modifiées (UPDATE ... RETURNING) : un même lot marqué deux fois ne l'est qu'une fois.
+   */
+  static async markReportsDelivered(
+    sent: string[],
+    failed: { id: string; error: string }[] = [],
+    released: string[] = []
+  ) {
+    const sentAt = new Date();
+    const openStatuses = ['generated', 'delivering'];
+    const { deliveredReports, failedCount, releasedCount } = await prisma.$transaction(async tx => {
+      const deliveredReports = sent.length
+        ? await tx.$queryRaw<{ parentEmail: string; subject: string; htmlContent: string; textContent: string }[]>`
+            UPDATE daily_reports
+            SET status = 'sent', sent_at = ${sentAt}, lease_until = NULL
+            WHERE id = ANY(${sent}) AND status IN ('generated', 'delivering')
+            RETURNING parent_email AS "parentEmail", subject, html_content AS "htmlContent",
+              text_content AS "textContent"`
+        : [];
+
+      let failedCount = 0;
+      for (const { id, error } of failed) {
+        const result = await tx.dailyReport.updateMany({
+          where: { id, status: { in: openStatuses } },
+          data: { status: 'failed', errorMessage: error, leaseUntil: null }
+        });
+        failedCount += result.count;
+      }
+
+      const releasedResult = released.length
+        ? await tx.dailyReport.updateMany({
+            where: { id: { in: released }, status: 'delivering' },
+            data: { status: 'generated', leaseUntil: null }
+          })
+        : { count: 0 };
+
+      return { deliveredReports, failedCount, releasedCount: releasedResult.count };
+    });
+
+    await EmailLoggingService.logExternalDeliveries('noreply', deliveredReports.map(report => ({
+      to: report.parentEmail,
+      subject: report.subject,
+      html: report.htmlContent,
+      text: report.textContent,
+      sentAt
+    })), failedCount);
+
+    return { sent: deliveredReports.length, failed: failedCount, released: releasedCount };
+  }
+
+  /**
+   * Construit le rapport d'une session (contenu IA, sujet, HTML et texte) sans
+   * l'enregistrer ni l'envoyer
+   */
+  static async buildReportForSession(session: any, targetDate: Date) {
     // Préparer les données de test pour l'IA
     const reportData = {
       child_nickname: session.firstName,
@@ -87,22 +457,41 @@ Pas d'emoji. Pas d'exagération. Pas de jargon.`;
     // Générer le contenu avec l'IA
     const reportContent = await this.generateReportContent(reportData);
 
+    return {
+      reportData,
+      subject: `CubeAI — Bilan du jour pour ${session.firstName} (${reportData.date_fr})`,
+      htmlContent: this.buildEmailHTML(reportContent, reportData),
+      textContent: this.buildEmailText(reportContent, reportData)
+    };
+  }
+
+  /**
+   * Génère et envoie un rapport pour une session spécifique
+   * (deliver: false : le rapport est seulement enregistré avec le statut 'generated')
+   */
+  static async generateAndSendReportForSession(session: any, targetDate: Date, options: { deliver?: boolean } = {}) {
+    const { reportData, subject, htmlContent, textContent } = await this.buildReportForSession(session, targetDate);
+
     // Créer le rapport dans la base de données
     const report = await prisma.dailyReport.create({
       data: {
         sessionId: session.id,
         date: targetDate,
-        subject: `CubeAI — Bilan du jour pour ${session.firstName} (${reportData.date_fr})`,
-        htmlContent: this.buildEmailHTML(reportContent, reportData),
-        textContent: this.buildEmailText(reportContent, reportData),
+        subject,
+        htmlContent,
+        textContent,
         modelUsed: 'gpt-4',
         promptUsed: this.buildUserPrompt(reportData),
         kpisSnapshot: reportData,
         parentEmail: session.account.email,
-        status: 'pending'
+        status: options.deliver === false ? 'generated' : 'pending'
       }
     });
 
+    if (options.deliver === false) {
+      return;
+    }
+
     // Envoyer l'email
     try {
       await EmailLoggingService.sendAndLogEmail('noreply', {
@@ -301,6 +301,60 @@ export class EmailLoggingService {
     });
   }
 
+  /**
+   * Journalise en bloc des emails envoyés hors de ce service (ex. daily_reports.py deliver)
+   * et met à jour les statistiques du jour
+   */
+  static async logExternalDeliveries(emailType: ConfigEmailType, delivered: {
+    to: string;
+    subject: string;
+    html: string;
+    text?: string;
+    sentAt: Date;
+  }[], failedCount: number = 0) {
+    if (delivered.length) {
+      const emailConfig = getEmailConfig(emailType);
+      await prisma.emailLog.createMany({
+        data: delivered.map(email => ({
+          emailType: this.mapEmailType(emailType),
+          fromEmail: emailConfig.user,
+          toEmail: email.to,
+          subject: email.subject,
+          htmlContent: email.html,
+          textContent: email.text,
+          status: 'SENT' as EmailStatus,
+          scheduledAt: email.sentAt,
+          sentAt: email.sentAt,
+        }))
+      });
+    }
+    if (!delivered.length && !failedCount) {
+      return;
+    }
+
+    const today = new Date();
+    today.setHours(0, 0, 0, 0);
+    await prisma.emailStatistics.upsert({
+      where: {
+        emailType_date: {
+          emailType: this.mapEmailType(emailType),
+          date: today
+        }
+      },
+      update: {
+        sentCount: { increment: delivered.length },
+        failedCount: { increment: failedCount },
+      },
+      create: {
+        emailType: this.mapEmailType(emailType),
+        date: today,
+        sentCount: delivered.length,
+        failedCount,
+        bouncedCount: 0,
+      }
+    });
+  }
+
   /**
    * Met à jour les statistiques d'emails
    */
@@ -0,0 +1,147 @@
+import { randomUUID } from 'crypto';
+import { EventEmitter } from 'events';
+import { DailyReportService, DailyReportProgress } from './dailyReportService';
+
+export type ReportJobStatus = 'running' | 'completed' | 'failed';
+
+interface ReportJob {
+  id: string;
+  key: string;
+  date: string;
+  status: ReportJobStatus;
+  progress: DailyReportProgress;
+  results?: { succeeded: string[]; failed: { sessionId: string; error: string }[] };
+  error?: string;
+  startedAt: number;
+  finishedAt?: number;
+  // Incrémenté à chaque changement (attente longue des clients)
+  version: number;
+}
+
+export interface ReportJobOptions {
+  sessionIds?: string[];
+  calculateStats?: boolean;
+  deliver?: boolean;
+  traceId?: string;
+}
+
+// Jobs terminés conservés pour qu'un client relancé puisse encore en lire le résultat
+const FINISHED_JOB_TTL_MS = 24 * 60 * 60 * 1000;
+
+/**
+ * Jobs de génération des rapports quotidiens exécutés en arrière-plan
+ *
+ * Le registre est en mémoire : un redémarrage de l'API perd les jobs en cours
+ * (les rapports déjà générés restent, et une relance sur la date entière les ignore).
+ */
+export class ReportJobService {
+  private static jobs = new Map<string, ReportJob>();
+  private static changes = new EventEmitter().setMaxListeners(0);
+
+  /**
+   * Lance la génération en arrière-plan ; un job identique (même date, mêmes
+   * sessions, même mode) encore en cours est renvoyé au lieu d'en créer un second
+   */
+  static submit(targetDate: Date, options: ReportJobOptions): { job: ReportJob; created: boolean } {
+    const date = targetDate.toISOString().split('T')[0];
+    const key = JSON.stringify([date, options.sessionIds ?? null, options.deliver !== false]);
+    for (const job of this.jobs.values()) {
+      if (job.key === key && job.status === 'running') {
+        return { job, created: false };
+      }
+    }
+
+    this.prune();
+    const job: ReportJob = {
+      id: randomUUID(),
+      key,
+      date,
+      status: 'running',
+      progress: { total: 0, succeeded: 0, failed: 0 },
+      startedAt: Date.now(),
+      version: 0
+    };
+    this.jobs.set(job.id, job);
+    void this.run(job, targetDate, options);
+    return { job, created: true };
+  }
+
+  private static async run(job: ReportJob, targetDate: Date, options: ReportJobOptions) {
+    try {
+      const results = await DailyReportService.generateAndSendDailyReports(targetDate, {
+        ...options,
+        onProgress: progress => {
+          job.progress = progress;
+          this.touch(job);
+        }
+      });
+      job.results = results;
+      job.status = 'completed';
+    } catch (error) {
+      console.error(`❌ Job de génération ${job.id} en échec:`, error);
+      job.error = error instanceof Error ? error.message : String(error);
+      job.status = 'failed';
+    }
+    job.finishedAt = Date.now();
+    this.touch(job);
+  }
+
+  private static touch(job: ReportJob) {
+    job.version += 1;
+    this.changes.emit(job.id);
+  }
+
+  private static prune() {
+    const now = Date.now();
+    for (const [id, job] of this.jobs) {
+      if (job.finishedAt && now - job.finishedAt > FINISHED_JOB_TTL_MS) {
+        this.jobs.delete(id);
+      }
+    }
+  }
+
+  /**
+   * Attend que le job dépasse la version `since` (ou soit terminé), au plus timeoutMs
+   */
+  static async waitForChange(id: string, since: number, timeoutMs: number): Promise<ReportJob | undefined> {
+    const job = this.jobs.get(id);
+    if (!job || job.status !== 'running' || job.version > since || timeoutMs <= 0) {
+      return job;
+    }
+    await new Promise<void>(resolve => {
+      const done = () => {
+        clearTimeout(timer);
+        this.changes.off(id, done);
+        resolve();
+      };
+      const timer = setTimeout(done, timeoutMs);
+      this.changes.on(id, done);
+    });
+    return this.jobs.get(id);
+  }
+
+  /**
+   * Représentation JSON : avancement, débit (sessions/min) et, une fois terminé, les
+   * résultats par session (même format que /generate)
+   */
+  static toJSON(job: ReportJob) {
+    const { total, succeeded, failed } = job.progress;
+    const elapsedMs = (job.finishedAt ?? Date.now()) - job.startedAt;
+    return {
+      jobId: job.id,
+      date: job.date,
+      status: job.status,
+      version: job.version,
+      total,
+      succeeded,
+      failed,
+      remaining: Math.max(0, total - succeeded - failed),
+      elapsedMs,
+      sessionsPerMinute: elapsedMs > 0 ? Math.round(((succeeded + failed) * 60000 / elapsedMs) * 10) / 10 : 0,
+      startedAt: new Date(job.startedAt).toISOString(),
+      finishedAt: job.finishedAt ? new Date(job.finishedAt).toISOString() : null,
+      ...(job.results ? { results: job.results } : {}),
+      ...(job.error ? { error: job.error } : {})
+    };
+  }
+}